@@ -0,0 +1,56 @@
+"""
+Clocks used by controllers and simulated motors.
+
+By default, everything follows the wall clock. A VirtualClock can be shared
+between a controller and simulated motors (KinMotor) to run simulations in
+simulated time: the controller then advances the clock by one period at each
+call of its step() method, without sleeping, and results are reproducible.
+
+>>> clk = VirtualClock()
+>>> ctrl = DynamixelController(mcom, clock=clk)
+>>> ctrl.step(100) # 100 loops, i.e. 100*ctrl.period seconds of simulated time
+"""
+from __future__ import division
+
+import threading
+import time
+
+
+class Clock(object):
+    """The wall clock"""
+
+    virtual = False
+
+    def time(self):
+        return time.time()
+
+    def sleep(self, duration):
+        time.sleep(duration)
+
+
+class VirtualClock(Clock):
+    """A clock that only moves forward when told so"""
+
+    virtual = True
+
+    def __init__(self, start=0.0):
+        self._now  = start
+        self._lock = threading.Lock()
+
+    def time(self):
+        return self._now
+
+    def advance(self, duration):
+        """Move time forward by duration seconds"""
+        if duration < 0:
+            raise ValueError('time can only move forward ({} < 0)'.format(duration))
+        with self._lock:
+            self._now += duration
+
+    def sleep(self, duration):
+        """Sleeping does not wait: it advances time instead"""
+        if duration > 0:
+            self.advance(duration)
+
+
+REALTIME = Clock()
@@ -6,10 +6,13 @@ import sys
 from collections import OrderedDict, deque
 import copy
 import atexit
+import traceback
 
 from .. import color
+from .. import clock as clk
 
 from ..refs import protocol as pt
+from ..refs import blackouts
 from . import motor
 
 
@@ -25,11 +28,19 @@ class DynamixelController(threading.Thread):
     it expects a functionnal instance.
     """
 
-    def __init__(self, motorcom, broadcast_ping=False, freq=60, debug=False):
+    def __init__(self, motorcom, broadcast_ping=False, freq=60, debug=False,
+                 probe_blackouts=False, clock=None):
         """
         :arg motorcom:  motor communication object
         :arg freq:      the target frequence for refreshing values in Hz.
         :arg debug:     if True, displays debug info on the controller behavior.
+        :arg probe_blackouts:  if True, motors in blackout after an EEPROM write
+                               are pinged at each loop, and are read again as
+                               soon as they answer, rather than at the end of
+                               the blackout duration given by the
+                               :py:mod:`blackouts <pydyn.refs.blackouts>` module.
+        :arg clock:     the :py:mod:`clock <pydyn.clock>` used for timing the
+                        loops, blackouts and setpoints. Wall clock by default.
         """
 
         threading.Thread.__init__(self)
@@ -39,11 +50,17 @@ class DynamixelController(threading.Thread):
         self.freq = freq
         self.fps_history = deque(maxlen = 3*freq)
         self.framecount = 0
+        self.frameseq   = 0 # incremented each time fresh motor state is read
+        self._frameseq_done = 0 # last frame whose callbacks have completed
         self.broadcast_ping = broadcast_ping
+        self.probe_blackouts = probe_blackouts
+        self.clock = clk.REALTIME if clock is None else clock
 
         self.com = motorcom
+        self.com.clock = self.clock # memory changes and history are timestamped with it
         self.motors = []
         self._mtimeouts = {} # motor timeouts after EEPROM writes
+        self._futures   = {} # request futures of the current frame, (motor, kind, control) -> [future, ...]
 
         def stop_and_close():
             self.stop()
@@ -54,14 +71,24 @@ class DynamixelController(threading.Thread):
             self.com.close()
         atexit.register(stop_and_close)
 
+        # shared by the motors to protect their requests, so that requests on
+        # several motors can be registered, and divided, atomically.
+        self.request_lock = threading.Lock()
         self._pinglock = threading.Lock() # when discovering motors
         self._ctrllock = threading.Lock() # when running the control loop
 
         self._stop_event = threading.Event()
 
+        # notified at the start of each loop and after each read phase
+        self._frame_cond = threading.Condition()
+        self._frame_callbacks = []
+        self._snapshot = None # last published MemorySnapshot
+
     def stop(self):
         """Stop the thread after the end of the current loop"""
         self._stop_event.set()
+        with self._frame_cond:
+            self._frame_cond.notify_all()
 
     def stopped(self):
         return self._stop_event.is_set()
@@ -69,9 +96,81 @@ class DynamixelController(threading.Thread):
     def wait(self, loops):
         """ Wait a number of loops. Useful to wait before a change is applied to the motors."""
         if self.is_alive():
-            frame = self.framecount
-            while frame + loops >= self.framecount:
-                time.sleep(0.001)
+            with self._frame_cond:
+                frame = self.framecount
+                while frame + loops >= self.framecount and not self.stopped():
+                    self._frame_cond.wait()
+
+    def wait_frame(self, timeout=None):
+        """\
+        Block until the next read phase of the controller has completed, i.e.
+        until fresh position, speed and load values are available.
+
+        :param timeout:  maximum time to wait, in (wall clock) seconds. If
+                         None, wait indefinitely (or until the controller stops).
+        :return:  the frame sequence number of the new data, or None if the
+                  timeout expired or the controller is stopped.
+        """
+        with self._frame_cond:
+            seq = self._frameseq_done
+            if timeout is not None:
+                end = time.time() + timeout
+            while self._frameseq_done == seq and not self.stopped():
+                if timeout is None:
+                    self._frame_cond.wait()
+                else:
+                    remaining = end - time.time()
+                    if remaining <= 0:
+                        break
+                    self._frame_cond.wait(remaining)
+            if self._frameseq_done == seq:
+                return None
+            return self._frameseq_done
+
+    def register_frame_callback(self, callback):
+        """\
+        Register a function to be called at every loop, right after the read
+        phase, with the controller as only argument. Callbacks are executed in
+        the controller thread, while the controller lock is held: they should
+        be short. Write requests made from a callback are sent during the same
+        loop.
+        """
+        self._frame_callbacks.append(callback)
+
+    def unregister_frame_callback(self, callback):
+        """Remove a callback added by :py:meth:`register_frame_callback`."""
+        self._frame_callbacks.remove(callback)
+
+    def snapshot(self):
+        """\
+        Return a frame-consistent, immutable copy of the memory of the motors,
+        as a :py:class:`MemorySnapshot <pydyn.dynamixel.memory.MemorySnapshot>`.
+
+        A new snapshot is published after each read phase, by swapping a
+        reference: reading it never blocks, nor is blocked by, the control
+        loop, and all its values come from the same frame.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot = self._take_snapshot()
+        return snapshot
+
+    def _take_snapshot(self):
+        return self.com.memtable.snapshot([m.mmem.row for m in self.motors],
+                                          frameseq=self.frameseq, timestamp=self.clock.time())
+
+    def _new_frame(self):
+        """Advance the frame sequence, publish a snapshot, run callbacks and wake up waiters"""
+        self.frameseq += 1
+        self._snapshot = self._take_snapshot()
+        for callback in tuple(self._frame_callbacks):
+            try:
+                callback(self)
+            except Exception:
+                traceback.print_exc() # a failing callback must not stop the loop
+        with self._frame_cond:
+            self._frameseq_done = self.frameseq
+            self._frame_cond.notify_all()
 
     def close(self, immediately=True):
         """ Close the serial connection
@@ -190,15 +289,27 @@ class DynamixelController(threading.Thread):
                     m._error.append(e)
 
         for mmem in mmems:
-            m = motor.MOTOR_MODELS[mmem.model](mmem)
+            m = motor.MOTOR_MODELS[mmem.model](mmem, request_lock=self.request_lock)
             self.motors.append(m)
+        self._snapshot = None
 
 
     # MARK Handling Requests and Updating
 
+    def _probing_motors(self):
+        """\
+        End the expired EEPROM blackouts. If probe_blackouts is True, also ping
+        the motors still in blackout, and end the blackout of the ones that
+        answer.
+        """
+        now = self.clock.time()
+        for mid, timeout in list(self._mtimeouts.items()):
+            if timeout <= now or (self.probe_blackouts and self.com.ping(mid)):
+                self._mtimeouts.pop(mid)
+
     def _reading_motors(self):
         """ Read the motors for position, speed and load """
-        now = time.time()
+        now = self.clock.time()
         mids = [m.id for m in self.motors if self._mtimeouts.get(m.id, now) <= now]
         if len(mids) > 0:
             try:
@@ -235,15 +346,16 @@ class DynamixelController(threading.Thread):
         and other writes.
         If an eeprom write is present, only extract this one, and leave the other
         requests on the motor.
+
+        Must be called with the request lock of the motor held.
         """
         write_rq     = OrderedDict()
         write_pst_rq = OrderedDict()
 
-        now = time.time()
+        now = self.clock.time()
         if self._mtimeouts.get(motor.id, now) > now:
             return write_rq, write_pst_rq, OrderedDict()
 
-        motor.request_lock.acquire()
         for control, value in motor.write_requests.items():
             if not control.ram:
                 # we have a eeprom write to do, so we do it exclusively and set
@@ -251,7 +363,7 @@ class DynamixelController(threading.Thread):
                 # the timeout clears.
                 write_rq[control] = value
                 motor.write_requests.pop(control)
-                motor.request_lock.release()
+                self._take_futures(motor, [('write', control)])
                 return write_rq, write_pst_rq, OrderedDict()
 
         # if we're here, we don't have any eeprom write to do
@@ -260,7 +372,7 @@ class DynamixelController(threading.Thread):
         motor.write_requests.clear()
         read_rq  = copy.copy(motor.read_requests)
         motor.read_requests.clear()
-        motor.request_lock.release()
+        self._take_futures(motor, list(motor._futures.keys()))
 
 
         for control, value in write_requests.items():
@@ -287,15 +399,57 @@ class DynamixelController(threading.Thread):
         read_requests      = []
 
 
-        for motor in self.motors:
-            m_write, m_pst, m_read = self._divide_motor_requests(motor)
+        # the lock is held for all motors, so that requests registered
+        # together on several motors are all sent in this frame, or none.
+        with self.request_lock:
+            for motor in self.motors:
+                m_write, m_pst, m_read = self._divide_motor_requests(motor)
 
-            write_requests.append(m_write)
-            write_pst_requests.append(m_pst)
-            read_requests.append(m_read)
+                write_requests.append(m_write)
+                write_pst_requests.append(m_pst)
+                read_requests.append(m_read)
 
         return write_requests, write_pst_requests, read_requests
 
+    # MARK Request futures
+
+    def _take_futures(self, motor, keys):
+        """\
+        Move the futures of requests taken from a motor to the futures of the
+        frame. Must be called with the request lock of the motor held.
+        """
+        for kind, control in keys:
+            futures = motor._futures.pop((kind, control), None)
+            if futures is not None:
+                self._futures.setdefault((motor, kind, control), []).extend(futures)
+
+    def _resolve_futures(self, motor, kind, control):
+        """Resolve the futures of a request of the frame, once it was sent"""
+        futures = self._futures.pop((motor, kind, control), None)
+        if futures is None:
+            return
+        value, error = None, None
+        if kind == 'read':
+            try:
+                value = motor._read_value(control)
+            except ValueError as e:
+                error = e
+        for future in futures:
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+
+    def _fail_futures(self, error):
+        """Fail the futures of the frame, and the ones still waiting on the motors"""
+        futures, self._futures = list(self._futures.values()), {}
+        with self.request_lock:
+            for m in self.motors:
+                futures.extend(m._futures.values())
+                m._futures.clear()
+        for future in (f for fs in futures for f in fs):
+            future.set_exception(error)
+
     def _handle_all_pst_requests(self, all_pst_requests):
         # Handling pst requests (if need be)
         sync_pst = []
@@ -322,11 +476,30 @@ class DynamixelController(threading.Thread):
 
         if len(pst_valuess) > 0:
             self.com.set(pt.GOAL_POS_SPEED_TORQUE, pst_mids, pst_valuess)
+            for m, pst_reqs in zip(self.motors, all_pst_requests):
+                for control in pst_reqs:
+                    self._resolve_futures(m, 'write', control)
 
         if len(st_valuess) > 0:
             self.com.set(pt.GOAL_POS_SPEED_TORQUE, st_mids, st_valuess)
 
 
+    def _handle_setpoints(self, all_pst_requests):
+        """\
+        Add the due setpoints of each motor to its pst requests. A write
+        requested explicitly in the same frame wins over the setpoint for the
+        same control, so that its future matches what was sent.
+        """
+        now = self.clock.time()
+        for m, pst_reqs in zip(self.motors, all_pst_requests):
+            if len(m.setpoints) > 0 and self._mtimeouts.get(m.id, now) <= now:
+                setpoint = m.setpoints.pop_due(now)
+                if setpoint is not None:
+                    _, position, speed = setpoint
+                    pst_reqs.setdefault(pt.GOAL_POSITION, position)
+                    if speed is not None:
+                        pst_reqs.setdefault(pt.MOVING_SPEED, speed)
+
     def _handle_special_requests(self, all_special_requests):
         # handling the resquests
         for motor, requests in zip(self.motors, all_special_requests):
@@ -345,63 +518,107 @@ class DynamixelController(threading.Thread):
                     if not hasattr(values, '__iter__'):
                         values = (values,)
                     self.com.set(control, (m.id,), (values,))
+                self._resolve_futures(m, 'write', control)
                 if not control.ram:
-                    now = time.time()
-                    self._mtimeouts[m.id] = max(self._mtimeouts.get(m.id, now), now)+0.020*len(control.sizes)
+                    now = self.clock.time()
+                    self._mtimeouts[m.id] = (max(self._mtimeouts.get(m.id, now), now)
+                                             + blackouts.duration(m.model, control))
 
     def _handle_all_read_rq(self, all_read_rq):
         # handling the resquests
         for m, requests in zip(self.motors, all_read_rq):
             for control, value in requests.items():
                 self.com.get(control, (m.id,))
+                self._resolve_futures(m, 'read', control)
 
 
-    def run(self):
-        while not self.stopped():
+    def _handling_requests(self):
+        """Divide the requests of the motors and send them"""
+        write_requests, write_pst_requests, read_requests = self._divide_requests()
+
+        self._handle_write_requests(write_requests)
+        self._handle_setpoints(write_pst_requests)
+        self._handle_all_pst_requests(write_pst_requests)
+        self._handle_all_read_rq(read_requests)
 
+    def _record_error(self, e):
+        """Attach a communication or motor error to its motor, and stop the loop"""
+        for m in self.motors:
+            if m.id == e.mid:
+                m._error.append(e)
+        self.stop()
+        self._fail_futures(e)
+
+    def _next_framecount(self):
+        with self._frame_cond:
             self.framecount += 1
+            self._frame_cond.notify_all()
 
-            self._pinglock.acquire()
-            self._ctrllock.acquire()
-            self._pinglock.release()
+    def _frame(self):
+        """One loop: read phase, frame callbacks, and handling of the requests"""
+        self._next_framecount()
 
-            start = time.time()
+        self._pinglock.acquire()
+        self._ctrllock.acquire()
+        self._pinglock.release()
 
-            try:
-                # reading present position, present speed, present load
-                self._reading_motors()
-
-                # Dividing requests
-                write_requests, write_pst_requests, read_requests = self._divide_requests()
-
-                # Handling requests
-                self._handle_write_requests(write_requests)
-                self._handle_all_pst_requests(write_pst_requests)
-                self._handle_all_read_rq(read_requests)
-            except (self.com.CommunicationError, self.com.TimeoutError) as e:
-                for m in self.motors:
-                    if m.id == e.mid:
-                        m._error.append(e)
-                self.stop()
-
-            except self.com.MotorError as e:
-                for m in self.motors:
-                    if m.id == e.mid:
-                        m._error.append(e)
-                self.stop()
+        try:
+            if len(self._mtimeouts) > 0:
+                self._probing_motors()
 
+            # reading present position, present speed, present load
+            self._reading_motors()
+            self._new_frame()
+
+            self._handling_requests()
+            self.com.save_frame()
+
+        except (self.com.CommunicationError, self.com.TimeoutError,
+                self.com.MotorError) as e:
+            self._record_error(e)
+
+        finally:
             self._ctrllock.release()
-            time.sleep(0.0001) # timeout to allow lock acquiring by other party
 
-            end = time.time()
+    def run(self):
+        while not self.stopped():
+            start = self.clock.time()
+
+            self._frame()
+            self.clock.sleep(0.0001) # timeout to allow lock acquiring by other party
 
+            end = self.clock.time()
             self.fps_history.append(end)
             dt = self._period - (end - start)
             if dt > 0:
-                time.sleep(dt)
+                self.clock.sleep(dt)
 
         self.close()
 
+    def step(self, frames=1):
+        """\
+        Run loops synchronously, in the calling thread, rather than starting
+        the controller thread. Nothing is slept: with a virtual clock, the
+        clock is advanced by one period after each loop, and with a V-REP
+        backend whose ``synchronous`` attribute is True (the scene must run in
+        synchronous mode), the simulation is triggered once per loop.
+
+        :arg frames:  the number of loops to run.
+        :return:      the frame sequence after the last loop.
+        """
+        if self.is_alive():
+            raise RuntimeError('step() cannot be used while the controller thread runs')
+        for _ in range(frames):
+            if self.stopped():
+                break
+            self._frame()
+            self.fps_history.append(self.clock.time())
+            if getattr(self.com, 'synchronous', False):
+                self.com.sim.simSynchronousTrigger()
+            if self.clock.virtual:
+                self.clock.advance(self._period)
+        return self.frameseq
+
     @property
     def fps(self):
         """ Number of loop per second over the last 2 seconds """
@@ -413,28 +630,134 @@ class DynamixelController(threading.Thread):
 
 
 class DynamixelControllerFullRam(DynamixelController):
-    """ Controller that reads the entire ram of the motor at every step """
-
-    def _reading_motors(self):
-        """ Read the motors entire RAM
+    """\
+    Controller that reads the entire RAM of the motors.
+
+    Only the populated part of the RAM of each model is read, using sync reads
+    (USB2AX) or bulk reads (MX motors) when possible. If reading everything in
+    one loop would exceed the bus budget, the reads are spread across several
+    loops in a round-robin fashion, and present position, speed and load are
+    read separately at every loop.
+    """
 
-        Note that this make USB2AX controllers sync read capability useless.
+    def __init__(self, motorcom, budget=None, **kwargs):
         """
+        :arg budget:  maximum number of bytes exchanged on the bus at each loop
+                      for reading the RAM. If None, half of the bus capacity at
+                      the target frequency is used (no limit if the baudrate is
+                      unknown, as with simulated motors).
 
+        Other arguments are passed to :py:class:`DynamixelController`.
+        """
+        DynamixelController.__init__(self, motorcom, **kwargs)
+        self.budget = budget
+        self.ram_rotating = False # True if the RAM is not read entirely at each loop
+
+        self._ram_jobs    = []
+        self._ram_mids    = None # motor ids for which the jobs were computed
+        self._ram_cursor  = 0
+        self._ram_futures = {}   # futures of ram reads, resolved after the next read of the ram
+
+    def _bus_budget(self):
+        if self.budget is not None:
+            return self.budget
+        baudrate = getattr(getattr(self.com, 'sio', None), 'baudrate', None)
+        if baudrate is None:
+            return float('inf')
+        return 0.5*self._period*baudrate/10.0 # 10 bits per byte on the wire
+
+    def _build_ram_jobs(self):
+        """Group the populated RAM chunks of the motors into read jobs"""
+        chunks = OrderedDict()
         for m in self.motors:
-            try:
-                try:
-                    self.com.read_ram(m.id)
-                except ValueError as ve:
-                    print('warning: reading status of motor {} failed with : {}'.format(m.id, ve.args[0]))
+            for control in pt.populated_chunks(m.model_bytes):
+                key = (control.addr, control.sizes)
+                chunks.setdefault(key, (control, []))[1].append(m.id)
+
+        self._ram_jobs = []
+        for control, mids in chunks.values():
+            if self.com.support_sync_read or self.com.support_bulk_read(mids):
+                self._ram_jobs.append((control, mids))
+            else: # one job per motor, so that rotation is fine-grained
+                self._ram_jobs.extend((control, [mid]) for mid in mids)
+        self._ram_mids = tuple(m.id for m in self.motors)
+        self._ram_cursor = 0
+
+    def _job_cost(self, control, mids):
+        """Estimation of the number of bytes exchanged for a job"""
+        size, n = sum(control.sizes), len(mids)
+        if n == 1:
+            return 8 + 6 + size
+        if self.com.support_sync_read:
+            return (7 + 1 + n) + (6 + n*size)
+        return (7 + 3*n) + n*(6 + size) # bulk read
 
-            except self.com.DynamixelCommunicationError as e:
-                print(e)
-                print('warning: communication error on motor {}'.format(m.id))
+    def _reading_motors(self):
+        """Read present position, speed and load, and the populated RAM"""
+        if self.ram_rotating or self._ram_mids is None:
+            DynamixelController._reading_motors(self)
+
+        if self._ram_mids != tuple(m.id for m in self.motors):
+            self._build_ram_jobs()
+        if len(self._ram_jobs) == 0:
+            return
+
+        budget, spent, done = self._bus_budget(), 0, 0
+        now = self.clock.time()
+        try:
+            while done < len(self._ram_jobs):
+                control, mids = self._ram_jobs[self._ram_cursor]
+                cost = self._job_cost(control, mids)
+                if done > 0 and spent + cost > budget:
+                    break
+                mids = [mid for mid in mids if self._mtimeouts.get(mid, now) <= now]
+                if len(mids) > 1 and not self.com.support_sync_read:
+                    self.com.bulk_get([(control, mid) for mid in mids])
+                elif len(mids) > 0:
+                    self.com.get(control, mids)
+                spent += cost
+                done  += 1
+                self._ram_cursor = (self._ram_cursor + 1) % len(self._ram_jobs)
+        except self.com.TimeoutError as e:
+            self.com.purge()
+            raise e
+
+        self.ram_rotating = done < len(self._ram_jobs)
+        self._resolve_ram_futures()
+
+    def _resolve_ram_futures(self):
+        """Resolve the futures of the ram read requests, once the ram was read"""
+        deferred, self._ram_futures = self._ram_futures, {}
+        now = self.clock.time()
+        for key, futures in deferred.items():
+            motor, _, control = key
+            if not self.ram_rotating and self._mtimeouts.get(motor.id, now) > now:
+                self._ram_futures[key] = futures # not read during the blackout
+                continue
+            self._futures.setdefault(key, []).extend(futures)
+            if self.ram_rotating:
+                self.com.get(control, (motor.id,))
+            self._resolve_futures(motor, 'read', control)
+
+    def _fail_futures(self, error):
+        for key, futures in self._ram_futures.items():
+            self._futures.setdefault(key, []).extend(futures)
+        self._ram_futures = {}
+        DynamixelController._fail_futures(self, error)
 
     def _handle_all_read_rq(self, all_read_rq):
-        """ Requests for reading ram are ignored in this class, since ram is continously updated. """
+        """\
+        Requests for reading ram are ignored in this class when the whole ram
+        is continously updated at each loop. Their futures are resolved after
+        the next read of the ram, so that the value is not older than the
+        request.
+        """
         for m, requests in zip(self.motors, all_read_rq):
             for control in requests.keys():
-                if not control.ram:
-                    self.com.get(control, m.id)
+                if self.ram_rotating or not control.ram:
+                    self.com.get(control, (m.id,))
+                    self._resolve_futures(m, 'read', control)
+                else:
+                    futures = self._futures.pop((m, 'read', control), None)
+                    if futures is not None:
+                        self._ram_futures.setdefault((m, 'read', control), []).extend(futures)
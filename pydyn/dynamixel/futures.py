@@ -0,0 +1,132 @@
+"""
+Futures of motor requests.
+
+A RequestFuture is returned by ``Motor.request_read(control, future=True)`` and
+``Motor.request_write(control, value, future=True)``. The controller resolves it
+as soon as the corresponding transaction is done: with the value read (or None
+for writes), or with the error that stopped the controller.
+
+>>> f = m.request_read('temperature', future=True)
+>>> f.result(timeout=0.1)
+43
+
+The future can also be awaited from an asyncio coroutine:
+
+>>> temperature = await m.request_read('temperature', future=True)
+"""
+from __future__ import print_function, division
+
+import threading
+import traceback
+
+
+class TimeoutError(Exception):
+    pass
+
+
+def _copy_state(future, waiter):
+    """Copy the outcome of a RequestFuture into an asyncio future"""
+    if waiter.cancelled():
+        return
+    if future._exception is not None:
+        waiter.set_exception(future._exception)
+    else:
+        waiter.set_result(future._result)
+
+
+class RequestFuture(object):
+
+    def __init__(self):
+        self._cond      = threading.Condition()
+        self._done      = False
+        self._result    = None
+        self._exception = None
+        self._callbacks = []
+
+    def __repr__(self):
+        if not self._done:
+            return '<RequestFuture pending>'
+        if self._exception is not None:
+            return '<RequestFuture error={!r}>'.format(self._exception)
+        return '<RequestFuture result={!r}>'.format(self._result)
+
+    # MARK Outcome
+
+    def done(self):
+        """Return True if the request was resolved"""
+        return self._done
+
+    def _wait(self, timeout):
+        with self._cond:
+            if not self._done:
+                self._cond.wait(timeout)
+            if not self._done:
+                raise TimeoutError('request not resolved after {} s'.format(timeout))
+
+    def result(self, timeout=None):
+        """\
+        Return the value read (None for writes), waiting for the request to be
+        resolved if needed.
+
+        :param timeout:     maximum time to wait, in seconds. None waits forever.
+        :raise TimeoutError:  if the request is not resolved after timeout.
+        :raise:             the error of the request, if it failed.
+        """
+        self._wait(timeout)
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Return the error of the request, or None if it succeeded. See result()."""
+        self._wait(timeout)
+        return self._exception
+
+    def add_done_callback(self, fn):
+        """\
+        Call fn(future) once the request is resolved, from the thread resolving
+        it (usually the controller thread), or immediately if it already is.
+        Callbacks should be short: they delay the control loop.
+        """
+        with self._cond:
+            if not self._done:
+                self._callbacks.append(fn)
+                return
+        self._call(fn)
+
+    # MARK Resolution
+
+    def set_result(self, value):
+        self._resolve(value, None)
+
+    def set_exception(self, exception):
+        self._resolve(None, exception)
+
+    def _resolve(self, value, exception):
+        with self._cond:
+            if self._done:
+                raise RuntimeError('request future already resolved')
+            self._result, self._exception = value, exception
+            self._done = True
+            self._cond.notify_all()
+            callbacks, self._callbacks = self._callbacks, []
+        for fn in callbacks:
+            self._call(fn)
+
+    def _call(self, fn):
+        try:
+            fn(self)
+        except Exception:
+            traceback.print_exc()
+
+    # MARK asyncio
+
+    def __await__(self):
+        import asyncio
+        try:
+            loop = asyncio.get_running_loop()
+        except AttributeError: # python < 3.7
+            loop = asyncio.get_event_loop()
+        waiter = loop.create_future()
+        self.add_done_callback(lambda future: loop.call_soon_threadsafe(_copy_state, future, waiter))
+        return waiter.__await__()
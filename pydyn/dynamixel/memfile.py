@@ -0,0 +1,187 @@
+"""
+On-disk history of the motors memory.
+
+A HistoryFile is a memory-mapped file of fixed-size records, one per motor
+and per frame, holding a timestamp, a monotonic timestamp, the motor id and
+the 74 memory cells (with their validity). It is a ring: once `capacity` records have been
+written, the oldest ones are overwritten, so the file size is bounded.
+
+The file can be opened read-only by another process while the robot runs:
+
+>>> h = HistoryFile('session.hist', mode='r')
+>>> records = h.records()     # numpy structured array, oldest first
+>>> records['cells'][:, pt.PRESENT_POSITION.addr]
+
+To record the memory of all motors of a bus at each loop of its controller:
+
+>>> ctrl.com.save_history(HistoryFile('session.hist', capacity=1000000))
+
+Records are then timestamped with the clock of the controller, like the other
+recorders (see :py:mod:`clock <pydyn.clock>`). The monotonic time of the write
+is stored next to it: unlike the wall clock, it never goes backwards when the
+system time is changed.
+"""
+from __future__ import print_function, division
+
+import os
+import time
+
+import numpy as np
+
+from .. import clock as clk
+from .memory import MEMORY_SIZE
+
+
+MAGIC   = b'PYDYNHST'
+VERSION = 2
+
+try:
+    monotonic = time.monotonic
+except AttributeError: # python 2
+    monotonic = time.time
+
+HEADER_DTYPE = np.dtype([('magic',       'S8'),
+                         ('version',     '<u4'),
+                         ('capacity',    '<u4'),
+                         ('count',        '<u8'), # total number of records written
+                         ('wall_origin',  '<f8'), # time.time() at creation...
+                         ('clock_origin', '<f8'), # ...and the time of the clock then
+                         ('pending',      '<u8'), # count once the records being written are
+                         ('mono_origin',  '<f8'), # monotonic time at creation
+                         ('_reserved',    'u1', (8,))])
+
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'), # time of the clock
+                         ('monotonic', '<f8'), # monotonic time of the write
+                         ('mid',       '<u1'),
+                         ('valid',     '?',  (MEMORY_SIZE,)),
+                         ('cells',     '<u2', (MEMORY_SIZE,))])
+
+
+class HistoryFile(object):
+
+    def __init__(self, filepath, capacity=100000, mode='w', clock=None):
+        """
+        :param filepath:  the path of the file.
+        :param capacity:  maximum number of records kept in the file. Ignored
+                          when opening an existing file.
+        :param mode:      'w' to create (or overwrite) the file, 'a' to append
+                          to an existing file, and 'r' to read it (possibly
+                          while another process writes it).
+        :param clock:     the clock timestamping records appended without a
+                          timestamp. Wall clock by default.
+        """
+        if mode not in ('r', 'w', 'a'):
+            raise ValueError("mode should be 'r', 'w' or 'a' (got {})".format(mode))
+        if mode == 'a' and not os.path.exists(filepath):
+            mode = 'w'
+        self.filepath = filepath
+        self.mode = mode
+        self.clock = clk.REALTIME if clock is None else clock
+
+        if mode == 'w':
+            size = HEADER_DTYPE.itemsize + capacity*RECORD_DTYPE.itemsize
+            self._map = np.memmap(filepath, dtype=np.uint8, mode='w+', shape=(size,))
+            self._header = self._map[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+            self._header['magic']       = MAGIC
+            self._header['version']     = VERSION
+            self._header['capacity']    = capacity
+            self._header['count']        = 0
+            self._header['pending']      = 0
+            self._header['wall_origin']  = time.time()
+            self._header['clock_origin'] = self.clock.time()
+            self._header['mono_origin']  = monotonic()
+        else:
+            self._map = np.memmap(filepath, dtype=np.uint8, mode='r' if mode == 'r' else 'r+')
+            self._header = self._map[:HEADER_DTYPE.itemsize].view(HEADER_DTYPE)
+            if self._header['magic'][0] != MAGIC:
+                raise IOError('{} is not a pydyn history file'.format(filepath))
+            if self._header['version'][0] != VERSION:
+                raise IOError('unsupported history file version ({})'.format(self._header['version'][0]))
+
+        self._records = self._map[HEADER_DTYPE.itemsize:].view(RECORD_DTYPE)
+
+    @property
+    def capacity(self):
+        return int(self._header['capacity'][0])
+
+    @property
+    def count(self):
+        """Total number of records written, including the overwritten ones"""
+        return int(self._header['count'][0])
+
+    def __len__(self):
+        return min(self.count, self.capacity)
+
+    def wall_time(self, timestamps):
+        """Convert timestamps of the file to wall clock times"""
+        return timestamps - self._header['clock_origin'][0] + self._header['wall_origin'][0]
+
+    def append(self, mid, cells, valid, timestamp=None):
+        """\
+        Append a record.
+
+        :param cells:      the 74 memory cells of the motor.
+        :param valid:      the 74 booleans telling which cells are known.
+        :param timestamp:  timestamp of the record. Now, according to the
+                           clock of the file, if None.
+        """
+        self.append_rows([mid], [cells], [valid], timestamp=timestamp)
+
+    def append_rows(self, mids, cells, valid, timestamp=None):
+        """Append one record per motor, all with the same timestamp"""
+        if self.mode == 'r':
+            raise IOError('history file opened in read-only mode')
+        if timestamp is None:
+            timestamp = self.clock.time()
+        count, capacity = self.count, self.capacity
+        indexes = np.arange(count, count + len(mids)) % capacity
+        # announced first, so that readers discard the records being overwritten
+        self._header['pending'] = count + len(mids)
+        self._records['timestamp'][indexes] = timestamp
+        self._records['monotonic'][indexes] = monotonic()
+        self._records['mid'][indexes]       = mids
+        self._records['cells'][indexes]     = cells
+        self._records['valid'][indexes]     = valid
+        # the count is updated last, so that readers never see partial records
+        self._header['count'] = count + len(mids)
+
+    def append_table(self, table, timestamp=None, mids=None):
+        """\
+        Append the memory of the motors of a MemoryTable.
+
+        :param mids:  if not None, only the motors with these ids are recorded.
+        """
+        rows = [row for row, mmem in enumerate(table.memories)
+                if mids is None or mmem.id in mids]
+        if len(rows) > 0:
+            self.append_rows([table.memories[row].id for row in rows],
+                             table.data[rows], table.valid[rows], timestamp=timestamp)
+
+    def records(self, last=None):
+        """\
+        Return a copy of the records available, in chronological order.
+
+        :param last:  if not None, return only the last `last` records.
+        """
+        count, capacity = self.count, self.capacity
+        n = min(count, capacity)
+        if last is not None:
+            n = min(n, last)
+        indexes = np.arange(count - n, count) % capacity
+        records = self._records[indexes] # fancy indexing copies
+
+        # records the writer overwrote, or was overwriting, while copying are
+        # discarded: all the records before the pending count are complete.
+        pending = max(int(self._header['pending'][0]), self.count)
+        overwritten = pending - capacity - (count - n)
+        if overwritten > 0:
+            records = records[overwritten:]
+        return records
+
+    def flush(self):
+        if self.mode != 'r':
+            self._map.flush()
+
+    def close(self):
+        self.flush()
+        del self._records, self._header, self._map
@@ -1,14 +1,129 @@
 """
 Motor memory. Keeps a cached image of the motor memory.
 It is only as uptodate as the last read of each address.
+
+The memories of all the motors of a bus are stored in a single MemoryTable:
+one row per motor, one column per address, with a mask of the cells that have
+been read. Each DynamixelMemory is a view on its row, and bulk consumers can
+access a column (eg. the present position of every motor) without copy.
+
+A MemorySnapshot is a read-only copy of some rows of the table, taken at once:
+it is consistent across motors, while the table itself is being updated by the
+controller thread.
 """
+import collections
 import numbers
+import threading
+
+import numpy as np
 
 from ..refs import protocol as pt
+from ..refs import exc
 from ..refs.conversions import MODEL_NAMES
 from . import memsave
 
 
+MEMORY_SIZE = 74
+MAX_MOTORS  = 254 # ids 0 to 253, 254 being the broadcast id
+
+# addresses the derived state (id, model, mode, status return level, lock) depends on
+DERIVED_ADDRS = frozenset((pt.MODEL_NUMBER.addr, pt.ID.addr,
+                           pt.CW_ANGLE_LIMIT.addr, pt.CCW_ANGLE_LIMIT.addr,
+                           pt.STATUS_RETURN_LEVEL.addr, pt.LOCK.addr))
+
+
+class MemorySnapshot(collections.namedtuple('MemorySnapshot',
+                                            ['frameseq', 'timestamp', 'mids', 'data', 'valid'])):
+    """\
+    Immutable copy of the memory of several motors, taken at one frame.
+
+    `data` and `valid` are read-only (motors x addresses) arrays, in the
+    order of `mids`.
+    """
+    __slots__ = ()
+
+    def column(self, addr):
+        """Return the values of a memory address for all motors"""
+        if isinstance(addr, pt.Control):
+            addr = addr.addr
+        return self.data[:, addr]
+
+    def row(self, mid):
+        """Return the memory cells of motor mid"""
+        return self.data[self.mids.index(mid)]
+
+
+class MemoryTable(object):
+    """\
+    Memory cells of several motors, as a (motors x addresses) array.
+
+    Unknown cells (never read) are marked as invalid in the `valid` mask, and
+    hold 0 in `data`. The arrays are allocated once, for `capacity` motors,
+    and never reallocated: the row views of the memories and the references
+    held by other threads (recorder, controller) stay valid when motors are
+    added while they run.
+    """
+
+    def __init__(self, capacity=MAX_MOTORS):
+        self.data  = np.zeros((capacity, MEMORY_SIZE), dtype=np.int32)
+        self.valid = np.zeros((capacity, MEMORY_SIZE), dtype=bool)
+        self.memories = [] # DynamixelMemory instances, by row
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.memories)
+
+    @property
+    def capacity(self):
+        return len(self.data)
+
+    def add(self, mmem):
+        """\
+        Attach a memory to the table. If a memory with the same id is already
+        in the table, its row is reused.
+
+        :return:  the row of the memory.
+        :raise ValueError:  if the table is full.
+        """
+        with self._lock:
+            for row, other in enumerate(self.memories):
+                if other.id == mmem.id:
+                    self.data[row], self.valid[row] = 0, False
+                    break
+            else:
+                row = len(self.memories)
+                if row == self.capacity:
+                    raise ValueError('memory table is full ({} motors)'.format(self.capacity))
+                self.memories.append(None)
+            self.memories[row] = mmem
+            mmem._bind(self, row)
+            return row
+
+    def row(self, mid):
+        """Return the row of the memory of motor mid"""
+        for row, mmem in enumerate(self.memories):
+            if mmem.id == mid:
+                return row
+        raise KeyError(mid)
+
+    def column(self, addr):
+        """\
+        Return the values of a memory address for all motors of the table, as
+        a view of the table data (the mask gives the valid entries).
+        """
+        if isinstance(addr, pt.Control):
+            addr = addr.addr
+        return self.data[:len(self.memories), addr]
+
+    def snapshot(self, rows, frameseq=None, timestamp=None):
+        """Return a MemorySnapshot of some rows of the table"""
+        data, valid = self.data[rows], self.valid[rows] # fancy indexing copies
+        data.flags.writeable  = False
+        valid.flags.writeable = False
+        return MemorySnapshot(frameseq, timestamp,
+                              tuple(self.memories[row].id for row in rows), data, valid)
+
+
 class DynamixelMemory(object):
     """
     This class keeps the last known memory values of a motor.
@@ -38,22 +153,32 @@ class DynamixelMemory(object):
     checking on the values.
     """
 
-    def __init__(self, mid, save=False, memory=None):
+    def __init__(self, mid, save=False, memory=None, table=None, history=None):
         """Initialize the memory.
 
         :param mid:    the id of the motor
         :param save:   if True, all memory changes are sparsely changed.
         :param memory: if given, initialize the memory with that data.
+        :param table:  the MemoryTable storing the memory. If None, the memory
+                       gets a table of its own.
+        :param history: the MemSave instance where changes are saved, eg. to
+                        bound its size. By default, an unbounded one.
         """
+        self.id = mid
+        self.version = 0   # incremented at each change of the memory
+        self._stale = True # derived state needs to be recomputed
+        if table is None:
+            table = MemoryTable(capacity=1)
+        table.add(self)
+
         if memory is not None:
-            self._memory_data = list(memory)
-        else:
-            self._memory_data = [None]*74
+            for addr, val in enumerate(memory):
+                if val is not None:
+                    self._data[addr], self._valid[addr] = val, True
 
         self.save = save
-        self.history = memsave.MemSave(74)
+        self.history = memsave.MemSave(MEMORY_SIZE) if history is None else history
 
-        self.id = mid
         self.status_return_level = 1 # to make first read possible
         self.model, self.modelclass = None, None
         self.mode, self.lock = None, None
@@ -61,45 +186,66 @@ class DynamixelMemory(object):
         if memory is not None:
             self.update()
 
-    def update(self):
-        """Update precalculated values"""
-        self.id = self._memory_data[pt.ID.addr]
+    def _bind(self, table, row):
+        """Point the memory to its row in the table"""
+        self.table, self.row = table, row
+        self._data, self._valid = table.data[row], table.valid[row]
+        self.version += 1
+
+    def update(self, force=False):
+        """\
+        Update precalculated values. They are only recomputed if one of the
+        addresses they depend on has changed since the last update.
+
+        :param force:  if True, recompute them anyway.
+        :raises UnsupportedModelError:  (a MotorError and a ValueError) if the
+                                        model number is not supported.
+        """
+        if not (self._stale or force):
+            return
+        self._stale = False
+
+        self.id = self[pt.ID.addr]
 
         try:
-            self.model = MODEL_NAMES[self._memory_data[pt.MODEL_NUMBER.addr]]
+            self.model = MODEL_NAMES[self[pt.MODEL_NUMBER.addr]]
             self.modelclass = self.model[:2]
         except KeyError:
-            print(("pydyn detected an unsupported motor model with model number"
-                   " {}. It may just be an particularly improbable error of "
-                   "transmission, or it could be a unsupported motor.\n"
-                   "To support a new motor, one only need to edit the file "
-                   "dynamixel/protocol.py in the source. Don't hesitate to "
-                   "submit a pull request in that case. Alternatively, you can "
-                   "open an issue on github with a link to your motor "
-                   "documentation."
-                   ).format(self._memory_data[pt.MODEL_NUMBER.addr]))
-            exit()
-
-        self.status_return_level = self._memory_data[pt.STATUS_RETURN_LEVEL.addr]
-
-        mode_test = (self._memory_data[pt.CW_ANGLE_LIMIT.addr] ==
-                     self._memory_data[pt.CCW_ANGLE_LIMIT.addr] == 0)
+            self._stale = True
+            raise exc.UnsupportedModelError(self.id, self[pt.MODEL_NUMBER.addr])
+
+        self.status_return_level = self[pt.STATUS_RETURN_LEVEL.addr]
+
+        mode_test = (self[pt.CW_ANGLE_LIMIT.addr] ==
+                     self[pt.CCW_ANGLE_LIMIT.addr] == 0)
         self.mode = 'wheel' if mode_test else 'joint'
 
-        self.lock = bool(self._memory_data[pt.LOCK.addr])
+        self.lock = bool(self[pt.LOCK.addr])
+
+    def begin_transaction(self, timestamp=None):
+        """In save mode, the cells changed until end_transaction() share one timestamp"""
+        if self.save:
+            self.history.begin(timestamp)
+
+    def end_transaction(self):
+        if self.save:
+            self.history.end()
 
     def _next_addr(self, addr):
-        if hasattr(addr, 'addr'): # for translating Control instances.
+        if isinstance(addr, pt.Control): # for translating Control instances.
             addr = addr.addr
-        if self._memory_data[addr+1] is None:
+        if not self._valid[addr+1]:
             return addr + 2
         else:
             return addr + 1
 
     def __getitem__(self, addr):
-        if hasattr(addr, 'addr'):
+        """Return the value of a memory cell, or None if it was never read"""
+        if isinstance(addr, pt.Control):
             addr = addr.addr
-        return self._memory_data[addr]
+        if self._valid[addr]:
+            return int(self._data[addr])
+        return None
 
     def __setitem__(self, addr, val):
         """Change memory cells values
@@ -109,6 +255,8 @@ class DynamixelMemory(object):
                       in consecutive addr, starting at addr.
         """
         assert not hasattr(val, '__iter__')
+        if isinstance(addr, pt.Control):
+            addr = addr.addr
         # if hasattr(val, '__iter__'):
         #     for v_i in val:
         #         self._set_addr(addr, v_i)
@@ -122,13 +270,16 @@ class DynamixelMemory(object):
             val = val.addr
         if not isinstance(val, numbers.Integral):
             raise ValueError("Motors bytes values should be integers (got {} of type {})".format(val, type(val)))
-        self._memory_data[addr] = val
+        if addr in DERIVED_ADDRS and not (self._valid[addr] and self._data[addr] == val):
+            self._stale = True
+        self._data[addr], self._valid[addr] = val, True
+        self.version += 1 # after the write, so that readers never cache a stale value
         if self.save:
             self.history[addr] = val
 
     def long_desc(self):
         """exhaustive repr of the entire raw memory"""
-        desc = '\n'.join('{:2i}: {:4i}'.format(address, value)
-                         for address, value in enumerate(self._memory_data)
-                         if value is not None)
+        desc = '\n'.join('{:2d}: {:4d}'.format(address, self[address])
+                         for address in range(MEMORY_SIZE)
+                         if self._valid[address])
         return desc + '\n'
@@ -1,13 +1,146 @@
+"""
+In-process history of memory cells.
+
+Each cell has a TimeStampedMemRow, storing values in chunks of CHUNK_SIZE
+entries. Timestamps are not stored per cell: each value references a
+transaction (eg. the read of a control, which updates several cells) in a
+TransactionLog, which holds one timestamp per transaction.
+
+Rows can be bounded in size (max_entries) and in age (max_age, in seconds):
+the oldest chunks are then discarded, along with the transaction timestamps
+that are no longer referenced.
+
+Timestamps are assumed nondecreasing, which allows to answer time-range
+queries by binary search:
+
+>>> values, timestamps = mmem.history[36].between(t0, t1) # numpy arrays
+>>> times, mins, maxs, means = mmem.history[36].downsample(0.1)
+"""
 import array
+import bisect
 import time
 
+import numpy as np
+
+CHUNK_SIZE = 256
+
+class TransactionLog(object):
+    """\
+    Timestamps of memory transactions, by transaction id.
+
+    A transaction is opened with begin() and closed with end(); all the cells
+    written in between reference the same timestamp. Cells written outside of
+    a transaction get a transaction of their own.
+    """
+
+    def __init__(self):
+        self._chunks = {} # chunk index -> array of timestamps
+        self._next = 0
+        self._open = None
+        self.rolled = False # True when a new chunk was started, until reset
+
+    def __len__(self):
+        """Number of transactions created"""
+        return self._next
+
+    def new(self, timestamp=None):
+        """Create a transaction, and return its id"""
+        if timestamp is None:
+            timestamp = time.time()
+        tx = self._next
+        chunk = tx // CHUNK_SIZE
+        if chunk not in self._chunks:
+            self._chunks[chunk] = array.array('d')
+            self.rolled = self.rolled or tx > 0
+        self._chunks[chunk].append(timestamp)
+        self._next += 1
+        return tx
+
+    def begin(self, timestamp=None):
+        self._open = self.new(timestamp)
+        return self._open
+
+    def end(self):
+        self._open = None
+
+    def current(self, timestamp=None):
+        """Return the open transaction, or a new one if none is open or a timestamp is given"""
+        if self._open is None or timestamp is not None:
+            return self.new(timestamp)
+        return self._open
+
+    def time(self, tx):
+        chunk, offset = divmod(tx, CHUNK_SIZE)
+        return self._chunks[chunk][offset]
+
+    def times(self, txs):
+        """Timestamps of a sequence of transactions, as a numpy array"""
+        txs = np.asarray(txs, dtype=np.int64)
+        if len(txs) == 0:
+            return np.zeros(0, dtype=float)
+        chunks, offsets = np.divmod(txs, CHUNK_SIZE)
+        first = int(chunks.min())
+        # the log chunks spanned by txs, as one (chunks, CHUNK_SIZE) array
+        table = np.empty((int(chunks.max()) - first + 1, CHUNK_SIZE), dtype=float)
+        for chunk in np.unique(chunks):
+            # a copy (the slice), so that the chunk never exports its buffer
+            # while the controller thread appends to it
+            log = self._chunks[int(chunk)]
+            log = np.frombuffer(log[:len(log)], dtype=float)
+            table[chunk - first, :len(log)] = log
+        return table[chunks - first, offsets]
+
+    @property
+    def chunk_count(self):
+        return len(self._chunks)
+
+    def evict(self, referenced):
+        """Discard the timestamps of the chunks whose index is not in `referenced`"""
+        current = (self._next - 1) // CHUNK_SIZE
+        for chunk in list(self._chunks):
+            if chunk != current and chunk not in referenced:
+                del self._chunks[chunk]
+
+
 class MemSave(object):
 
-    def __init__(self, size = 100):
-        self._mem = [TimeStampedMemRow() for i in range(size)]
+    def __init__(self, size = 100, max_entries = None, max_age = None):
+        """
+        :param size:         number of memory cells.
+        :param max_entries:  if not None, rows keep at least, and about, that
+                             many entries; older ones are discarded.
+        :param max_age:      if not None, entries older than max_age seconds
+                             (relative to the last entry of their row) are
+                             discarded.
+        """
+        self.log = TransactionLog()
+        self._bounded = max_entries is not None or max_age is not None
+        self._mem = [TimeStampedMemRow(log=self.log, max_entries=max_entries, max_age=max_age)
+                     for i in range(size)]
 
     def __setitem__(self, index, value):
         self._mem[index].append(value)
+        if self.log.rolled:
+            self.log.rolled = False
+            if self._bounded:
+                self._evict_log()
+
+    def __getitem__(self, index):
+        """Return the history row of a memory address"""
+        return self._mem[index]
+
+    def begin(self, timestamp=None):
+        """Open a transaction: cells written until end() share one timestamp"""
+        self.log.begin(timestamp)
+
+    def end(self):
+        self.log.end()
+
+    def _evict_log(self):
+        referenced = set()
+        for row in self._mem:
+            referenced.update(row.referenced_chunks())
+        self.log.evict(referenced)
 
 class MemRow(object):
 
@@ -20,7 +153,7 @@ class MemRow(object):
     def append(self, val):
         self._store[-1].append(val)
         self._size += 1
-        if (self._size % 256) == 0:
+        if (self._size % CHUNK_SIZE) == 0:
             self.compact()
 
     def compact(self):
@@ -41,32 +174,125 @@ class MemRow(object):
 
 class TimeStampedMemRow(MemRow):
 
-    def __init__(self, size = 2):
+    def __init__(self, size = 2, log = None, max_entries = None, max_age = None):
         MemRow.__init__(self, size)
-        self._timestamps = [[]]
+        self._log = TransactionLog() if log is None else log
+        self._txs  = [[]] # transaction ids, parallel to self._store
+        self._refs = []   # log chunks referenced by each full chunk
+        self._starts = [] # first timestamp of each chunk
+        self.max_entries, self.max_age = max_entries, max_age
+        self.evicted = 0  # number of entries discarded
 
     def compact(self):
         self._store[-1] = array.array(self._fmt, self._store[-1])
-        self._timestamps[-1] =  array.array('d', self._timestamps[-1])
+        self._txs[-1]   = array.array('I', self._txs[-1])
+        self._refs.append(set(tx // CHUNK_SIZE for tx in self._txs[-1]))
         self._store.append([])
-        self._timestamps.append([])
+        self._txs.append([])
+        self._evict()
 
-    def append(self, val):
+    def append(self, val, timestamp=None):
+        tx = self._log.current(timestamp)
+        if len(self._txs[-1]) == 0:
+            self._starts.append(self._log.time(tx))
         self._store[-1].append(val)
-        self._timestamps[-1].append(time.time())
+        self._txs[-1].append(tx)
         self._size += 1
-        if (self._size % 256) == 0:
+        if (self._size % CHUNK_SIZE) == 0:
             self.compact()
 
+    def _evict(self):
+        """Discard the oldest full chunks, according to max_entries and max_age"""
+        full, drop = len(self._store) - 1, 0
+        if self.max_entries is not None:
+            while drop < full and self._size - (drop+1)*CHUNK_SIZE >= self.max_entries:
+                drop += 1
+        if self.max_age is not None:
+            limit = self._log.time(self._txs[-2][-1]) - self.max_age
+            while drop < full and self._log.time(self._txs[drop][-1]) < limit:
+                drop += 1
+        if drop > 0:
+            del self._store[:drop], self._txs[:drop], self._refs[:drop], self._starts[:drop]
+            self._size   -= drop*CHUNK_SIZE
+            self.evicted += drop*CHUNK_SIZE
+
+    def referenced_chunks(self):
+        """Chunks of the transaction log referenced by the row"""
+        referenced = set(tx // CHUNK_SIZE for tx in self._txs[-1])
+        for refs in self._refs:
+            referenced |= refs
+        return referenced
+
     def __iter__(self):
-        for chunk, timechunk in zip(self._store, self._timestamps):
-            for val, timestamp in zip(chunk, timechunk):
-                yield val, timestamp
+        for chunk, txchunk in zip(self._store, self._txs):
+            for val, tx in zip(chunk, txchunk):
+                yield val, self._log.time(tx)
 
     def __getitem__(self, index):
         pindex = index % self._size
-        chunk, offset = divmod(pindex, 256)
-        return self._store[chunk][offset], self._timestamps[chunk][offset]
+        chunk, offset = divmod(pindex, CHUNK_SIZE)
+        return self._store[chunk][offset], self._log.time(self._txs[chunk][offset])
+
+    # MARK Time queries
+
+    def index_at(self, t, right=False):
+        """\
+        Return the index of the first value whose timestamp is not before t
+        (if right is True, after t), by binary search over the chunks.
+        """
+        bisect_f = bisect.bisect_right if right else bisect.bisect_left
+        chunk = bisect_f(self._starts, t) - 1
+        if chunk < 0:
+            return 0
+        timestamps = self._log.times(self._txs[chunk])
+        return CHUNK_SIZE*chunk + int(np.searchsorted(timestamps, t, side='right' if right else 'left'))
+
+    def _export(self, start, stop):
+        """Values and timestamps between two indexes, as numpy arrays"""
+        values, txs = [], []
+        if stop > start:
+            for chunk in range(start//CHUNK_SIZE, (stop-1)//CHUNK_SIZE + 1):
+                lo = max(start - CHUNK_SIZE*chunk, 0)
+                hi = min(stop  - CHUNK_SIZE*chunk, CHUNK_SIZE)
+                values.append(np.array(self._store[chunk][lo:hi], dtype=np.int64))
+                txs.append(np.array(self._txs[chunk][lo:hi], dtype=np.int64))
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=float)
+        return np.concatenate(values), self._log.times(np.concatenate(txs))
+
+    def between(self, t0=None, t1=None):
+        """\
+        Return the values and timestamps in the time range [t0, t1], as two
+        numpy arrays. A None bound means no bound.
+        """
+        start = 0 if t0 is None else self.index_at(t0)
+        stop  = self._size if t1 is None else self.index_at(t1, right=True)
+        return self._export(start, stop)
+
+    def to_numpy(self):
+        """Return all the values and timestamps, as two numpy arrays"""
+        return self._export(0, self._size)
+
+    def downsample(self, period, t0=None, t1=None):
+        """\
+        Summarize the values of the time range [t0, t1] over consecutive
+        buckets of `period` seconds. Empty buckets are omitted.
+
+        :return:  the start time of each bucket, and the min, max and mean of
+                  the values in each bucket, as numpy arrays.
+        """
+        values, timestamps = self.between(t0, t1)
+        if len(values) == 0:
+            empty = np.zeros(0)
+            return empty, empty, empty, empty
+        origin = timestamps[0] if t0 is None else t0
+        buckets = np.floor((timestamps - origin)/period).astype(np.int64)
+        firsts = np.concatenate(([0], np.flatnonzero(np.diff(buckets)) + 1))
+        counts = np.diff(np.append(firsts, len(values)))
+        return (origin + buckets[firsts]*period,
+                np.minimum.reduceat(values, firsts),
+                np.maximum.reduceat(values, firsts),
+                np.add.reduceat(values, firsts)/counts)
 
 if __name__ == '__main__':
     mr = TimeStampedMemRow(size = 2)
@@ -33,6 +33,11 @@ return None. Note that if you request multiple values for the same variable,
 only the last one at the start of the next controller loop will be taken into
 account.
 
+request_read() and request_write() can also return a future, resolved by the
+controller as soon as the request is done:
+
+>>> m.request_read('temperature', future=True).result(timeout=0.1)
+
 For every variable, there is an alternative bytes variable if the unit or value
 differs (no bytes for id, firmware for example). You can use them to access the
 bytes integer value present in the hardware memory register.
@@ -47,7 +52,10 @@ from .. import color
 from ..refs import protocol as pt
 from ..refs import limits
 from ..refs import conversions as conv
+from ..refs import luts
 from ..refs import exc
+from . import setpoints
+from . import futures
 
 class ROByteMotorControl(object):
     def __init__(self, control, doc=''):
@@ -70,13 +78,27 @@ class RWByteMotorControl(ROByteMotorControl):
         instance._register_write(self.control, value)
 
 class ROMotorControl(ROByteMotorControl):
+    """\
+    Converted values are cached on the motor instance, along with the version
+    of the memory they were computed from: they are converted again only
+    after the memory changed. Conversions are lookups in the precomputed
+    tables of refs.luts when the control is tabulated.
+    """
 
     def __get__(self, instance, owner):
         if instance is None:
             return self
-        byte_value = instance.mmem[self.control]
-        return conv.CONV[self.control][1](byte_value, modelclass=instance.modelclass,
-                                                      mode=instance.mode)
+        mmem = instance.mmem
+        version = mmem.version # read before the value, see DynamixelMemory._set_addr
+        cached = instance._conv_cache.get(self.control)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        byte_value = mmem[self.control]
+        value = luts.bytes2(self.control, byte_value, modelclass=mmem.modelclass,
+                                                      mode=mmem.mode)
+        if not isinstance(value, list): # mutable values are not shared
+            instance._conv_cache[self.control] = (version, value)
+        return value
 
 class RWMotorControl(ROMotorControl):
 
@@ -88,13 +110,67 @@ class RWMotorControl(ROMotorControl):
         instance._register_write(self.control, byte_value)
 
 
+def register_writes(motors, control, values):
+    """\
+    Register a write request of control on several motors at once. Values are
+    in bytes and are not checked.
+
+    Requests of motors sharing a request lock (the motors of a controller) are
+    registered in a single critical section: the controller sends them in the
+    same frame.
+    """
+    register_grouped(lock_groups(motors, [((control, value),) for value in values]))
+
+def lock_groups(motors, requests):
+    """\
+    Group write requests of several motors by request lock, for
+    register_grouped(). The grouping can be computed once and the requests
+    registered many times.
+
+    :param requests:  for each motor, a sequence of (control, value) pairs,
+                      values in bytes.
+    """
+    groups = collections.OrderedDict() # lock id -> (lock, [(motor, requests), ...])
+    for m, reqs in zip(motors, requests):
+        groups.setdefault(id(m.request_lock), (m.request_lock, []))[1].append((m, tuple(reqs)))
+    return tuple(groups.values())
+
+def register_grouped(groups):
+    """Register write requests grouped by lock_groups(), one critical section per group"""
+    for _, requests in groups:
+        for m, _ in requests:
+            for err in m._error:
+                raise err
+    for lock, requests in groups:
+        with lock:
+            for m, reqs in requests:
+                for control, value in reqs:
+                    m.write_requests.pop(control, None) # so that order is kept consistent
+                    m.write_requests[control] = value
+
+
+# attribute names of each motor class, see Motor.__setattr__
+_attribute_names = {}
+
 class Motor(object):
 
-    MotorError = exc.MotorError
+    # no per-instance __dict__: new attributes cannot be defined on motors.
+    __slots__ = ('mmem', '_conv_cache', 'read_requests', 'write_requests', 'request_lock',
+                 '_futures', '_joint_angle_limits_bytes', '_error', 'setpoints')
 
-    def __init__(self, memory):
+    MotorError = exc.MotorError
 
+    def __init__(self, memory, request_lock=None):
+        """\
+        :param memory:        the DynamixelMemory of the motor.
+        :param request_lock:  the lock protecting the requests dictionaries.
+                              The motors of a controller share the lock of the
+                              controller, so that requests registered on
+                              several motors at once are sent together.
+        """
         object.__setattr__(self, 'mmem', memory) # self.mmem = memory
+        # converted values, by control, see ROMotorControl
+        object.__setattr__(self, '_conv_cache', {})
 
         # these dictionaries collect write or read request on part of non standart
         # memory (not pos, speed, load (read) or torque lim, moving speed goal pos (write))
@@ -104,7 +180,12 @@ class Motor(object):
         # Controller access and modify it. But the semaphore should only be acquired for
         # the duration of atomic actions on the dictionary, and not, for instance, the
         # serial communication related to a request.
-        object.__setattr__(self, 'request_lock', threading.Lock()) # self.request_lock = threading.Lock()
+        if request_lock is None:
+            request_lock = threading.Lock()
+        object.__setattr__(self, 'request_lock', request_lock) # self.request_lock = request_lock
+        # futures of the requests, ('read' or 'write', control) -> [RequestFuture, ...],
+        # protected by the request lock. See request_read() and request_write().
+        object.__setattr__(self, '_futures', {})
 
         # backing up angle limits to switch between joint and wheel mode
         object.__setattr__(self, '_joint_angle_limits_bytes', self.angle_limits_bytes) # self._joint_angle_limits_bytes = self.angle_limits_bytes
@@ -112,6 +193,9 @@ class Motor(object):
         # if a motor error is detected on the motor, a MotorError instance will be put in this list.
         object.__setattr__(self, '_error', [])
 
+        # timestamped goal position/moving speed, consumed by the controller.
+        object.__setattr__(self, 'setpoints', setpoints.SetpointQueue())
+
     def __repr__(self):
         return 'M{}'.format(self.id)
 
@@ -124,7 +208,13 @@ class Motor(object):
             return  1
 
     def __setattr__(self, attr, value):
-        if hasattr(self, attr):
+        # checking the class attributes, rather than hasattr(self, attr),
+        # avoids reading (and converting) the current value of controls.
+        try:
+            names = _attribute_names[type(self)]
+        except KeyError:
+            names = _attribute_names[type(self)] = frozenset(dir(type(self)))
+        if attr in names:
             object.__setattr__(self, attr, value)
         else:
             raise AttributeError(("'{}' assignement error. This attribute does not exist "
@@ -161,41 +251,63 @@ class Motor(object):
         """
         if not isinstance(control, pt.Control):
             control = control.lower()
-            if control in self.aliases:
-                control = self.aliases[control]
+            if control in aliases:
+                control = aliases[control]
             control = pt.CTRL[control.upper()]
         return control
 
-    def request_read(self, control):
+    def request_read(self, control, future=False):
         """\
         Request a specific value of the motor to be refreshed
 
         :arg control:  the name of the value. See the :py:mod:`protocol <pydyn.refs.protocol>` module for the list of values.
+        :arg future:   if True, return a :py:class:`RequestFuture <pydyn.dynamixel.futures.RequestFuture>`,
+                       resolved with the (converted) value once it was read.
         """
         control = self._str2ctrl(control, aliases=Motor.aliases_read)
+        request_future = futures.RequestFuture() if future else None
 
         self.request_lock.acquire()
         try:
             if control in self.read_requests:
                 self.read_requests.pop(control) # so that order is kept consistent
             self.read_requests[control] = True
+            if request_future is not None:
+                self._futures.setdefault(('read', control), []).append(request_future)
         except Exception as e:
             self.request_lock.release()
             raise e
         self.request_lock.release()
+        return request_future
 
-    def request_write(self, control, value):
+    def request_write(self, control, value, future=False):
         """\
         Request a specific write on the motor
 
-        :arg name:  the name of the value. See the :py:mod:`protocol <pydyn.refs.protocol>` module for the list of values.
+        :arg name:    the name of the value. See the :py:mod:`protocol <pydyn.refs.protocol>` module for the list of values.
+        :arg future:  if True, return a :py:class:`RequestFuture <pydyn.dynamixel.futures.RequestFuture>`,
+                      resolved with None once the value was written.
+        :raise ValueError:  if future is True and the control is handled by a
+                      property of the motor (eg. angle limits, which may write
+                      several controls and change the mode): no future is
+                      available for these, and nothing is written.
         """
         for err in self._error:
             raise err
         control = self._str2ctrl(control, aliases=Motor.aliases_write)
-        setattr(self, control, value) # for bound checking, mode handling
-
-    def _register_write(self, control, val): # TODO this is a bad name for ACTION/REGISTERED
+        if not isinstance(getattr(type(self), control.name.lower(), None), RWMotorControl):
+            if future:
+                raise ValueError('no request future for {}'.format(control.name.lower()))
+            setattr(self, control.name.lower(), value) # for bound checking, mode handling
+            return None
+
+        limits.CHECK[control](value, modelclass=self.modelclass, mode=self.mode)
+        byte_value = conv.CONV[control][0](value, modelclass=self.modelclass, mode=self.mode)
+        request_future = futures.RequestFuture() if future else None
+        self._register_write(control, byte_value, future=request_future)
+        return request_future
+
+    def _register_write(self, control, val, future=None): # TODO this is a bad name for ACTION/REGISTERED
         """Register the write request for the controller benefit"""
         for err in self._error:
             raise err
@@ -204,11 +316,46 @@ class Motor(object):
             if control in self.write_requests:
                 self.write_requests.pop(control) # so that order is kept consistent
             self.write_requests[control] = val
+            if future is not None:
+                self._futures.setdefault(('write', control), []).append(future)
         except BaseException as e:
             self.request_lock.release()
             raise e
         self.request_lock.release()
 
+    def _read_value(self, control):
+        """The value of control in memory, converted if a conversion exists"""
+        value = self.mmem[control]
+        if control in conv.CONV:
+            value = luts.bytes2(control, value, modelclass=self.modelclass, mode=self.mode)
+        return value
+
+
+    def push_setpoint(self, t, position, speed=None):
+        """\
+        Schedule a goal position (and optionally a moving speed) to be sent
+        by the controller at time `t`. Values are checked and converted
+        immediately.
+
+        :param t:         time at which to send the setpoint, as given by the
+                          controller clock (``time.time()`` by default).
+        :param position:  goal position, in degrees.
+        :param speed:     moving speed, in degrees per second. If None, the
+                          moving speed is not modified.
+        """
+        for err in self._error:
+            raise err
+        limits.CHECK[pt.GOAL_POSITION](position, modelclass=self.modelclass,
+                                                       mode=self.mode)
+        position_bytes = conv.CONV[pt.GOAL_POSITION][0](position, modelclass=self.modelclass,
+                                                                        mode=self.mode)
+        speed_bytes = None
+        if speed is not None:
+            limits.CHECK[pt.MOVING_SPEED](speed, modelclass=self.modelclass,
+                                                        mode=self.mode)
+            speed_bytes = conv.CONV[pt.MOVING_SPEED][0](speed, modelclass=self.modelclass,
+                                                                     mode=self.mode)
+        self.setpoints.push(t, position_bytes, speed_bytes)
 
     def requested_read(self, control):
         """\
@@ -316,7 +463,7 @@ class Motor(object):
 
     @property
     def cw_angle_limit(self):
-        return conv.CONV[pt.CW_ANGLE_LIMIT][1](self.cw_angle_limit_bytes, modelclass=self.modelclass, mode=self.mode)
+        return luts.bytes2(pt.CW_ANGLE_LIMIT, self.cw_angle_limit_bytes, modelclass=self.modelclass, mode=self.mode)
 
     @property
     def cw_angle_limit_bytes(self):
@@ -337,7 +484,7 @@ class Motor(object):
 
     @property
     def ccw_angle_limit(self):
-        return conv.CONV[pt.CCW_ANGLE_LIMIT][1](self.ccw_angle_limit_bytes, modelclass=self.modelclass, mode=self.mode)
+        return luts.bytes2(pt.CCW_ANGLE_LIMIT, self.ccw_angle_limit_bytes, modelclass=self.modelclass, mode=self.mode)
 
     @property
     def ccw_angle_limit_bytes(self):
@@ -624,6 +771,8 @@ class Motor(object):
 # instead that grant us more flexibility
 class ComplianceMarginSlopeExtra(object):
 
+    __slots__ = ()
+
     # MARK Compliance margin
     cw_compliance_margin_bytes  = RWByteMotorControl(pt.CW_COMPLIANCE_MARGIN)
     cw_compliance_margin        =     RWMotorControl(pt.CW_COMPLIANCE_MARGIN)
@@ -655,6 +804,8 @@ class ComplianceMarginSlopeExtra(object):
 
 class PIDExtra(object):
 
+    __slots__ = ()
+
     # MARK PID Gains
     d_gain_bytes     = RWByteMotorControl(pt.D_GAIN)
     d_gain           =     RWMotorControl(pt.D_GAIN)
@@ -673,6 +824,8 @@ class PIDExtra(object):
 
 class SensedCurrentExtra(object):
 
+    __slots__ = ()
+
     # MARK Sensed Current
     sensed_current_bytes = ROByteMotorControl(pt.SENSED_CURRENT)
     sensed_current       =     ROMotorControl(pt.SENSED_CURRENT)
@@ -680,6 +833,8 @@ class SensedCurrentExtra(object):
 
 class CurrentExtra(object):
 
+    __slots__ = ()
+
     # MARK Current
     current_bytes = RWByteMotorControl(pt.CURRENT)
     current       =     RWMotorControl(pt.CURRENT)
@@ -690,6 +845,8 @@ class CurrentExtra(object):
 
 class TorqueModeExtra(object):
 
+    __slots__ = ()
+
     # MARK Torque Control Mode
     torque_control_mode_enable_bytes = RWByteMotorControl(pt.TORQUE_CONTROL_MODE_ENABLE)
     torque_control_mode_enable       =     RWMotorControl(pt.TORQUE_CONTROL_MODE_ENABLE)
@@ -705,6 +862,8 @@ class TorqueModeExtra(object):
 
 class GoalAccelerationExtra(object):
 
+    __slots__ = ()
+
     # MARK Goal Acceleration
     goal_acceleration_bytes = RWByteMotorControl(pt.GOAL_ACCELERATION)
     goal_acceleration       =     RWMotorControl(pt.GOAL_ACCELERATION)
@@ -712,31 +871,31 @@ class GoalAccelerationExtra(object):
 
 class AXMotor(Motor, ComplianceMarginSlopeExtra):
     """AX-12 motors"""
-    pass
+    __slots__ = ()
 
 class RXMotor(Motor, ComplianceMarginSlopeExtra):
     """RX-28 and RX-64 motors"""
-    pass
+    __slots__ = ()
 
 class EXMotor(Motor, ComplianceMarginSlopeExtra, SensedCurrentExtra):
-    pass
+    __slots__ = ()
 
 class MXMotor(Motor, PIDExtra, CurrentExtra, GoalAccelerationExtra):
     """MX-28, MX-64 and MX-128 motors"""
-    pass
+    __slots__ = ()
 
 class MX28Motor(MXMotor):
-    pass
+    __slots__ = ()
 
 class MX64Motor(MXMotor):
-    pass
+    __slots__ = ()
 
 class MX106Motor(MXMotor):
-    pass
+    __slots__ = ()
 
 class VXMotor(Motor, PIDExtra):
     """VX-28, and VX-64 motors, used by the V-Rep simulation"""
-    pass
+    __slots__ = ()
 
 MOTOR_MODELS = {
     'AX-12'   : AXMotor,
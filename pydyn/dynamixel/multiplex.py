@@ -0,0 +1,320 @@
+"""
+Multiplexing controller.
+
+A DynamixelMultiplexer drives several buses, each one handled by a (non
+started) DynamixelController, from a single thread. At each loop, the read
+instructions are sent on every bus at once, and the status packets are parsed
+as they arrive, waiting on all the ports with select. The read phase then lasts
+as long as the slowest bus, rather than the sum of all buses, without one
+thread per bus.
+
+Buses whose port does not provide a file descriptor (pyftdi, simulated motors)
+and controllers with a custom read phase (eg. DynamixelControllerFullRam) are
+read sequentially, while the answers of the other buses are on their way.
+
+>>> mux = DynamixelMultiplexer([ctrl0, ctrl1])
+>>> mux.start()
+
+.. note:: select() on serial ports is only available on POSIX systems.
+"""
+from __future__ import print_function, division
+
+import collections
+import select
+import threading
+
+from ..refs import protocol as pt
+from ..ios.serialio import packet
+from .controller import DynamixelControllerFullRam
+
+
+class _BusReader(object):
+    """\
+    Non-blocking read phase of one bus.
+
+    The com lock is held from the sending of each instruction to the
+    processing of its status packet (or the abort), so that other threads
+    using the com (ping, direct reads) do not interleave packets on the bus.
+    """
+
+    def __init__(self, ctrl, fd):
+        self.ctrl = ctrl
+        self.com  = ctrl.com
+        self.fd   = fd
+        self.deadline = None
+
+        self._transactions = collections.deque()
+        self._current = None
+        self._buffer  = bytearray()
+        self._locked  = False
+
+    @property
+    def busy(self):
+        return self._current is not None
+
+    def start(self):
+        """Plan the reads of the present position, speed and load, and send the first one"""
+        now = self.ctrl.clock.time()
+        mids = [m.id for m in self.ctrl.motors
+                if self.ctrl._mtimeouts.get(m.id, now) <= now
+                and self.com.mmems[m.id].status_return_level != 0]
+        control = pt.PRESENT_POS_SPEED_LOAD
+        for group in self.com._read_groups(control, mids):
+            inst_packet, status_mid = self.com._read_instruction(control, group)
+            self._transactions.append((control, group, inst_packet, status_mid))
+        self._buffer = bytearray()
+        self._next()
+
+    def abort(self):
+        self._transactions.clear()
+        self._current = None
+        self._release()
+
+    def _release(self):
+        if self._locked:
+            self._locked = False
+            self.com._lock.release()
+
+    def _next(self):
+        """Send the next instruction, if any"""
+        self._current = None
+        self._release()
+        if len(self._transactions) > 0:
+            self.com._lock.acquire()
+            self._locked = True
+            self._current = self._transactions.popleft()
+            inst_packet = self._current[2]
+            try:
+                n = self.com.sio.write(bytes(inst_packet.data))
+                if n != len(inst_packet):
+                    raise self.com.CommunicationError('Packet not correctly sent', inst_packet, None)
+            except Exception:
+                self.abort() # whatever the error, the com lock is not kept
+                raise
+            self.deadline = self.ctrl.clock.time() + self.com.sio.timeout/1000.0
+
+    def on_readable(self):
+        """Buffer the available bytes, and process the complete status packets"""
+        self._buffer += self.com.sio.read_available()
+        while self._current is not None:
+            control, mids, inst_packet, status_mid = self._current
+            if len(self._buffer) < packet.HEADER_SIZE:
+                return
+            self.com._check_header(inst_packet, self._buffer[:packet.HEADER_SIZE], status_mid)
+            size = packet.HEADER_SIZE + self._buffer[3]
+            if len(self._buffer) < size:
+                return
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+            status_packet = self.com._check_status(inst_packet, data)
+            self.com._update_read(control, mids, inst_packet, status_packet)
+            self._next()
+
+    def check_timeout(self, now):
+        if self._current is not None and now > self.deadline:
+            self.com.purge()
+            raise self.com.TimeoutError(self._current[2])
+
+
+class DynamixelMultiplexer(threading.Thread):
+    """\
+    Run the loops of several controllers, one per bus, in a single thread.
+
+    The controllers must not be started: the multiplexer executes their read
+    phase, frame callbacks and requests at each of its own loops. A
+    communication error on a bus stops its controller only; the other buses
+    keep running.
+    """
+
+    def __init__(self, controllers, freq=60):
+        """
+        :arg controllers:  DynamixelController instances, one per bus, with
+                           their motors already loaded. They must share the
+                           same clock, which times the loops.
+        :arg freq:         the target frequence of the loops in Hz.
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+
+        self.controllers = list(controllers)
+        for ctrl in self.controllers:
+            if ctrl.is_alive():
+                raise ValueError('controllers should not be started when multiplexed')
+        self.clock = self.controllers[0].clock
+        if any(ctrl.clock is not self.clock for ctrl in self.controllers):
+            raise ValueError('multiplexed controllers should share the same clock')
+
+        self.freq = freq
+        self.fps_history = collections.deque(maxlen = 3*freq)
+        self.framecount = 0
+        self._stop_event = threading.Event()
+
+        self._readers = [self._bus_reader(ctrl) for ctrl in self.controllers]
+
+    @staticmethod
+    def _bus_reader(ctrl):
+        """Return a _BusReader for the controller, or None if its bus must be read sequentially"""
+        if isinstance(ctrl, DynamixelControllerFullRam):
+            return None
+        try:
+            return _BusReader(ctrl, ctrl.com.sio.fileno())
+        except (AttributeError, IOError, ValueError):
+            return None
+
+    @property
+    def motors(self):
+        return [m for ctrl in self.controllers for m in ctrl.motors]
+
+    # freq and period property, to ensure they remain coherent
+
+    @property
+    def freq(self):
+        """ Target frequence of the loops. """
+        return self._freq
+
+    @freq.setter
+    def freq(self, val):
+        self._freq = val
+        self._period = 1.0/val
+
+    @property
+    def period(self):
+        """ Target period of the loops. """
+        return self._period
+
+    @period.setter
+    def period(self, val):
+        self._freq = 1.0/val
+        self._period = val
+
+    def stop(self):
+        """Stop the thread after the end of the current loop"""
+        self._stop_event.set()
+        for ctrl in self.controllers:
+            ctrl.stop()
+
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def close(self, immediately=True):
+        """ Close the serial connections
+
+            :arg immediately:  if False, wait for the end of the current loop.
+        """
+        self.stop()
+        if not immediately and self.is_alive():
+            self.join(0.1)
+        for ctrl in self.controllers:
+            ctrl.close()
+
+    def wait(self, loops):
+        """Wait a number of loops."""
+        ctrl = self.controllers[0]
+        if self.is_alive():
+            with ctrl._frame_cond:
+                frame = ctrl.framecount
+                while frame + loops >= ctrl.framecount and not ctrl.stopped():
+                    ctrl._frame_cond.wait()
+
+    def wait_frame(self, timeout=None):
+        """\
+        Block until the next read phase has completed. The frame sequence
+        returned is the one of the first controller.
+        """
+        return self.controllers[0].wait_frame(timeout)
+
+    # MARK Loop
+
+    def _guarded(self, ctrl, f):
+        """Call f; on a communication or motor error, stop the controller"""
+        try:
+            f()
+        except (ctrl.com.CommunicationError, ctrl.com.TimeoutError,
+                ctrl.com.MotorError) as e:
+            ctrl._record_error(e)
+            return False
+        return True
+
+    def _reading_buses(self, active):
+        """Read phase of all buses"""
+        readers = []
+        try:
+            for ctrl, reader in active:
+                if reader is not None:
+                    readers.append(reader)
+                    if not self._guarded(ctrl, reader.start):
+                        reader.abort()
+
+            # sequential buses, while the answers of the others are on their way
+            for ctrl, reader in active:
+                if reader is None:
+                    self._guarded(ctrl, ctrl._reading_motors)
+
+            readers = [r for r in readers if r.busy]
+            while len(readers) > 0:
+                timeout = max(0.0, min(r.deadline for r in readers) - self.clock.time())
+                readable, _, _ = select.select([r.fd for r in readers], [], [], timeout)
+                if len(readable) == 0 and self.clock.virtual:
+                    self.clock.advance(timeout) # the wait for the answers, in simulated time
+                for reader in readers:
+                    def step():
+                        if reader.fd in readable:
+                            reader.on_readable()
+                        reader.check_timeout(self.clock.time())
+                    if not self._guarded(reader.ctrl, step):
+                        reader.abort()
+                readers = [r for r in readers if r.busy]
+        finally:
+            for reader in readers:
+                reader.abort() # releases the com locks on unexpected errors
+
+    def run(self):
+        while not self.stopped():
+            active = [(ctrl, reader) for ctrl, reader in zip(self.controllers, self._readers)
+                      if not ctrl.stopped()]
+            if len(active) == 0:
+                break
+
+            self.framecount += 1
+            start = self.clock.time()
+            locked = [] # controllers whose lock is held, released whatever happens
+            try:
+                for ctrl, _ in active:
+                    ctrl._next_framecount()
+                    ctrl._pinglock.acquire()
+                    ctrl._ctrllock.acquire()
+                    locked.append(ctrl)
+                    ctrl._pinglock.release()
+
+                for ctrl, _ in active:
+                    if len(ctrl._mtimeouts) > 0:
+                        self._guarded(ctrl, ctrl._probing_motors)
+
+                self._reading_buses([(c, r) for c, r in active if not c.stopped()])
+
+                for ctrl, _ in active:
+                    if not ctrl.stopped():
+                        ctrl._new_frame() # frame callbacks errors are caught there
+                        if self._guarded(ctrl, ctrl._handling_requests):
+                            ctrl.com.save_frame(timestamp=self.clock.time())
+            finally:
+                for ctrl in locked:
+                    ctrl._ctrllock.release()
+
+            self.clock.sleep(0.0001) # timeout to allow lock acquiring by other party
+
+            end = self.clock.time()
+            self.fps_history.append(end)
+            dt = self._period - (end - start)
+            if dt > 0:
+                self.clock.sleep(dt)
+
+        self.close()
+
+    @property
+    def fps(self):
+        """ Number of loop per second over the last 2 seconds """
+        len_fps = len(self.fps_history)
+        if len_fps < 2:
+            return 0.0
+        else:
+            return len_fps/(self.fps_history[len_fps-1] - self.fps_history[1])
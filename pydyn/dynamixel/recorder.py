@@ -0,0 +1,172 @@
+"""
+Columnar telemetry recorder.
+
+A Recorder appends, after each read phase of a controller, the present
+position, speed and load of its motors to preallocated numpy buffers. Full
+buffers are written to disk as numbered chunk files by a background thread, so
+the control loop never waits for the disk.
+
+Each chunk holds aligned per-frame arrays:
+
+    * 'timestamp': (frames,) controller clock time of the read phase.
+    * 'frameseq':  (frames,) frame sequence number of the controller.
+    * 'position', 'speed', 'load': (frames, motors) raw values, in bytes.
+
+and, in npz chunks, the motor ids ('mids'). With the 'npy' format, a chunk is
+one structured array with the same fields.
+
+>>> rec = Recorder(ctrl, 'session/')
+>>> rec.start()
+>>> ...
+>>> rec.stop()
+>>> data = load('session/')
+"""
+from __future__ import print_function, division
+
+import os
+import glob
+import threading
+try:
+    import queue
+except ImportError: # python 2
+    import Queue as queue
+
+import numpy as np
+
+from ..refs import protocol as pt
+
+
+FORMATS = ('npz', 'npy')
+FIELDS  = ((pt.PRESENT_POSITION, 'position'),
+           (pt.PRESENT_SPEED,    'speed'),
+           (pt.PRESENT_LOAD,     'load'))
+
+
+class Recorder(object):
+
+    def __init__(self, ctrl, dirpath, motors=None, chunk_size=1000, fmt='npz', prefix='frames'):
+        """
+        :param ctrl:        the controller whose frames are recorded.
+        :param dirpath:     directory where chunks are written (created if needed).
+        :param motors:      motors to record. All motors of the controller if None.
+        :param chunk_size:  number of frames per chunk.
+        :param fmt:         'npz' or 'npy'.
+        :param prefix:      prefix of the chunk filenames.
+        """
+        if fmt not in FORMATS:
+            raise ValueError('fmt should be one of {} (got {})'.format(FORMATS, fmt))
+        self.ctrl       = ctrl
+        self.motors     = tuple(ctrl.motors if motors is None else motors)
+        self.dirpath    = dirpath
+        self.chunk_size = chunk_size
+        self.fmt        = fmt
+        self.prefix     = prefix
+
+        self.mids    = np.array([m.id for m in self.motors])
+        self._rows   = [m.mmem.row for m in self.motors]
+        self._addrs  = [control.addr for control, _ in FIELDS]
+        self.dtype   = np.dtype([('timestamp', 'f8'), ('frameseq', 'i8')] +
+                                [(name, 'i4', (len(self.motors),)) for _, name in FIELDS])
+
+        self.frames = 0     # number of frames recorded
+        self.files  = []    # chunk files written
+        self._chunk, self._cursor, self._chunk_index = None, 0, 0
+        self._queue  = queue.Queue()
+        self._writer = None
+        self._lock   = threading.Lock() # between _frame (controller thread) and stop()
+        self._stopped = True
+
+    # MARK Recording
+
+    def start(self):
+        """Start recording, from the next frame of the controller"""
+        if self._writer is not None:
+            raise RuntimeError('recorder already started')
+        if not os.path.isdir(self.dirpath):
+            os.makedirs(self.dirpath)
+        self._new_chunk()
+        self._stopped = False
+        self._writer = threading.Thread(target=self._writing)
+        self._writer.daemon = True
+        self._writer.start()
+        self.ctrl.register_frame_callback(self._frame)
+
+    def stop(self):
+        """Stop recording, write the last partial chunk and wait for the writes to complete"""
+        if self._writer is None:
+            return
+        try:
+            self.ctrl.unregister_frame_callback(self._frame)
+        except ValueError:
+            pass
+        # the controller thread may still be running a frame callback, from
+        # its copy of the callbacks: no frame is recorded after this point.
+        with self._lock:
+            self._stopped = True
+            if self._cursor > 0:
+                self._queue.put((self._chunk_index, self._chunk[:self._cursor]))
+            self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def _new_chunk(self):
+        self._chunk  = np.zeros(self.chunk_size, dtype=self.dtype)
+        self._cursor = 0
+
+    def _frame(self, ctrl):
+        with self._lock:
+            if not self._stopped:
+                self._record_frame(ctrl)
+
+    def _record_frame(self, ctrl):
+        table = ctrl.com.memtable
+        values = table.data[self._rows][:, self._addrs] # (motors, fields)
+
+        chunk, i = self._chunk, self._cursor
+        chunk['timestamp'][i] = ctrl.clock.time()
+        chunk['frameseq'][i]  = ctrl.frameseq
+        for j, (_, name) in enumerate(FIELDS):
+            chunk[name][i] = values[:, j]
+        self._cursor += 1
+        self.frames  += 1
+
+        if self._cursor == self.chunk_size:
+            self._queue.put((self._chunk_index, self._chunk))
+            self._chunk_index += 1
+            self._new_chunk()
+
+    # MARK Writing
+
+    def _filepath(self, index):
+        return os.path.join(self.dirpath, '{}_{:06d}.{}'.format(self.prefix, index, self.fmt))
+
+    def _writing(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            index, chunk = item
+            filepath = self._filepath(index)
+            if self.fmt == 'npz':
+                arrays = {name: chunk[name] for name in chunk.dtype.names}
+                np.savez(filepath, mids=self.mids, **arrays)
+            else:
+                np.save(filepath, chunk)
+            self.files.append(filepath)
+
+
+def load(dirpath, prefix='frames'):
+    """\
+    Load and concatenate the chunks written by a Recorder.
+
+    :return:  a dict of arrays (npz chunks), or a structured array (npy chunks).
+    """
+    npz = sorted(glob.glob(os.path.join(dirpath, '{}_*.npz'.format(prefix))))
+    if len(npz) > 0:
+        chunks = [np.load(filepath) for filepath in npz]
+        data = {name: np.concatenate([chunk[name] for chunk in chunks])
+                for name in chunks[0].files if name != 'mids'}
+        data['mids'] = chunks[0]['mids']
+        return data
+    npy = sorted(glob.glob(os.path.join(dirpath, '{}_*.npy'.format(prefix))))
+    return np.concatenate([np.load(filepath) for filepath in npy])
@@ -0,0 +1,68 @@
+"""
+Timestamped setpoint queues.
+
+A setpoint queue holds a bounded sequence of (time, goal position, moving
+speed) entries, expressed in bytes. The controller consumes the queue of each
+motor at every loop, just before the position/speed/torque sync write: the
+most recent entry whose time has come is sent, older ones are discarded.
+
+This allows to stream a trajectory in advance, and have its timing decided by
+the control loop rather than by the sleeps of the user thread.
+"""
+import collections
+import threading
+
+
+class SetpointQueue(object):
+    """\
+    Ring buffer of timestamped setpoints.
+
+    When the buffer is full, pushing a new setpoint discards the oldest one.
+    Setpoints must be pushed in chronological order.
+    """
+
+    def __init__(self, maxlen=1024):
+        self._queue = collections.deque(maxlen=maxlen)
+        self._lock  = threading.Lock()
+
+    @property
+    def maxlen(self):
+        return self._queue.maxlen
+
+    def __len__(self):
+        return len(self._queue)
+
+    def push(self, t, position, speed=None):
+        """\
+        Add a setpoint at the end of the queue.
+
+        :param t:         the time (as returned by the controller clock) at
+                          which the setpoint should be sent.
+        :param position:  the goal position, in bytes.
+        :param speed:     the moving speed, in bytes. If None, the moving
+                          speed is left unchanged.
+        """
+        with self._lock:
+            if len(self._queue) > 0 and t < self._queue[-1][0]:
+                raise ValueError('setpoints should be pushed in chronological '
+                                 'order ({} is before {})'.format(t, self._queue[-1][0]))
+            self._queue.append((t, position, speed))
+
+    def clear(self):
+        """Discard all pending setpoints"""
+        with self._lock:
+            self._queue.clear()
+
+    def pop_due(self, now):
+        """\
+        Return the most recent setpoint whose time is not after `now`, and
+        remove it, and all the setpoints before it, from the queue.
+
+        :return:  a (time, position, speed) tuple, or None if no setpoint is
+                  due yet.
+        """
+        with self._lock:
+            setpoint = None
+            while len(self._queue) > 0 and self._queue[0][0] <= now:
+                setpoint = self._queue.popleft()
+            return setpoint
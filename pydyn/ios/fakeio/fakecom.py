@@ -9,6 +9,7 @@ class FakeCom(serialcom.SerialCom):
         self._fakemems = {}
         self._support_sync_read = support_sync_read
         self.mmems = {}
+        self.memtable = memory.MemoryTable()
 
     def _add_motor(self, mid, model):
         assert 0 <= mid <= 253
@@ -46,6 +47,10 @@ class FakeCom(serialcom.SerialCom):
         for mid in mids:
             self._send_read_packet(control, mid)
 
+    def _send_bulk_read_packet(self, requests):
+        for control, mid in requests:
+            self._send_read_packet(control, mid)
+
     def _send_write_packet(self, control, mid, values):
         offset = 0
         for size, val in zip(control.sizes, values):
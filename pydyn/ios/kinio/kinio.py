@@ -70,5 +70,8 @@ class KinSerial(serialio.Serial):
         self._input_buffer = self._input_buffer[size:]
         return data
 
+    def fileno(self):
+        raise IOError('simulated ports do not provide a file descriptor')
+
     def close(self):
         self.cable = None
@@ -10,8 +10,8 @@ are connected in a daisy chain manner much like real motors.
 from __future__ import print_function, division
 
 #import new
-import time
 
+from ... import clock as clk
 from ...refs import protocol as pt
 from ...refs import conversions as conv
 from ...refs import limits
@@ -27,7 +27,7 @@ _to_values = serialcom.SerialCom._to_values
 
 CTRL_ADDR = {(ctrl.addr, sum(ctrl.sizes)): ctrl for ctrl in pt.CTRL_LIST}
 
-def _register_write(self, control, values):
+def _register_write(self, control, values, future=None):
     """Write write request immediately in memory"""
     if not hasattr(values, '__iter__'):
         values = (values,)
@@ -36,21 +36,39 @@ def _register_write(self, control, values):
         self.mmem[control.addr+offset] = value
         offset += size
     self.mmem.update() # could be more selective, but this would be useless optimization.
+    if future is not None:
+        future.set_result(None)
+
+_kin_classes = {}
+
+def _kin_class(cls):
+    """Return the subclass of a motor class whose writes are done immediately in memory"""
+    try:
+        return _kin_classes[cls]
+    except KeyError:
+        kin_cls = _kin_classes[cls] = type('Kin' + cls.__name__, (cls,),
+                                           {'__slots__': (), '_register_write': _register_write})
+        return kin_cls
 
 class KinMotor(object):
 
-    def __init__(self, model, mid):
+    def __init__(self, model, mid, clock=None):
+        """
+        :param clock:  the clock driving the motion of the motor. Use the
+                       VirtualClock of the controller to simulate motors in
+                       simulated time. Wall clock by default.
+        """
         fakemem = fakememory.MODELS[model]
         mmem = memory.DynamixelMemory(mid, save=False, memory=fakemem)
-        self.motor = motor.MOTOR_MODELS[model](mmem)
-        self.motor._register_write = _register_write.__get__(self.motor, self.motor.__class__) # new.instancemethod(_register_write, self.motor, None)
+        self.motor = _kin_class(motor.MOTOR_MODELS[model])(mmem)
         self.motor.id = mid
         self.motor.status_return_level = 1
 
         self.ports = (KinPort(self), KinPort(self))
         self.control_port = None
         self.status_port = None
-        self._motor_time = time.time()
+        self.clock = clk.REALTIME if clock is None else clock
+        self._motor_time = self.clock.time()
         self._timestep = 0.001
         self._present_position = self.motor.present_position
 
@@ -111,7 +129,7 @@ class KinMotor(object):
         try:
             control = CTRL_ADDR[(p.params[0], p.params[1])]
         except KeyError:
-            raise NotImplementedError # we don't support custom controls (yet)
+            control = pt.memory_chunk(p.params[0], p.params[0] + p.params[1])
         values, offset = [], 0
         for size in control.sizes:
             values.append(self.motor.mmem[control.addr+offset])
@@ -173,7 +191,7 @@ class KinMotor(object):
         self._motor_time += self._timestep
 
     def _update(self):
-        now = time.time()
+        now = self.clock.time()
         while now > self._motor_time:
             self._step()
 
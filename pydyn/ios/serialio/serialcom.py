@@ -15,6 +15,7 @@ import threading
 import itertools
 #import atexit
 
+from ... import clock as clk
 from ...refs import protocol as pt
 from ...refs import alarms as conv # the only conversion needed in I/O
 from ...refs import exc
@@ -23,6 +24,9 @@ from . import packet
 
 
 
+SYNC_READ_MAX_DATA = 180 # maximum number of bytes requested in one sync read
+
+
 # MARK: - Dxl Error
 
 class CommunicationError(Exception):
@@ -94,8 +98,8 @@ class SerialCom(object):
 
     .. warning:: When writing on EEPROM registers the motor enters a "busy" mode
                  will no respond correctly to requests for roughly 20ms times the
-                 number of register written (not all register are equal, check the
-                 eeprom_blackout.py sample for more details).
+                 number of register written (not all register are equal, see the
+                 :py:mod:`blackouts <pydyn.refs.blackouts>` module for details).
     """
     CommunicationError = CommunicationError
     TimeoutError = TimeoutError
@@ -103,6 +107,9 @@ class SerialCom(object):
 
     # __open_ports = [] # TODO: unified interface
 
+    history, history_mids = None, None # on-disk history of the memories, see save_history()
+    clock = clk.REALTIME # timestamps the memory changes, set to its clock by the controller
+
     def __init__(self, sio, verbose=True, **kwargs):
         """
         :param sio:  a functional, opened serial io instance.
@@ -120,6 +127,7 @@ class SerialCom(object):
         self._lock = threading.RLock()
 
         self.mmems = {}
+        self.memtable = memory.MemoryTable() # memory of all motors, as arrays
 
     @property
     def support_sync_read(self):
@@ -136,6 +144,24 @@ class SerialCom(object):
         """Purge the IO port. Useful after an error."""
         self.sio.purge()
 
+    def save_history(self, history, mids=None):
+        """\
+        Record the memory of the motors at each frame of the controller.
+
+        :param history:  a :py:class:`HistoryFile <pydyn.dynamixel.memfile.HistoryFile>`,
+                         or None to stop recording.
+        :param mids:     ids of the motors to record. All motors if None.
+        """
+        self.history, self.history_mids = history, mids
+
+    def save_frame(self, timestamp=None):
+        """Append the current memory of the motors to the history, if any"""
+        if self.history is not None:
+            if timestamp is None:
+                timestamp = self.clock.time()
+            self.history.append_table(self.memtable, timestamp=timestamp,
+                                      mids=self.history_mids)
+
     def __del__(self):
         """ Automatically closes the serial communication on destruction. """
         self.close()
@@ -246,7 +272,7 @@ class SerialCom(object):
         mmems = []
 
         for mid in mids:
-            mmem = memory.DynamixelMemory(mid)
+            mmem = memory.DynamixelMemory(mid, table=self.memtable)
             self.mmems[mmem.id] = mmem
             self.get(pt.EEPROM, [mid])
             self.get(pt.RAM,    [mid])
@@ -279,19 +305,45 @@ class SerialCom(object):
 
         :param control:  the control involved
         :param mids:     ids of motors. If more than one, and the io supports
-                         it, do a sync write.
+                         it, do one or several sync reads.
         """
         #print('get({})'.format(control.name))
         assert len(mids) > 0
-        if len(mids) == 1:
-            self._send_read_packet(control, mids[0])
-        else:
-            if (self.support_sync_read
-                and sum(control.sizes) <= 6 and len(mids) <= 30): # TODO split in several sync_read instead of reverting to read packets
-                self._send_sync_read_packet(control, mids)
+        for group in self._read_groups(control, mids):
+            if len(group) == 1:
+                self._send_read_packet(control, group[0])
             else:
-                for mid in mids:
-                    self._send_read_packet(control, mid)
+                self._send_sync_read_packet(control, group)
+
+    def _read_groups(self, control, mids):
+        """Split motor ids into groups that can be read with one instruction"""
+        if len(mids) > 1 and self.support_sync_read:
+            n = max(1, SYNC_READ_MAX_DATA//sum(control.sizes))
+            return [list(mids[i:i+n]) for i in range(0, len(mids), n)]
+        return [[mid] for mid in mids]
+
+    def support_bulk_read(self, mids):
+        """Return True if a bulk read is possible on all the given motors.
+        Bulk read is only supported by the MX series."""
+        return all(self.mmems[mid].modelclass == 'MX' for mid in mids)
+
+    def bulk_get(self, requests):
+        """Read several controls, each on a different motor, and update memory.
+
+        If all motors support it, a single bulk read instruction is sent.
+        Else, this reverts to a read instruction for each request.
+
+        :param requests:  list of (control, mid) pairs. A motor id should
+                          appear only once.
+        """
+        assert len(requests) > 0
+        requests = [(control, mid) for control, mid in requests
+                    if self.mmems[mid].status_return_level != 0]
+        if len(requests) > 1 and self.support_bulk_read([mid for _, mid in requests]):
+            self._send_bulk_read_packet(requests)
+        else:
+            for control, mid in requests:
+                self._send_read_packet(control, mid)
 
     # MARK - Special cases
 
@@ -330,60 +382,99 @@ class SerialCom(object):
         """
 
         try:
-            status_return_level = self._send_read_packet(pt.STATUS_RETURN_LEVEL, mid)
-            self.mmems[mid][pt.STATUS_RETURN_LEVEL] = status_return_level
+            self._send_read_packet(pt.STATUS_RETURN_LEVEL, mid)
         except TimeoutError as e:
             if self.ping(mid):
                 self.mmems[mid][pt.STATUS_RETURN_LEVEL] = 0
             else:
                 raise e
+        self.mmems[mid].update()
 
     # MARK: - Low level communication
 
-    def _send_packet(self, inst_packet, receive=True):
-        """Send a packet and handle the (eventual) reception"""
+    def _send_packet(self, inst_packet, receive=True, status_mid=None):
+        """Send a packet and handle the (eventual) reception
+
+        :param status_mid:  the id expected in the status packet, if it is
+                            not the one of the instruction packet.
+        """
         with self._lock:
             n = self.sio.write(bytes(inst_packet.data))
             if n != len(inst_packet):
                 raise CommunicationError('Packet not correctly sent', inst_packet, None)
 
             if receive:
-                data = self.sio.read(packet.HEADER_SIZE)
-                if len(data) < packet.HEADER_SIZE:
-                    data += self.sio.read(packet.HEADER_SIZE-len(data))
-                if len(data) == 0:
-                    raise TimeoutError(inst_packet)
-
-                try:
-                    packet.check_header(inst_packet.mid, data)
-                except AssertionError as e:
-                    self.sio.purge()
-                    raise CommunicationError(e.args[0],
-                                             inst_packet, list(bytearray(data)))
-
-                try:
-                    data += self.sio.read(data[3])
-                    status_packet = packet.StatusPacket(data)
-
-                except packet.PacketError as e:
-                    self.sio.purge()
-                    raise CommunicationError(e.msg, inst_packet,
-                                             list(bytearray(data)))
-
-                if status_packet.error != 0:
-                    alarms = conv.bytes2_alarm_names(status_packet.error)
-                    if len(alarms):
-                        raise SerialCom.MotorError(status_packet.mid, alarms)
-
-                return status_packet
+                return self._receive_packet(inst_packet, status_mid=status_mid)
+
+    def _receive_packet(self, inst_packet, status_mid=None):
+        """Receive and check a status packet answering inst_packet"""
+        if status_mid is None:
+            status_mid = inst_packet.mid
+
+        data = self.sio.read(packet.HEADER_SIZE)
+        if len(data) < packet.HEADER_SIZE:
+            data += self.sio.read(packet.HEADER_SIZE-len(data))
+        if len(data) == 0:
+            raise TimeoutError(inst_packet)
+
+        self._check_header(inst_packet, data, status_mid)
+        data += self.sio.read(data[3])
+        return self._check_status(inst_packet, data)
+
+    def _check_header(self, inst_packet, data, status_mid):
+        """Check the header of a status packet answering inst_packet"""
+        try:
+            packet.check_header(status_mid, data)
+        except AssertionError as e:
+            self.sio.purge()
+            raise CommunicationError(e.args[0],
+                                     inst_packet, list(bytearray(data)))
+
+    def _check_status(self, inst_packet, data):
+        """Create a status packet from data and check it for errors and alarms"""
+        try:
+            status_packet = packet.StatusPacket(data)
+        except packet.PacketError as e:
+            self.sio.purge()
+            raise CommunicationError(e.msg, inst_packet,
+                                     list(bytearray(data)))
+
+        if status_packet.error != 0:
+            alarms = conv.bytes2_alarm_names(status_packet.error)
+            if len(alarms):
+                raise SerialCom.MotorError(status_packet.mid, alarms)
+
+        return status_packet
 
     def _update_memory(self, control, mid, values):
         """Update the memory of the motors"""
+        mmem = self.mmems[mid]
+        mmem.begin_transaction(self.clock.time() if mmem.save else None)
         offset = 0
         for size, value in zip(control.sizes, values):
-            self.mmems[mid][control.addr+offset] = value
+            mmem[control.addr+offset] = value
             offset += size
-        self.mmems[mid].update() # could be more selective, but this would be useless optimization.
+        mmem.end_transaction()
+        mmem.update() # only recomputes when model, id, angle limits, srl or lock changed.
+
+    def _read_instruction(self, control, mids):
+        """\
+        Return the instruction packet reading control on the motors (a sync
+        read if there is more than one) and the id expected in the answer.
+        """
+        if len(mids) == 1:
+            return (packet.InstructionPacket(mids[0], pt.READ_DATA, (control.addr, sum(control.sizes))),
+                    mids[0])
+        return (packet.InstructionPacket(pt.BROADCAST, pt.SYNC_READ, [control.addr, sum(control.sizes)]+list(mids)),
+                pt.USB2AX)
+
+    def _update_read(self, control, mids, inst_packet, status_packet):
+        """Update the memory of the motors with the answer to a read instruction"""
+        if len(mids) == 1:
+            values = self._to_values(control, status_packet.params)
+            self._update_memory(control, mids[0], values)
+            return values
+        self._update_sync_read(control, mids, inst_packet, status_packet)
 
     def _send_read_packet(self, control, mid):
         """Send a read packet and update memory if successful."""
@@ -392,16 +483,52 @@ class SerialCom(object):
                    'no reads possible').format(mid))
 
         else:
-            read_packet = packet.InstructionPacket(mid, pt.READ_DATA, (control.addr, sum(control.sizes)))
+            read_packet, _ = self._read_instruction(control, [mid])
             status_packet = self._send_packet(read_packet, receive=True)
 
             if status_packet:
-                values = self._to_values(control, status_packet.params)
-                self._update_memory(control, mid, values)
-                return values
+                return self._update_read(control, [mid], read_packet, status_packet)
 
     def _send_sync_read_packet(self, control, mids):
-        raise NotImplementedError
+        """
+        Sync read is an extension of the protocol provided by the USB2AX.
+        Parameters layout is:
+        [start addr, length of data to read, id0, id1, ...]
+        The USB2AX answers with one status packet, with id 253, holding the
+        data of all motors, in order.
+        """
+        sync_read_packet, status_mid = self._read_instruction(control, mids)
+        status_packet = self._send_packet(sync_read_packet, status_mid=status_mid)
+        self._update_read(control, mids, sync_read_packet, status_packet)
+
+    def _update_sync_read(self, control, mids, sync_read_packet, status_packet):
+        """Update the memory of the motors with the answer of a sync read"""
+        size = sum(control.sizes)
+        params = status_packet.params
+        if len(params) != size*len(mids):
+            raise CommunicationError('sync read returned {} bytes instead of {}'.format(len(params), size*len(mids)),
+                                     sync_read_packet, list(status_packet.data))
+        for i, mid in enumerate(mids):
+            values = self._to_values(control, params[i*size:(i+1)*size])
+            self._update_memory(control, mid, values)
+
+    def _send_bulk_read_packet(self, requests):
+        """
+        Bulk read is only supported by MX motors. Parameters layout is:
+        [0x00, length0, id0, start addr0, length1, id1, start addr1, ...]
+        Each motor answers with its own status packet, in order.
+        """
+        params = [0x00]
+        for control, mid in requests:
+            params += [sum(control.sizes), mid, control.addr]
+        bulk_read_packet = packet.InstructionPacket(pt.BROADCAST, pt.BULK_READ, params)
+
+        with self._lock:
+            self._send_packet(bulk_read_packet, receive=False)
+            for control, mid in requests:
+                status_packet = self._receive_packet(bulk_read_packet, status_mid=mid)
+                values = self._to_values(control, status_packet.params)
+                self._update_memory(control, mid, values)
 
     def _send_write_packet(self, control, mid, values):
         """Send a write packet and update memory optimistically if no error."""
@@ -294,6 +294,32 @@ class Serial(object):
         else:
             return bytearray(self._serial.read(size=size))
 
+    def fileno(self):
+        """\
+        Return the file descriptor of the port, to wait on it with select.
+
+        Supported only by pyserial.
+        """
+        if self._ftdi_ctrl:
+            raise IOError('pyftdi ports do not provide a file descriptor')
+        return self._serial.fileno()
+
+    def read_available(self):
+        """\
+        Read, without blocking, the bytes available in the input buffer.
+
+        Supported only by pyserial.
+        """
+        if self._ftdi_ctrl:
+            raise IOError('pyftdi ports do not support non-blocking reads')
+        try:
+            n = self._serial.in_waiting
+        except AttributeError: # pyserial < 3.0
+            n = self._serial.inWaiting()
+        if n == 0:
+            return bytearray()
+        return bytearray(self._serial.read(size=n))
+
     def close(self):
         """Close the serial port
         """
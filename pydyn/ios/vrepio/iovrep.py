@@ -67,6 +67,10 @@ class DynamixelIOVRep(object):
     __open_ports = []
     __sims       = []
 
+    # set to True when the scene runs in synchronous mode: the simulation is
+    # then triggered by DynamixelController.step(), once per loop.
+    synchronous = False
+
     def __init__(self, port, ip = '127.0.0.1', **kwargs):
         """
             At instanciation, it opens the serial port and sets the communication parameters.
@@ -1,60 +1,404 @@
 from __future__ import print_function, division
 
+import numbers
 import collections
+try:
+    from collections.abc import Iterable
+except ImportError: # Python 2
+    from collections import Iterable
 import numpy as np
 
+from ..refs import protocol as pt
+from ..refs import limits
+from ..refs import luts
+from ..refs import vconversions as vconv
 from ..dynamixel import hub
+from ..dynamixel import motor as dmotor
 
 def _distribute(functions):
     pass
 
+# attributes read directly from the memory tables of the motors, for all motors
+# at once: name -> (control, converted)
+FAST_READS = {}
+for _name, _control in [('position',            pt.PRESENT_POSITION),
+                        ('present_position',    pt.PRESENT_POSITION),
+                        ('speed',               pt.PRESENT_SPEED),
+                        ('present_speed',       pt.PRESENT_SPEED),
+                        ('load',                pt.PRESENT_LOAD),
+                        ('present_load',        pt.PRESENT_LOAD),
+                        ('voltage',             pt.PRESENT_VOLTAGE),
+                        ('present_voltage',     pt.PRESENT_VOLTAGE),
+                        ('temperature',         pt.PRESENT_TEMPERATURE),
+                        ('present_temperature', pt.PRESENT_TEMPERATURE),
+                        ('goal_position',       pt.GOAL_POSITION),
+                        ('moving_speed',        pt.MOVING_SPEED),
+                        ('torque_limit',        pt.TORQUE_LIMIT)]:
+    FAST_READS[_name]            = (_control, True)
+    FAST_READS[_name + '_bytes'] = (_control, False)
+
+# attributes written for all motors at once, checked and converted as a vector,
+# and registered on the motors in one critical section: name -> (control, converted)
+FAST_WRITES = {}
+for _name, _control in [('position',      pt.GOAL_POSITION),
+                        ('goal_position', pt.GOAL_POSITION),
+                        ('speed',         pt.MOVING_SPEED),
+                        ('moving_speed',  pt.MOVING_SPEED),
+                        ('torque_limit',  pt.TORQUE_LIMIT)]:
+    FAST_WRITES[_name]            = (_control, True)
+    FAST_WRITES[_name + '_bytes'] = (_control, False)
+
+
+class _AccessPlan(object):
+    """\
+    How an attribute is read and written on each motor of a set. The
+    attribute is resolved once per motor class: descriptors (controls and
+    properties) are then called directly, without reflection.
+    """
+
+    def __init__(self, motors, name):
+        self.name = name
+        self.supported = tuple(hasattr(m, name) for m in motors)
+        self.any_supported = any(self.supported)
+        resolved = {}
+        for m in motors:
+            if type(m) not in resolved:
+                resolved[type(m)] = self._resolve(type(m))
+        self.getters = tuple(resolved[type(m)][0] for m in motors)
+        self.setters = tuple(resolved[type(m)][1] for m in motors)
+        self._iterable = None
+
+    def subset(self, indexes):
+        """Return the plan of a subset of the motors, without resolving the attribute again"""
+        plan = object.__new__(_AccessPlan)
+        plan.name          = self.name
+        plan.supported     = tuple(self.supported[i] for i in indexes)
+        plan.any_supported = any(plan.supported)
+        plan.getters       = tuple(self.getters[i] for i in indexes)
+        plan.setters       = tuple(self.setters[i] for i in indexes)
+        plan._iterable     = None
+        return plan
+
+    def _resolve(self, cls):
+        """Return the getter and the setter of the attribute for a class of motors"""
+        name = self.name
+        for klass in cls.__mro__:
+            if name in klass.__dict__:
+                desc = klass.__dict__[name]
+                if hasattr(desc, '__get__') and hasattr(desc, '__set__'): # data descriptor
+                    return (lambda m: desc.__get__(m, cls)), desc.__set__
+                break
+        return (lambda m: getattr(m, name)), (lambda m, value: setattr(m, name, value))
+
+    def iterable(self, motors):
+        """Return True if the values of the attribute are iterables (eg. angle_limits)"""
+        if self._iterable is None:
+            for m, supported, get in zip(motors, self.supported, self.getters):
+                if supported:
+                    self._iterable = isinstance(get(m), Iterable)
+                    break
+        return self._iterable
+
+
+class PoseCommand(object):
+    """\
+    Goal positions, moving speeds and torque limits already checked and
+    converted to bytes, returned by :py:meth:`MotorSet.prepare`.
+    """
+
+    def __init__(self, requests):
+        """:param requests:  motor -> [(control, value in bytes), ...], ordered."""
+        self.motors = tuple(m for m, reqs in requests.items() if len(reqs) > 0)
+        self.requests = tuple(tuple(requests[m]) for m in self.motors)
+        self._groups = dmotor.lock_groups(self.motors, self.requests)
+
+
 class MotorSet(object):
 
-    def __init__(self, motors=None, n=1, **kwargs):
+    def __init__(self, motors=None, n=1, groups=None, **kwargs):
         """Instanciate a motor set.
 
         :param motors:  list of Motor instances. If None, will try to detect
                         devices, instanciate controllers and load motors.
         :param n:       the number of controller to instanciate. Has no effect
                         if ``motors`` is not None.
+        :param groups:  a dict of named groups of motors, name -> motor ids.
+                        See :py:meth:`add_group`.
         """
-        object.__setattr__(self, '_motors', motors)
-        if self.motors is None:
+        if motors is None:
             dyn_uid  = hub.connect(**kwargs) # TODO treat n
-            object.__setattr__(self, '_motors', tuple(hub.motors(dyn_uid)))
-        object.__setattr__(self, '_motormap', {m.id: m for m in self._motors})
-        object.__setattr__(self, '_zero_pose', tuple(0.0 for m in self.motors))
+            motors = hub.motors(dyn_uid)
+        self.motors = motors
+        object.__setattr__(self, '_groups', {})
+        for name, mids in (groups or {}).items():
+            self.add_group(name, mids)
 
     @property
     def motors(self):
         return self._motors
 
+    @motors.setter
+    def motors(self, motors):
+        """\
+        Change the motors of the set. The zero pose is reset if their number
+        changes. A view changed this way becomes an independent motor set, and
+        so do the views of a motor set whose motors are changed.
+        """
+        motors = tuple(motors)
+        if self.__dict__.get('_root') is not None:
+            self._detach()
+        for view in list(self.__dict__.get('_views', {}).values()):
+            view._detach()
+        if '_zero_pose' not in self.__dict__ or len(motors) != len(self._zero_pose):
+            object.__setattr__(self, '_zero_pose', tuple(0.0 for m in motors))
+        object.__setattr__(self, '_root', None)     # the motor set this one is a view of
+        object.__setattr__(self, '_indexes', None)  # indexes of the view motors in the root
+        object.__setattr__(self, '_motors', motors)
+        object.__setattr__(self, '_motormap', {m.id: m for m in motors})
+        object.__setattr__(self, '_positions', {m.id: i for i, m in enumerate(motors)})
+        object.__setattr__(self, '_tables', self._table_rows())
+        object.__setattr__(self, '_plans', {}) # name -> _AccessPlan, for these motors
+        object.__setattr__(self, '_views', {}) # root indexes -> view
+
+    def _plan(self, name):
+        """Return the _AccessPlan of an attribute, resolved at first use"""
+        try:
+            return self._plans[name]
+        except KeyError:
+            if self._root is None:
+                plan = _AccessPlan(self.motors, name)
+            else:
+                plan = self._root._plan(name).subset(self._indexes)
+            self._plans[name] = plan
+            return plan
+
     @property
     def motormap(self):
         return self._motormap
 
+    # MARK Views
+
+    @property
+    def groups(self):
+        """The named groups of motors, name -> motor ids. Shared by all views of a motor set."""
+        return self._groups
+
+    def add_group(self, name, mids):
+        """\
+        Name a group of motors, so that ``mset[name]`` returns a view of them.
+
+        :param name:  the name of the group (eg. 'left_arm').
+        :param mids:  the ids of the motors of the group.
+        """
+        mids = tuple(mids)
+        unknown = [mid for mid in mids if mid not in self._motormap]
+        if len(unknown) > 0:
+            raise KeyError('no motor with id {} in the motor set'.format(unknown))
+        self._groups[name] = mids
+
+    def _key_indexes(self, key):
+        """Return the indexes in the motor set of the motors selected by key"""
+        if isinstance(key, str):
+            key = self._groups[key]
+        if isinstance(key, slice):
+            return np.arange(len(self.motors))[key]
+        array = np.asarray(key)
+        if array.dtype == bool:
+            if array.shape != (len(self.motors),):
+                raise IndexError('expected a mask of {} booleans, got {}'.format(len(self.motors), key))
+            return np.flatnonzero(array)
+        try:
+            return np.array([self._positions[mid] for mid in key], dtype=int)
+        except KeyError as e:
+            raise KeyError('no motor with id {} in the motor set'.format(e.args[0]))
+
+    def __getitem__(self, key):
+        """\
+        Return the motor of a given id, or a view of a subset of the motors.
+
+        :param key:  a motor id, returns the motor. Otherwise, a list of motor
+                     ids, a boolean mask, a slice or the name of a group,
+                     returns a MotorSet view of the selected motors.
+
+        A view shares the memory tables, the zero pose, the groups and the
+        attribute resolutions of the motor set it is created from: its reads
+        and writes are vectorized and batched the same way. Views are cached;
+        when the motors of the set are changed, the views already returned
+        become independent motor sets.
+        """
+        if isinstance(key, numbers.Integral) and not isinstance(key, bool):
+            return self._motormap[key]
+        indexes = self._key_indexes(key)
+        if self._root is not None:
+            return self._root._view(self._indexes[indexes])
+        return self._view(indexes)
+
+    def _view(self, indexes):
+        """Return the view of the motors at indexes (in this motor set, which is a root)"""
+        key = tuple(indexes.tolist())
+        try:
+            return self._views[key]
+        except KeyError:
+            pass
+
+        view = object.__new__(type(self))
+        motors = tuple(self.motors[i] for i in key)
+        view_indexes = np.array(key, dtype=int)
+        object.__setattr__(view, '_root', self)
+        object.__setattr__(view, '_indexes', view_indexes)
+        object.__setattr__(view, '_motors', motors)
+        object.__setattr__(view, '_motormap', {m.id: m for m in motors})
+        object.__setattr__(view, '_positions', {m.id: i for i, m in enumerate(motors)})
+        object.__setattr__(view, '_groups', self._groups)
+        object.__setattr__(view, '_plans', {})
+        object.__setattr__(view, '_views', self._views)
+
+        tables = None
+        if self._tables is not None:
+            # rows of the view motors in the tables of the root, in view order
+            where = np.full(len(self.motors), -1, dtype=int)
+            where[view_indexes] = np.arange(len(view_indexes))
+            tables = []
+            for table, rows, positions in self._tables:
+                selected = where[positions]
+                keep = selected >= 0
+                if keep.any():
+                    order = np.argsort(selected[keep])
+                    tables.append((table, rows[keep][order], selected[keep][order]))
+            tables = tuple(tables)
+        object.__setattr__(view, '_tables', tables)
+
+        self._views[key] = view
+        return view
+
+    def _detach(self):
+        """\
+        Make a view an independent motor set, keeping its motors and its zero
+        pose, and remove it from the views of its root.
+        """
+        root = self._root
+        zero_pose = self.zero_pose
+        key = tuple(self._indexes.tolist())
+        if root._views.get(key) is self:
+            del root._views[key]
+        object.__setattr__(self, '_zero_pose', zero_pose)
+        object.__setattr__(self, '_root', None)
+        object.__setattr__(self, '_indexes', None)
+        object.__setattr__(self, '_views', {})
+
+    def __len__(self):
+        return len(self.motors)
+
+    def __iter__(self):
+        return iter(self.motors)
+
+    # MARK Memory tables
+
+    def _table_rows(self):
+        """\
+        Return, for each memory table the motors are stored in, the table,
+        the rows of the motors in it and their indexes in the motor set.
+        Return None if some motors have no memory table.
+        """
+        tables = collections.OrderedDict()
+        for i, m in enumerate(self.motors):
+            table = getattr(getattr(m, 'mmem', None), 'table', None)
+            if table is None:
+                return None
+            tables.setdefault(id(table), (table, [], []))
+            tables[id(table)][1].append(m.mmem.row)
+            tables[id(table)][2].append(i)
+        return tuple((table, np.array(rows), np.array(indexes))
+                     for table, rows, indexes in tables.values())
+
+    def _raw(self, control):
+        """\
+        Return the byte values of control for all motors, read from the
+        memory tables, or None if some values were never read.
+        """
+        if len(self._tables) == 1:
+            table, rows, _ = self._tables[0]
+            if not table.valid[rows, control.addr].all():
+                return None
+            return table.data[rows, control.addr].astype(int)
+        values = np.empty(len(self.motors), dtype=int)
+        for table, rows, indexes in self._tables:
+            if not table.valid[rows, control.addr].all():
+                return None
+            values[indexes] = table.data[rows, control.addr]
+        return values
+
+    def _fast_read(self, name):
+        """Vectorized read of the FAST_READS attributes. None if not possible."""
+        if self._tables is None or len(self.motors) == 0:
+            return None
+        control, converted = FAST_READS[name]
+        values = self._raw(control)
+        if values is None or not converted:
+            return values
+        mmems = [m.mmem for m in self.motors]
+        return luts.decode(control, values, modelclass=[mmem.modelclass for mmem in mmems],
+                                            mode=[mmem.mode for mmem in mmems])
+
+    def _fast_write(self, name, values):
+        """\
+        Vectorized write of the FAST_WRITES attributes. None values are skipped.
+        Return False if not possible.
+        """
+        if self._tables is None or len(self.motors) == 0:
+            return False
+        motors, values = self._to_bytes(*FAST_WRITES[name], values=values)
+        if len(motors) > 0:
+            dmotor.register_writes(motors, FAST_WRITES[name][0], values)
+        return True
+
+    def _to_bytes(self, control, converted, values):
+        """\
+        Check and convert (if converted is True) a value of control for each
+        motor, or a single value for all of them, as a vector. None values are
+        skipped: return the motors with a value and their values in bytes.
+        """
+        if not isinstance(values, Iterable):
+            values = [values for m in self.motors]
+        if len(values) != len(self.motors):
+            raise ValueError('expected {} values, got {}'.format(len(self.motors), len(values)))
+
+        motors = self.motors
+        if not (isinstance(values, np.ndarray) and values.dtype.kind in 'biuf'):
+            motors = [m for m, v in zip(self.motors, values) if v is not None]
+            values = [v for v in values if v is not None]
+            if len(motors) == 0:
+                return motors, []
+        modelclass = [m.modelclass for m in motors]
+        mode       = [m.mode for m in motors]
+        if converted:
+            values = vconv.VCONV[control][0](values, modelclass=modelclass, mode=mode)
+        else:
+            values = limits.VCHECK_BYTES[control](values, modelclass=modelclass, mode=mode)
+        return motors, values.tolist()
+
     def _expand_values(self, name, values):
-        if (isinstance(values,    collections.Iterable)):
-            if  isinstance(values[0], collections.Iterable):
+        if (isinstance(values,    Iterable)):
+            if  isinstance(values[0], Iterable):
                 return values # can't be more than two level (so far)
             else: # is it an iterable for each motor, or for one motor ?
-                for m in self.motors:
-                     if hasattr(m, name):
-                        exhibit_a = m
-                        break
-                v_m = getattr(m, name)
-                if not isinstance(v_m, collections.Iterable):
+                if not self._plan(name).iterable(self.motors):
                     return values
         return [values for m in self.motors]
 
     def __getattr__(self, name):
         if hasattr(self.__class__, name) or name in self.__dict__:
             object.__getattribute__(self, name)
+        if name in FAST_READS:
+            values = self._fast_read(name)
+            if values is not None:
+                return values
         if len(self.motors) == 0:
             raise AttributeError("No motor in motor set")
-        if not any(hasattr(m, name) for m in self.motors):
+        plan = self._plan(name)
+        if not plan.any_supported:
             raise AttributeError("MotorSet has no attribute '{}'".format(name))
-        return np.array([getattr(m, name) for m in self.motors]) # FIXME innefficient
+        return np.array([get(m) for m, get in zip(self.motors, plan.getters)])
 
     def __setattr__(self, name, values):
         if hasattr(self.__class__, name) or name in self.__dict__:
@@ -66,16 +410,19 @@ class MotorSet(object):
                     return
             except TypeError:
                 raise AttributeError("No motor in motor set")
-        if not any(hasattr(m, name) for m in self.motors):
+        if name in FAST_WRITES and self._fast_write(name, values):
+            return
+        plan = self._plan(name)
+        if not plan.any_supported:
             raise AttributeError("MotorSet has no attribute '{}'".format(name))
 
         values = self._expand_values(name, values)
 
         failcount = 0
-        for m, val in zip(self.motors, values):
+        for m, set_, val in zip(self.motors, plan.setters, values):
             try:
                 if val is not None:
-                    setattr(m, name, val)
+                    set_(m, val)
             except AttributeError:
                 failcount += 1
 
@@ -84,26 +431,90 @@ class MotorSet(object):
 
     @property
     def zero_pose(self):
+        if self._root is not None:
+            zero_pose = self._root.zero_pose
+            return tuple(zero_pose[i] for i in self._indexes)
         return self._zero_pose
 
     @zero_pose.setter
     def zero_pose(self, values):
-        if not isinstance(values, collections.Iterable):
+        if not isinstance(values, Iterable):
             values = [values for m in self.motors]
         assert len(values) == len(self.motors), 'Expected at least {} values, got {}'.format(len(self.motors), values)
+        if self._root is not None:
+            zero_pose = list(self._root.zero_pose)
+            for i, value in zip(self._indexes, values):
+                zero_pose[i] = value
+            self._root.zero_pose = zero_pose
+            return
         object.__setattr__(self, '_zero_pose', values)
 
     @property
     def pose(self):
-        return np.array([m.position - zp for m, zp in zip(self.motors, self.zero_pose)])
+        if len(self.motors) == 0:
+            return np.array([])
+        return self.position - np.asarray(self.zero_pose, dtype=float)
 
     @pose.setter
     def pose(self, values):
-        if not isinstance(values, collections.Iterable):
+        if not isinstance(values, Iterable):
             values = [values for m in self.motors]
-        for m, zp, p in zip(self.motors, self.zero_pose, values):
+        self.position = [None if p is None else p + zp for p, zp in zip(values, self.zero_pose)]
+
+    # MARK Prepared commands
+
+    def prepare(self, pose, speed=None, torque=None):
+        """\
+        Check and convert a pose (and optionally speeds and torque limits)
+        once, to be applied any number of times with :py:meth:`apply`.
+
+        :param pose:    a pose value (relative to the zero pose) for each
+                        motor, or a single value for all of them. None values
+                        are skipped.
+        :param speed:   None, or a moving speed for each motor, or a single
+                        value for all of them.
+        :param torque:  None, or a torque limit for each motor, or a single
+                        value for all of them.
+        :return:        a PoseCommand.
+        """
+        if not isinstance(pose, Iterable):
+            pose = [pose for m in self.motors]
+        positions = [None if p is None else p + zp for p, zp in zip(pose, self.zero_pose)]
+
+        requests = collections.OrderedDict((m, []) for m in self.motors)
+        for control, values in [(pt.GOAL_POSITION, positions),
+                                (pt.MOVING_SPEED,  speed),
+                                (pt.TORQUE_LIMIT,  torque)]:
+            if values is not None:
+                motors, values = self._to_bytes(control, True, values)
+                for m, value in zip(motors, values):
+                    requests[m].append((control, value))
+        return PoseCommand(requests)
+
+    def apply(self, command):
+        """\
+        Register the writes of a PoseCommand returned by :py:meth:`prepare`.
+        The motors of each controller receive them in the same sync write.
+        """
+        dmotor.register_grouped(command._groups)
+
+    def push_setpoints(self, t, positions, speeds=None):
+        """\
+        Schedule goal positions (and optionally moving speeds) to be sent by
+        the controller at time `t`. See :py:meth:`Motor.push_setpoint`.
+
+        :param positions:  a goal position for each motor, or a single value
+                           for all of them. None values are skipped.
+        :param speeds:     None, or a moving speed for each motor, or a single
+                           value for all of them.
+        """
+        if not isinstance(positions, Iterable):
+            positions = [positions for m in self.motors]
+        if not isinstance(speeds, Iterable):
+            speeds = [speeds for m in self.motors]
+        for m, p, s in zip(self.motors, positions, speeds):
             if p is not None:
-                m.position = p + zp
+                m.push_setpoint(t, p, speed=s)
 
     def close_all(self):
         hub.close_all()
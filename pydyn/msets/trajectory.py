@@ -0,0 +1,204 @@
+"""
+Trajectory interpolation for motor sets.
+
+A Trajectory is defined by sparse keyframes (a pose for each motor at a few
+instants) and evaluates the pose of all motors at once, as numpy arrays, at any
+time in between. Three interpolations are available:
+
+    * 'linear':  piecewise linear interpolation.
+    * 'cubic':   natural cubic spline, going through every keyframe.
+    * 'minjerk': minimum-jerk segments between consecutive keyframes (zero
+                 velocity and acceleration at each keyframe).
+
+A TrajectoryPlayer runs a trajectory inside the control loop: at every loop of
+the controller, right after the read phase, the pose is evaluated and converted
+for all motors in one go, and the goal positions are sent during the same loop.
+
+>>> traj = Trajectory([0.0, 1.0, 2.0], [[0, 0], [30, -30], [0, 0]], kind='minjerk')
+>>> player = TrajectoryPlayer(ctrl, mset, traj)
+>>> player.start()
+>>> player.wait()
+"""
+from __future__ import print_function, division
+
+import threading
+
+import numpy as np
+
+from ..refs import protocol as pt
+from ..refs import limits
+from ..refs import vconversions as vconv
+from ..dynamixel import motor as dmotor
+
+
+KINDS = ('linear', 'cubic', 'minjerk')
+
+
+class Trajectory(object):
+
+    def __init__(self, times, keyframes, kind='linear'):
+        """
+        :param times:      increasing sequence of k instants, in seconds.
+        :param keyframes:  k poses, each a sequence of n positions in degrees.
+        :param kind:       one of 'linear', 'cubic' or 'minjerk'.
+        """
+        limits.checkoneof('kind', KINDS, kind)
+        self.times     = np.asarray(times, dtype=float)
+        self.keyframes = np.asarray(keyframes, dtype=float)
+        if self.keyframes.ndim == 1:
+            self.keyframes = self.keyframes[:, np.newaxis]
+        if self.times.ndim != 1 or len(self.times) < 1:
+            raise ValueError('times should be a non-empty sequence')
+        if len(self.times) != len(self.keyframes):
+            raise ValueError('got {} times but {} keyframes'.format(len(self.times), len(self.keyframes)))
+        if np.any(np.diff(self.times) <= 0):
+            raise ValueError('times should be strictly increasing')
+        self.kind = kind
+
+        if kind == 'cubic':
+            self._curvatures = self._spline_curvatures()
+
+    @property
+    def start(self):
+        return self.times[0]
+
+    @property
+    def end(self):
+        return self.times[-1]
+
+    @property
+    def duration(self):
+        return self.times[-1] - self.times[0]
+
+    def _spline_curvatures(self):
+        """Second derivatives of the natural cubic spline at each keyframe"""
+        k = len(self.times)
+        curvatures = np.zeros(self.keyframes.shape)
+        if k < 3:
+            return curvatures
+        h = np.diff(self.times)
+        slopes = np.diff(self.keyframes, axis=0) / h[:, np.newaxis]
+
+        A = np.zeros((k-2, k-2))
+        i = np.arange(k-2)
+        A[i, i] = 2*(h[:-1] + h[1:])
+        A[i[1:], i[1:]-1] = h[1:-1]
+        A[i[:-1], i[:-1]+1] = h[1:-1]
+        B = 6*(slopes[1:] - slopes[:-1])
+
+        curvatures[1:-1] = np.linalg.solve(A, B)
+        return curvatures
+
+    def __call__(self, t):
+        """\
+        Evaluate the trajectory at time t. Before the first (resp. after the
+        last) keyframe, return the first (resp. last) keyframe.
+
+        :return:  array of n positions.
+        """
+        if t <= self.times[0]:
+            return self.keyframes[0].copy()
+        if t >= self.times[-1]:
+            return self.keyframes[-1].copy()
+
+        i  = np.searchsorted(self.times, t, side='right') - 1
+        h  = self.times[i+1] - self.times[i]
+        y0, y1 = self.keyframes[i], self.keyframes[i+1]
+        s  = (t - self.times[i]) / h
+
+        if self.kind == 'linear':
+            return y0 + s*(y1 - y0)
+        elif self.kind == 'minjerk':
+            return y0 + (10*s**3 - 15*s**4 + 6*s**5)*(y1 - y0)
+        else: # cubic
+            a, b = 1.0 - s, s
+            m0, m1 = self._curvatures[i], self._curvatures[i+1]
+            return a*y0 + b*y1 + ((a**3 - a)*m0 + (b**3 - b)*m1)*h*h/6.0
+
+
+class TrajectoryPlayer(object):
+    """\
+    Play a trajectory on a motor set from within the control loop.
+
+    Keyframes are interpreted as poses, i.e. relative to the zero pose of the
+    motor set. Keyframes are checked when the player is created; if the
+    interpolation goes out of the motors range between them (eg. cubic
+    overshoots), the player stops and the BoundsError is kept in ``error``.
+    """
+
+    def __init__(self, ctrl, mset, trajectory):
+        """
+        :param ctrl:        the controller driving the motors of mset.
+        :param mset:        a MotorSet instance.
+        :param trajectory:  a Trajectory instance, with as many positions per
+                            keyframe as motors in mset.
+        """
+        if trajectory.keyframes.shape[1] != len(mset.motors):
+            raise ValueError('trajectory is defined for {} motors, but the motor set '
+                             'has {}'.format(trajectory.keyframes.shape[1], len(mset.motors)))
+        self.ctrl       = ctrl
+        self.motors     = tuple(mset.motors)
+        self.trajectory = trajectory
+
+        self._offsets     = np.asarray(mset.zero_pose, dtype=float)
+        self._modelclass  = [m.modelclass for m in self.motors]
+        self._mode        = [m.mode for m in self.motors]
+
+        # checking keyframes once, so that errors are raised here rather than
+        # in the control loop.
+        limits.VCHECK[pt.GOAL_POSITION](trajectory.keyframes + self._offsets,
+                                        modelclass=self._modelclass, mode=self._mode)
+
+        self.error = None # BoundsError that stopped the player, if any
+        self._t0 = None
+        self._done = threading.Event()
+
+    def positions_bytes(self, t):
+        """\
+        Return the goal positions, in bytes, at time t of the trajectory.
+
+        :raise limits.BoundsError:  if some positions are out of range.
+        """
+        positions = self.trajectory(t) + self._offsets
+        return vconv.VCONV[pt.GOAL_POSITION][0](positions, modelclass=self._modelclass,
+                                                           mode=self._mode)
+
+    def start(self, t0=None):
+        """\
+        Start playing the trajectory.
+
+        :param t0:  the time (of the controller clock) corresponding to the
+                    start of the trajectory. If None, the trajectory starts now.
+        """
+        self._t0 = (self.ctrl.clock.time() if t0 is None else t0) - self.trajectory.start
+        self.error = None
+        self._done.clear()
+        self.ctrl.register_frame_callback(self._frame)
+
+    def stop(self):
+        """Stop playing the trajectory; the motors keep their last goal position."""
+        try:
+            self.ctrl.unregister_frame_callback(self._frame)
+        except ValueError:
+            pass
+        self._done.set()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Wait until the trajectory has been played entirely, or is stopped."""
+        return self._done.wait(timeout)
+
+    def _frame(self, ctrl):
+        t = ctrl.clock.time() - self._t0
+        try:
+            positions = self.positions_bytes(t)
+        except limits.BoundsError as e:
+            self.error = e
+            self.stop()
+            return
+        dmotor.register_writes(self.motors, pt.GOAL_POSITION, positions.tolist())
+        if t >= self.trajectory.end:
+            self.stop()
@@ -12,16 +12,21 @@ DXL_ALARMS = [
     "Instruction Error",
 ]
 
+# error codes and error names of the 128 possible alarm bytes
+ALARM_CODES = tuple(tuple(int(c) for c in reversed(bin(value+128)[3:]))
+                    for value in range(128))
+ALARM_NAMES = tuple(tuple(alarm_i for byte_i, alarm_i in zip(codes, DXL_ALARMS) if byte_i == 1)
+                    for codes in ALARM_CODES)
+
 def bytes2_alarm_codes(value):
     """This unpack a single integer into a list of error code"""
     limits.checkbounds('alarm code bytes', 0, 127, value)
-
-    return tuple(int(c) for c in reversed(bin(value+128)[3:]))
+    return ALARM_CODES[value]
 
 def bytes2_alarm_names(value):
     """This unpack a single integer into a list of error names"""
-    byte = bytes2_alarm_codes(value)
-    return tuple(alarm_i for byte_i, alarm_i in zip(byte, DXL_ALARMS) if byte_i == 1)
+    limits.checkbounds('alarm code bytes', 0, 127, value)
+    return ALARM_NAMES[value]
 
 def alarm_names_2bytes(value):
     b = 0
@@ -0,0 +1,68 @@
+"""
+EEPROM blackout durations.
+
+After an EEPROM write, a motor is busy and does not answer correctly for a
+while. The duration of this blackout depends on the model and on the controls
+written. This module holds the durations used by the controller to avoid
+sending instructions to a busy motor:
+
+    blackouts.duration('AX-12', pt.ANGLE_LIMITS) # in seconds
+
+Durations are looked up in the BLACKOUTS table, first by model name (eg.
+'AX-12'), then by model class (eg. 'AX'). Compound controls that are not in the
+table are the sum of their parts, and atomic controls that are not in the table
+default to DEFAULT_CELL_BLACKOUT times their number of memory cells.
+
+The shipped table is empty: everything falls back to the conservative 20ms per
+cell default. Blackouts can be measured on your hardware with the
+tools/blackout_calibration.py script, which saves them in a json file that can
+then be loaded with load().
+"""
+from __future__ import division
+
+import json
+
+DEFAULT_CELL_BLACKOUT = 0.020 # in seconds
+
+# {model name or model class: {control name: duration in seconds}}
+BLACKOUTS = {}
+
+
+def duration(model, control):
+    """\
+    Return the blackout duration of a motor after writing a control.
+
+    :param model:    the model name of the motor (eg. 'MX-28').
+    :param control:  the Control instance written.
+    :return:         duration in seconds. 0.0 for RAM controls.
+    """
+    if control.ram:
+        return 0.0
+    for key in (model, None if model is None else model[:2]):
+        try:
+            return BLACKOUTS[key][control.name]
+        except KeyError:
+            pass
+    if len(control.parts) > 0:
+        return sum(duration(model, part) for part in control.parts)
+    return DEFAULT_CELL_BLACKOUT*len(control.sizes)
+
+
+def update(table):
+    """Update the blackout table with a {model: {control name: duration}} dict"""
+    for model, durations in table.items():
+        BLACKOUTS.setdefault(model, {}).update(durations)
+
+
+def load(filepath):
+    """Load blackout durations from a json file, as created by save()"""
+    with open(filepath, 'r') as f:
+        update(json.load(f))
+
+
+def save(filepath, table=None):
+    """Save blackout durations (by default, the current table) in a json file"""
+    if table is None:
+        table = BLACKOUTS
+    with open(filepath, 'w') as f:
+        json.dump(table, f, indent=4, sort_keys=True)
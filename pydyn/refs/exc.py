@@ -15,3 +15,24 @@ class MotorError(Exception):
                     's' if len(self.alarms) > 1 else '',
                     self.alarms if len(self.alarms) > 1 else self.alarms[0])
 
+
+
+class UnsupportedModelError(MotorError, ValueError):
+    """\
+    Raised when a motor reports a model number that is not supported. As a
+    MotorError, it is attached to the motor by the Controller, which stops,
+    rather than killing the controller thread.
+    """
+    def __init__(self, mid, model_number):
+        MotorError.__init__(self, mid, ['UnsupportedModel'])
+        self.model_number = model_number
+
+    def __str__(self):
+        return ("pydyn detected an unsupported motor model with model number"
+                " {} (motor {}). It may just be an particularly improbable error of "
+                "transmission, or it could be a unsupported motor.\n"
+                "To support a new motor, one only need to edit the file "
+                "dynamixel/protocol.py in the source. Don't hesitate to "
+                "submit a pull request in that case. Alternatively, you can "
+                "open an issue on github with a link to your motor "
+                "documentation.").format(self.model_number, self.mid)
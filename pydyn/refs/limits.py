@@ -26,6 +26,8 @@ from __future__ import division
 
 import numbers
 
+import numpy as np
+
 from . import protocol as pt
 
 POSITION_RANGES = {
@@ -315,3 +317,298 @@ CHECK = {
 }
 
 assert set(CHECK.keys()) == set(CHECK_BYTES.keys())
+
+
+# MARK Vectorized checks
+
+# VCHECK[control](values, modelclass=None, mode=None, clip=False) and
+# VCHECK_BYTES check an array of values, one per motor, in one pass. modelclass
+# and mode are either shared by all motors, or given per motor (they are
+# broadcast against values, so a (frames, motors) array can be checked with
+# one modelclass per motor).
+#
+# By default, a BoundsError is raised if any value is out of range. With
+# clip=True, values are clipped to their range instead, and the clipped array
+# is returned. Values that can't be clipped (NaN, floats where integers are
+# expected) raise in both modes.
+
+class BoundsError(ValueError):
+    """\
+    Raised by vectorized checks. The message is the one of the scalar check
+    for the first offending value; `indexes` lists the indexes of all the
+    offending values (ints for 1D arrays, tuples otherwise).
+    """
+    def __init__(self, message, indexes):
+        ValueError.__init__(self, message)
+        self.message = message
+        self.indexes = indexes
+
+    def __str__(self):
+        if len(self.indexes) == 1:
+            return '{} (at index {})'.format(self.message, self.indexes[0])
+        return '{} ({} values out of range, at indexes {})'.format(self.message,
+                    len(self.indexes), self.indexes)
+
+def per_motor(ranges, modelclass, index=None):
+    """\
+    Look up a modelclass-keyed table (eg. POSITION_RANGES) for each motor.
+
+    :param modelclass:  a modelclass, or an array of modelclasses.
+    :param index:       if not None, the index of the item of the table entries.
+    :return:            an array if modelclass is an array, else a scalar.
+    """
+    modelclass = np.asarray(modelclass)
+    if modelclass.ndim == 0:
+        entry = ranges[modelclass.item()]
+        return np.asarray(entry) if index is None else entry[index]
+    classes, inverse = np.unique(modelclass, return_inverse=True)
+    entries = np.array([ranges[c] for c in classes])
+    if index is not None:
+        entries = entries[:, index]
+    return entries[inverse.reshape(modelclass.shape)]
+
+def _vitem(param, shape, i):
+    param = np.broadcast_to(np.asarray(param, dtype=object), shape)
+    item = param.flat[i]
+    return item.item() if isinstance(item, np.generic) else item
+
+def _vraise(control, checks, values, ok, modelclass, mode):
+    """Raise a BoundsError for the values that are not ok"""
+    if np.all(ok):
+        return
+    bad = ~np.broadcast_to(ok, values.shape)
+    first = np.flatnonzero(bad)[0]
+    value = _vitem(values, values.shape, first)
+    try:
+        checks[control](value, modelclass=_vitem(modelclass, values.shape, first),
+                               mode=_vitem(mode, values.shape, first))
+        message = '{} value is {}, but is out of range.'.format(control.name.lower(), value)
+    except ValueError as e:
+        message = str(e)
+    raise BoundsError(message, _indexes(bad))
+
+def _indexes(bad):
+    if bad.ndim == 1:
+        return [int(i) for i in np.flatnonzero(bad)]
+    return [tuple(int(i) for i in index) for index in np.argwhere(bad)]
+
+def _vintegral(values):
+    if values.dtype.kind == 'O':
+        return np.array([isinstance(v, numbers.Integral) for v in values.flat]).reshape(values.shape)
+    return np.full(values.shape, values.dtype.kind in 'biu')
+
+def vcheckbounds(name, lower, upper, values):
+    """Array version of checkbounds"""
+    values = np.asarray(values)
+    bad = ~((lower <= values) & (values <= upper))
+    if np.any(bad):
+        try:
+            checkbounds(name, lower, upper, values.flat[np.flatnonzero(bad)[0]])
+        except ValueError as e:
+            raise BoundsError(str(e), _indexes(bad))
+
+def _def_vcheck(control, checks, bounds, integral=False, choices=None):
+    """\
+    :param bounds:   function of (modelclass, mode) returning the lower and
+                     upper bounds (scalars or per-motor arrays).
+    :param choices:  if not None, the only legal values (within the bounds).
+    """
+    def _check(values, modelclass=None, mode=None, clip=False):
+        values = np.asarray(values)
+        if integral:
+            _vraise(control, checks, values, _vintegral(values), modelclass, mode)
+        lower, upper = bounds(modelclass, mode)
+        if clip:
+            values = np.clip(values, lower, upper)
+        if choices is None:
+            ok = (lower <= values) & (values <= upper)
+        else:
+            ok = np.isin(values, choices)
+        _vraise(control, checks, values, ok, modelclass, mode)
+        return values
+    return _check
+
+def _def_vbounds(control, checks, lower, upper, integral=False):
+    return _def_vcheck(control, checks, lambda modelclass, mode: (lower, upper), integral=integral)
+
+def _def_voneof(control, checks, choices):
+    choices = list(choices)
+    return _def_vcheck(control, checks, lambda modelclass, mode: (min(choices), max(choices)),
+                       integral=True, choices=choices)
+
+def _def_vchain(control, vchecks):
+    def _check(values, modelclass=None, mode=None, clip=False):
+        values = np.asarray(values)
+        if values.ndim == 0 or values.shape[-1] != len(control.parts):
+            raise ValueError('{} requires {} values per motor, but {} was provided.'.format(control.name, len(control.parts), values))
+        return np.stack([vchecks[c](values[..., j], modelclass=modelclass, mode=mode, clip=clip)
+                         for j, c in enumerate(control.parts)], axis=-1)
+    return _check
+
+def _vno_checks(values, modelclass=None, mode=None, clip=False):
+    return np.asarray(values)
+
+def _position_bytes_bounds(modelclass, mode):
+    return 0, per_motor(POSITION_RANGES, modelclass, 0)
+
+def _position_bounds(modelclass, mode):
+    max_pos = per_motor(POSITION_RANGES, modelclass, 1)/2.0
+    return -max_pos, max_pos
+
+def _speed_bytes_bounds(modelclass, mode):
+    return 0, np.where(np.asarray(mode) == 'joint', 1023, 2047)
+
+def _speed_bounds(modelclass, mode):
+    """Lower and upper speed bounds, in dps or percent, for each motor"""
+    percent = (np.asarray(modelclass) != 'MX') & (np.asarray(mode) == 'wheel')
+    max_speed = 100.0 if np.all(percent) else per_motor(SPEED_RANGES, modelclass, 1)
+    upper = np.where(percent, 100.0, max_speed)
+    return -upper, upper
+
+def _moving_speed_bounds(modelclass, mode):
+    lower, upper = _speed_bounds(modelclass, mode)
+    joint = np.asarray(mode) == 'joint'
+    if np.any(joint):
+        max_speed = per_motor(SPEED_RANGES, modelclass, 1)
+        lower, upper = np.where(joint, 0.0, lower), np.where(joint, max_speed, upper)
+    return lower, upper
+
+def _punch_bounds(modelclass, mode):
+    return per_motor(PUNCH_RANGES, modelclass, 1), 100.0
+
+def _punch_bytes_bounds(modelclass, mode):
+    return per_motor(PUNCH_RANGES, modelclass, 0), 1023
+
+def _compliance_margin_bounds(modelclass, mode):
+    ranges = per_motor(POSITION_RANGES, modelclass)
+    return 0.0, ranges[..., 1]*255/ranges[..., 0]
+
+def _def_vposition_bytes(control):
+    return _def_vcheck(control, CHECK_BYTES, _position_bytes_bounds, integral=True)
+
+def _def_vposition(control):
+    return _def_vcheck(control, CHECK, _position_bounds)
+
+def _def_vspeed_bytes(control):
+    return _def_vcheck(control, CHECK_BYTES, _speed_bytes_bounds, integral=True)
+
+def _def_vcompliance_margin(control):
+    return _def_vcheck(control, CHECK, _compliance_margin_bounds)
+
+_vmoving_speed  = _def_vcheck(pt.MOVING_SPEED,  CHECK, _moving_speed_bounds)
+_vpresent_speed = _def_vcheck(pt.PRESENT_SPEED, CHECK, _speed_bounds)
+_vpunch         = _def_vcheck(pt.PUNCH,         CHECK, _punch_bounds)
+_vpunch_bytes   = _def_vcheck(pt.PUNCH,         CHECK_BYTES, _punch_bytes_bounds, integral=True)
+
+def _def_vbounds_bytes(control, lower, upper):
+    return _def_vbounds(control, CHECK_BYTES, lower, upper, integral=True)
+
+def _def_voneof_bytes(control, choices):
+    return _def_voneof(control, CHECK_BYTES, choices)
+
+VCHECK_BYTES = {
+    pt.MODEL_NUMBER              : _def_vbounds_bytes(pt.MODEL_NUMBER,                 0, 4095),
+    pt.FIRMWARE                  : _def_vbounds_bytes(pt.FIRMWARE,                     0,  253),
+    pt.ID                        : _def_vbounds_bytes(pt.ID,                           0,  253),
+    pt.BAUDRATE                  : _def_vbounds_bytes(pt.BAUDRATE,                     0,  254),
+    pt.RETURN_DELAY_TIME         : _def_vbounds_bytes(pt.RETURN_DELAY_TIME,            0,  254),
+    pt.CW_ANGLE_LIMIT            : _def_vposition_bytes(pt.CW_ANGLE_LIMIT),
+    pt.CCW_ANGLE_LIMIT           : _def_vposition_bytes(pt.CCW_ANGLE_LIMIT),
+    pt.DRIVE_MODE                : _def_vbounds_bytes(pt.DRIVE_MODE,                   0,  255),
+    pt.HIGHEST_LIMIT_TEMPERATURE : _def_vbounds_bytes(pt.HIGHEST_LIMIT_TEMPERATURE,   10,   99),
+    pt.HIGHEST_LIMIT_VOLTAGE     : _def_vbounds_bytes(pt.HIGHEST_LIMIT_VOLTAGE,       50,  250),
+    pt.LOWEST_LIMIT_VOLTAGE      : _def_vbounds_bytes(pt.LOWEST_LIMIT_VOLTAGE,        50,  250),
+    pt.MAX_TORQUE                : _def_vbounds_bytes(pt.MAX_TORQUE,                   0, 1023),
+    pt.STATUS_RETURN_LEVEL       : _def_voneof_bytes(pt.STATUS_RETURN_LEVEL,   (0, 1, 2)),
+    pt.ALARM_LED                 : _def_vbounds_bytes(pt.ALARM_LED,                    0,  255),
+    pt.ALARM_SHUTDOWN            : _def_vbounds_bytes(pt.ALARM_SHUTDOWN,               0,  255),
+
+    # RAM
+    pt.TORQUE_ENABLE             : _def_voneof_bytes(pt.TORQUE_ENABLE,            (0, 1)),
+    pt.LED                       : _def_voneof_bytes(pt.LED,                      (0, 1)),
+    pt.CW_COMPLIANCE_MARGIN      : _def_vbounds_bytes(pt.CW_COMPLIANCE_MARGIN,         0,  255),
+    pt.CCW_COMPLIANCE_MARGIN     : _def_vbounds_bytes(pt.CCW_COMPLIANCE_MARGIN,        0,  255),
+    pt.CW_COMPLIANCE_SLOPE       : _def_vbounds_bytes(pt.CW_COMPLIANCE_SLOPE,          0,  255),
+    pt.CCW_COMPLIANCE_SLOPE      : _def_vbounds_bytes(pt.CCW_COMPLIANCE_SLOPE,         0,  255),
+    pt.D_GAIN                    : _def_vbounds_bytes(pt.D_GAIN,                       0,  254),
+    pt.I_GAIN                    : _def_vbounds_bytes(pt.I_GAIN,                       0,  254),
+    pt.P_GAIN                    : _def_vbounds_bytes(pt.P_GAIN,                       0,  254),
+
+    pt.GOAL_POSITION             : _def_vposition_bytes(pt.GOAL_POSITION),
+    pt.MOVING_SPEED              : _def_vspeed_bytes(pt.MOVING_SPEED),
+    pt.TORQUE_LIMIT              : _def_vbounds_bytes(pt.TORQUE_LIMIT,                 0, 1023),
+    pt.PRESENT_POSITION          : _def_vposition_bytes(pt.PRESENT_POSITION),
+    pt.PRESENT_SPEED             : _def_vbounds_bytes(pt.PRESENT_SPEED,                0, 2047),
+    pt.PRESENT_LOAD              : _def_vbounds_bytes(pt.PRESENT_LOAD,                 0, 2047),
+    pt.PRESENT_VOLTAGE           : _def_vbounds_bytes(pt.PRESENT_VOLTAGE,              0,  254),
+    pt.PRESENT_TEMPERATURE       : _def_vbounds_bytes(pt.PRESENT_TEMPERATURE,          0,  254),
+    pt.REGISTERED                : _def_voneof_bytes(pt.REGISTERED,               (0, 1)),
+    pt.MOVING                    : _def_voneof_bytes(pt.MOVING,                   (0, 1)),
+    pt.LOCK                      : _def_voneof_bytes(pt.LOCK,                     (0, 1)),
+    pt.PUNCH                     : _vpunch_bytes,
+
+    pt.CURRENT                   : _def_vbounds_bytes(pt.CURRENT,                      0, 4095),
+    pt.SENSED_CURRENT            : _def_vbounds_bytes(pt.SENSED_CURRENT,               0, 1024),
+
+    pt.TORQUE_CONTROL_MODE_ENABLE: _def_voneof_bytes(pt.TORQUE_CONTROL_MODE_ENABLE, (0, 1)),
+    pt.GOAL_TORQUE               : _def_vbounds_bytes(pt.GOAL_TORQUE,                  0, 2047),
+    pt.GOAL_ACCELERATION         : _def_vbounds_bytes(pt.GOAL_ACCELERATION,            0,  254),
+}
+VCHECK_BYTES[pt.COMPLIANCE_MARGINS] = _def_vchain(pt.COMPLIANCE_MARGINS, VCHECK_BYTES)
+VCHECK_BYTES[pt.COMPLIANCE_SLOPES]  = _def_vchain(pt.COMPLIANCE_SLOPES,  VCHECK_BYTES)
+VCHECK_BYTES[pt.GAINS]              = _def_vchain(pt.GAINS,              VCHECK_BYTES)
+
+VCHECK = {
+    pt.MODEL_NUMBER              : _def_vbounds(pt.MODEL_NUMBER,              CHECK,    0,  4095, integral=True),
+    pt.FIRMWARE                  : _def_vbounds(pt.FIRMWARE,                  CHECK,    0,   253, integral=True),
+    pt.ID                        : _def_vbounds(pt.ID,                        CHECK,    0,   253, integral=True),
+    pt.BAUDRATE                  : _def_vbounds(pt.BAUDRATE,                  CHECK, 7874, 1000000),
+    pt.RETURN_DELAY_TIME         : _def_vbounds(pt.RETURN_DELAY_TIME,         CHECK,    0,   508),
+    pt.CW_ANGLE_LIMIT            : _def_vposition(pt.CW_ANGLE_LIMIT),
+    pt.CCW_ANGLE_LIMIT           : _def_vposition(pt.CCW_ANGLE_LIMIT),
+    pt.DRIVE_MODE                : _vno_checks,
+    pt.HIGHEST_LIMIT_TEMPERATURE : _def_vbounds(pt.HIGHEST_LIMIT_TEMPERATURE, CHECK,   10,    99),
+    pt.HIGHEST_LIMIT_VOLTAGE     : _def_vbounds(pt.HIGHEST_LIMIT_VOLTAGE,     CHECK,    5,    25),
+    pt.LOWEST_LIMIT_VOLTAGE      : _def_vbounds(pt.LOWEST_LIMIT_VOLTAGE,      CHECK,    5,    25),
+    pt.MAX_TORQUE                : _def_vbounds(pt.MAX_TORQUE,                CHECK,    0,   100),
+    pt.STATUS_RETURN_LEVEL       : _def_voneof(pt.STATUS_RETURN_LEVEL,        CHECK, (0, 1, 2)),
+    pt.ALARM_LED                 : _vno_checks,
+    pt.ALARM_SHUTDOWN            : _vno_checks,
+
+    # RAM
+    pt.TORQUE_ENABLE             : _vno_checks,
+    pt.LED                       : _vno_checks,
+    pt.CW_COMPLIANCE_MARGIN      : _def_vcompliance_margin(pt.CW_COMPLIANCE_MARGIN),
+    pt.CCW_COMPLIANCE_MARGIN     : _def_vcompliance_margin(pt.CCW_COMPLIANCE_MARGIN),
+    pt.CW_COMPLIANCE_SLOPE       : _def_voneof(pt.CW_COMPLIANCE_SLOPE,        CHECK, range(8)),
+    pt.CCW_COMPLIANCE_SLOPE      : _def_voneof(pt.CCW_COMPLIANCE_SLOPE,       CHECK, range(8)),
+    pt.D_GAIN                    : _def_vbounds(pt.D_GAIN,                    CHECK,    0, MAX_D_GAIN),
+    pt.I_GAIN                    : _def_vbounds(pt.I_GAIN,                    CHECK,    0, MAX_I_GAIN),
+    pt.P_GAIN                    : _def_vbounds(pt.P_GAIN,                    CHECK,    0, MAX_P_GAIN),
+
+    pt.GOAL_POSITION             : _def_vposition(pt.GOAL_POSITION),
+    pt.MOVING_SPEED              : _vmoving_speed,
+    pt.TORQUE_LIMIT              : _def_vbounds(pt.TORQUE_LIMIT,              CHECK,    0,   100),
+    pt.PRESENT_POSITION          : _def_vposition(pt.PRESENT_POSITION),
+    pt.PRESENT_SPEED             : _vpresent_speed,
+    pt.PRESENT_LOAD              : _def_vbounds(pt.PRESENT_LOAD,              CHECK, -100,   100),
+    pt.PRESENT_VOLTAGE           : _def_vbounds(pt.PRESENT_VOLTAGE,           CHECK,    0,  25.5),
+    pt.PRESENT_TEMPERATURE       : _def_vbounds(pt.PRESENT_TEMPERATURE,       CHECK,    0,   255),
+    pt.REGISTERED                : _vno_checks,
+    pt.MOVING                    : _vno_checks,
+    pt.LOCK                      : _vno_checks,
+    pt.PUNCH                     : _vpunch,
+
+    pt.CURRENT                   : _def_vbounds(pt.CURRENT,                   CHECK, MIN_CURRENT, MAX_CURRENT),
+    pt.SENSED_CURRENT            : _def_vbounds(pt.SENSED_CURRENT,            CHECK, MIN_SENSED_CURRENT, MAX_SENSED_CURRENT),
+
+    pt.TORQUE_CONTROL_MODE_ENABLE: _vno_checks,
+    pt.GOAL_TORQUE               : _def_vbounds(pt.GOAL_TORQUE,               CHECK,    0,   100),
+    pt.GOAL_ACCELERATION         : _def_vbounds(pt.GOAL_ACCELERATION,         CHECK,    0, 254*8.583, integral=True),
+}
+VCHECK[pt.COMPLIANCE_MARGINS] = _def_vchain(pt.COMPLIANCE_MARGINS, VCHECK_BYTES)
+VCHECK[pt.COMPLIANCE_SLOPES]  = _def_vchain(pt.COMPLIANCE_SLOPES,  VCHECK_BYTES)
+VCHECK[pt.GAINS]              = _def_vchain(pt.GAINS,              VCHECK)
+
+assert set(VCHECK.keys()) == set(CHECK.keys())
+assert set(VCHECK_BYTES.keys()) == set(CHECK_BYTES.keys())
@@ -0,0 +1,101 @@
+"""
+Lookup tables for bytes to unit conversions
+
+Most controls have at most 256 (one byte) or 4096 (12 bits) byte values, so
+their bytes to unit conversion can be precomputed for every value, once per
+(control, modelclass, mode). Tables are built lazily, from the scalar
+conversions of conversions.CONV, and cached:
+
+    table = lut(pt.PRESENT_POSITION, 'AX', 'joint')
+    table[512] # == conversions.bytes2_present_position(512, 'AX', 'joint')
+
+Byte values rejected by the scalar conversion are NaN in the table; bytes2()
+and decode() fall back on the conversion functions for them, so that they raise
+the same errors.
+
+Only conversions returning floats are tabulated: integer, boolean and
+non-numerical ones (model names, alarms) are cheap or would not fit in an
+array of floats.
+"""
+from __future__ import division
+
+import numbers
+
+import numpy as np
+
+from ..refs import protocol as pt
+from . import conversions as conv
+from . import vconversions as vconv
+
+TABULATED = frozenset([
+    pt.GOAL_POSITION, pt.PRESENT_POSITION, pt.CW_ANGLE_LIMIT, pt.CCW_ANGLE_LIMIT,
+    pt.MOVING_SPEED, pt.PRESENT_SPEED, pt.PRESENT_LOAD,
+    pt.MAX_TORQUE, pt.TORQUE_LIMIT, pt.PUNCH,
+    pt.HIGHEST_LIMIT_VOLTAGE, pt.LOWEST_LIMIT_VOLTAGE, pt.PRESENT_VOLTAGE,
+    pt.CW_COMPLIANCE_MARGIN, pt.CCW_COMPLIANCE_MARGIN,
+    pt.D_GAIN, pt.I_GAIN, pt.P_GAIN,
+    pt.GOAL_ACCELERATION, pt.GOAL_TORQUE, pt.CURRENT,
+])
+
+_tables = {}
+
+
+def _build(control, modelclass, mode):
+    size = 256 if control.sizes[0] == 1 else 4096
+    bytes2_unit = conv.CONV[control][1]
+    table = np.empty(size)
+    for value in range(size):
+        try:
+            table[value] = bytes2_unit(value, modelclass=modelclass, mode=mode)
+        except (ValueError, KeyError):
+            table[value] = np.nan
+    table.flags.writeable = False
+    return table
+
+def lut(control, modelclass=None, mode=None):
+    """\
+    Return the bytes to unit table of a control, or None if the control is not
+    tabulated.
+    """
+    key = (control, modelclass, mode)
+    try:
+        return _tables[key]
+    except KeyError:
+        if control not in TABULATED:
+            return None
+        table = _tables[key] = _build(control, modelclass, mode)
+        return table
+
+def bytes2(control, value, modelclass=None, mode=None):
+    """Same as conversions.CONV[control][1], with a table lookup when possible"""
+    table = lut(control, modelclass, mode)
+    if table is not None and isinstance(value, numbers.Integral) and 0 <= value < len(table):
+        unit = table.item(value)
+        if unit == unit: # not NaN
+            return unit
+    return conv.CONV[control][1](value, modelclass=modelclass, mode=mode)
+
+def decode(control, values, modelclass=None, mode=None):
+    """\
+    Same as vconversions.VCONV[control][1], with table lookups when possible.
+
+    :param values:      array of byte values, one per motor.
+    :param modelclass:  modelclass of all motors, or one per motor.
+    :param mode:        mode of all motors, or one per motor.
+    """
+    values = np.asarray(values)
+    if control in TABULATED and values.dtype.kind in 'iu' and values.ndim == 1:
+        modelclasses, modes = np.broadcast_arrays(np.asarray(modelclass, dtype=object),
+                                                  np.asarray(mode, dtype=object), values)[:2]
+        units = np.empty(values.shape)
+        for mc, md in set(zip(modelclasses.tolist(), modes.tolist())):
+            table = lut(control, mc, md)
+            where = (modelclasses == mc) & (modes == md)
+            group = values[where]
+            if len(group) > 0 and (group.min() < 0 or group.max() >= len(table)):
+                break
+            units[where] = table[group]
+        else:
+            if not np.isnan(units).any():
+                return units
+    return vconv.VCONV[control][1](values, modelclass=modelclass, mode=mode)
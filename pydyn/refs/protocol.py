@@ -14,9 +14,11 @@ REG_WRITE  = 0x04
 ACTION     = 0x05
 RESET      = 0x06
 SYNC_WRITE = 0x83
-SYNC_READ  = 0x84
+SYNC_READ  = 0x84 # USB2AX only
+BULK_READ  = 0x92 # MX only
 
 BROADCAST = 254
+USB2AX    = 253 # id of the USB2AX status packets, in answer to sync reads
 
 
 INPUT_VOLTAGE_ERROR = 0
@@ -126,7 +128,7 @@ def _memory_chunk_ctrl(name, models, start, end):
     sizes_d = {}
     ram = True
     for ctrl in CTRL_LIST:
-        if len(ctrl.sizes) == 1 and start <= ctrl.addr < end - ctrl.sizes[0]:
+        if len(ctrl.sizes) == 1 and start <= ctrl.addr and ctrl.addr + ctrl.sizes[0] <= end:
             if ctrl.addr in sizes_d:
                 assert ctrl.sizes[0] == sizes_d[ctrl.addr]
             else:
@@ -176,6 +178,39 @@ CTRL_LIST.append(_memory_chunk_ctrl('RAM',    _all_models, 24, 74))
 CTRL = {ctrl.name: ctrl for ctrl in CTRL_LIST}
 assert len(CTRL_LIST) == len(CTRL)
 
+
+def memory_chunk(start, end):
+    """Return a control for an arbitrary part of memory, between start and end"""
+    return _memory_chunk_ctrl('CHUNK_{}_{}'.format(start, end), _all_models, start, end)
+
+_chunks_cache = {}
+def populated_chunks(model_number, start=24, end=74, max_gap=2):
+    """\
+    Return the controls covering the memory actually populated for a given
+    model between start and end, as a list of contiguous chunks. Holes of
+    at most max_gap bytes between controls are included in the chunks, since
+    reading them is cheaper than sending another instruction.
+
+    For instance, for an AX-12, the RAM (24 to 74) is covered by one chunk
+    between 24 and 50, while for a MX-28, a second chunk, between 68 and 74,
+    is needed.
+    """
+    key = (model_number, start, end, max_gap)
+    if key not in _chunks_cache:
+        ranges = []
+        for ctrl in sorted(CTRL_LIST, key=lambda c: c.addr):
+            if (len(ctrl.sizes) == 1 and model_number in ctrl.models and
+                start <= ctrl.addr and ctrl.addr + ctrl.sizes[0] <= end):
+                c_start, c_end = ctrl.addr, ctrl.addr + ctrl.sizes[0]
+                if len(ranges) > 0 and c_start - ranges[-1][1] <= max_gap:
+                    ranges[-1][1] = max(ranges[-1][1], c_end)
+                else:
+                    ranges.append([c_start, c_end])
+        _chunks_cache[key] = [_memory_chunk_ctrl('CHUNK_{}_{}'.format(c_start, c_end),
+                                                 frozenset((model_number,)), c_start, c_end)
+                              for c_start, c_end in ranges]
+    return _chunks_cache[key]
+
 # EEPROM
 MODEL_NUMBER               = CTRL['MODEL_NUMBER']
 FIRMWARE                   = CTRL['FIRMWARE']
@@ -0,0 +1,486 @@
+"""
+Vectorized conversions
+
+Array versions of the conversions.CONV functions, to convert the values of many
+motors in a few numpy operations. They follow the same naming convention, and
+are accessible through the VCONV dictionnary:
+
+    VCONV[pt.PRESENT_POSITION] = (present_position_2bytes, bytes2_present_position)
+
+    bytes2_present_position(values, modelclass=None, mode=None)
+
+`values` is an array (or a sequence) with one value per motor; modelclass and
+mode are either shared by all motors ('AX', 'joint') or given per motor, as
+sequences of the same length as values. Results are numpy arrays, and follow
+exactly the semantics of the scalar functions, including range checks: out of
+range values raise a limits.BoundsError (a ValueError) listing all the
+offending values, with the message of the scalar check for the first one
+(see limits.VCHECK).
+
+Conversions between bytes and non-numerical values (model names, alarm names)
+are done by the scalar functions, motor by motor, and return lists.
+"""
+
+#pylint: disable=C0103,W0613,C0326
+
+from __future__ import division
+
+import numpy as np
+
+from ..refs import protocol as pt
+from ..refs import limits
+from . import conversions as conv
+
+VCONV = {}
+
+
+def _int(values):
+    """Equivalent of int() for arrays: truncation toward zero"""
+    return np.trunc(values).astype(int)
+
+def _round(values):
+    """Equivalent of int(round()) for arrays"""
+    return np.round(values).astype(int)
+
+def _is(param, value):
+    return np.asarray(param) == value
+
+
+# MARK For simple cases
+
+def _def_bytes2_onebyte(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK_BYTES[control](values)
+        return values.astype(int)
+    return _b2b
+
+def _def_onebyte_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values)
+        return _int(values)
+    return _b2b
+
+def _def_scalar(function, modelclasses=True):
+    """Apply a scalar conversion motor by motor (for non-numerical values)"""
+    def _b2b(values, modelclass=None, mode=None):
+        if not modelclasses:
+            return [function(v) for v in values]
+        modelclass = np.broadcast_to(np.asarray(modelclass, dtype=object), (len(values),))
+        mode       = np.broadcast_to(np.asarray(mode,       dtype=object), (len(values),))
+        return [function(v, modelclass=mc, mode=md) for v, mc, md in zip(values, modelclass, mode)]
+    return _b2b
+
+
+# MARK Model Number
+
+model_number_2bytes = _def_scalar(conv.model_number_2bytes)
+bytes2_model_number = _def_scalar(conv.bytes2_model_number)
+VCONV[pt.MODEL_NUMBER] = (model_number_2bytes, bytes2_model_number)
+
+
+# MARK Firmware, ID, Status Return Level, Temperature
+
+bytes2_firmware = _def_bytes2_onebyte(pt.FIRMWARE)
+firmware_2bytes = _def_onebyte_2bytes(pt.FIRMWARE)
+VCONV[pt.FIRMWARE] = (firmware_2bytes, bytes2_firmware)
+
+bytes2_id = _def_bytes2_onebyte(pt.FIRMWARE)
+id_2bytes = _def_onebyte_2bytes(pt.FIRMWARE)
+VCONV[pt.ID] = (id_2bytes, bytes2_id)
+
+bytes2_status_return_level = _def_bytes2_onebyte(pt.STATUS_RETURN_LEVEL)
+status_return_level_2bytes = _def_onebyte_2bytes(pt.STATUS_RETURN_LEVEL)
+VCONV[pt.STATUS_RETURN_LEVEL] = (status_return_level_2bytes, bytes2_status_return_level)
+
+bytes2_highest_limit_temperature = _def_bytes2_onebyte(pt.HIGHEST_LIMIT_TEMPERATURE)
+highest_limit_temperature_2bytes = _def_onebyte_2bytes(pt.HIGHEST_LIMIT_TEMPERATURE)
+VCONV[pt.HIGHEST_LIMIT_TEMPERATURE] = (highest_limit_temperature_2bytes, bytes2_highest_limit_temperature)
+
+bytes2_present_temperature = _def_bytes2_onebyte(pt.PRESENT_TEMPERATURE)
+present_temperature_2bytes = _def_onebyte_2bytes(pt.PRESENT_TEMPERATURE)
+VCONV[pt.PRESENT_TEMPERATURE] = (present_temperature_2bytes, bytes2_present_temperature)
+
+
+# MARK Baudrate
+
+def bytes2_baudrate(values, modelclass=None, mode=None):
+    values = limits.VCHECK_BYTES[pt.BAUDRATE](values)
+    baudrates = 2000000.0/(values + 1)
+    for b, baudrate in conv.BAUDRATE_MX.items():
+        baudrates = np.where(_is(modelclass, 'MX') & (values == b), baudrate, baudrates)
+    return baudrates
+
+def baudrate_2bytes(values, modelclass=None, mode=None):
+    values = limits.VCHECK[pt.BAUDRATE](values, modelclass)
+    b = _int(2000000.0/values - 1)
+    for baudrate, b_mx in conv.MX_BAUDRATE.items():
+        b = np.where(_is(modelclass, 'MX') & (values == baudrate), b_mx, b)
+    return b
+
+VCONV[pt.BAUDRATE] = (baudrate_2bytes, bytes2_baudrate)
+
+
+# MARK Return delay time
+
+def return_delay_time_2bytes(values, modelclass=None, mode=None):
+    """in microseconds"""
+    values = limits.VCHECK[pt.RETURN_DELAY_TIME](values)
+    return _int(values/2)
+
+def bytes2_return_delay_time(values, modelclass=None, mode=None):
+    """in microseconds"""
+    values = limits.VCHECK_BYTES[pt.RETURN_DELAY_TIME](values)
+    return 2*values
+
+VCONV[pt.RETURN_DELAY_TIME] = (return_delay_time_2bytes, bytes2_return_delay_time)
+
+
+# MARK Voltage
+
+def _def_bytes2_voltage(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK_BYTES[control](values)
+        return values/10.0
+    return _b2b
+
+def _def_voltage_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values)
+        return _int(10.0*values)
+    return _b2b
+
+bytes2_highest_limit_voltage = _def_bytes2_voltage(pt.HIGHEST_LIMIT_VOLTAGE)
+highest_limit_voltage_2bytes = _def_voltage_2bytes(pt.HIGHEST_LIMIT_VOLTAGE)
+VCONV[pt.HIGHEST_LIMIT_VOLTAGE] = (highest_limit_voltage_2bytes, bytes2_highest_limit_voltage)
+
+bytes2_lowest_limit_voltage = _def_bytes2_voltage(pt.LOWEST_LIMIT_VOLTAGE)
+lowest_limit_voltage_2bytes = _def_voltage_2bytes(pt.LOWEST_LIMIT_VOLTAGE)
+VCONV[pt.LOWEST_LIMIT_VOLTAGE] = (lowest_limit_voltage_2bytes, bytes2_lowest_limit_voltage)
+
+bytes2_present_voltage = _def_bytes2_voltage(pt.PRESENT_VOLTAGE)
+present_voltage_2bytes = _def_voltage_2bytes(pt.PRESENT_VOLTAGE)
+VCONV[pt.PRESENT_VOLTAGE] = (present_voltage_2bytes, bytes2_present_voltage)
+
+
+# MARK Torque
+
+def _def_bytes2_percent(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK_BYTES[control](values, modelclass=modelclass, mode=mode)
+        return 100.0*values/1023.0
+    return _b2b
+
+def _def_percent_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values, modelclass=modelclass, mode=mode)
+        return _int(values/100.0*1023)
+    return _b2b
+
+max_torque_2bytes = _def_percent_2bytes(pt.MAX_TORQUE)
+bytes2_max_torque = _def_bytes2_percent(pt.MAX_TORQUE)
+VCONV[pt.MAX_TORQUE] = (max_torque_2bytes, bytes2_max_torque)
+
+torque_limit_2bytes = _def_percent_2bytes(pt.TORQUE_LIMIT)
+bytes2_torque_limit = _def_bytes2_percent(pt.TORQUE_LIMIT)
+VCONV[pt.TORQUE_LIMIT] = (torque_limit_2bytes, bytes2_torque_limit)
+
+punch_2bytes = _def_percent_2bytes(pt.PUNCH)
+bytes2_punch = _def_bytes2_percent(pt.PUNCH)
+VCONV[pt.PUNCH] = (punch_2bytes, bytes2_punch)
+
+
+# MARK Position
+
+def _def_bytes2_degree(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK_BYTES[control](values, modelclass=modelclass, mode=mode)
+        ranges = limits.per_motor(limits.POSITION_RANGES, modelclass)
+        return (values / ranges[..., 0] - 0.5) * ranges[..., 1]
+    return _b2b
+
+def _def_degree_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values, modelclass=modelclass, mode=mode)
+        ranges = limits.per_motor(limits.POSITION_RANGES, modelclass)
+        return _round((values / ranges[..., 1] + 0.5) * ranges[..., 0])
+    return _b2b
+
+bytes2_goal_position = _def_bytes2_degree(pt.GOAL_POSITION)
+goal_position_2bytes = _def_degree_2bytes(pt.GOAL_POSITION)
+VCONV[pt.GOAL_POSITION] = (goal_position_2bytes, bytes2_goal_position)
+
+bytes2_present_position = _def_bytes2_degree(pt.PRESENT_POSITION)
+present_position_2bytes = _def_degree_2bytes(pt.PRESENT_POSITION)
+VCONV[pt.PRESENT_POSITION] = (present_position_2bytes, bytes2_present_position)
+
+bytes2_cw_angle_limit   = _def_bytes2_degree(pt.CW_ANGLE_LIMIT)
+cw_angle_limit_2bytes   = _def_degree_2bytes(pt.CW_ANGLE_LIMIT)
+VCONV[pt.CW_ANGLE_LIMIT] = (cw_angle_limit_2bytes, bytes2_cw_angle_limit)
+
+bytes2_ccw_angle_limit  = _def_bytes2_degree(pt.CCW_ANGLE_LIMIT)
+ccw_angle_limit_2bytes  = _def_degree_2bytes(pt.CCW_ANGLE_LIMIT)
+VCONV[pt.CCW_ANGLE_LIMIT] = (ccw_angle_limit_2bytes, bytes2_ccw_angle_limit)
+
+
+# MARK Speed
+
+def _signed_bytes2(values, ratio):
+    direction = ((values >> 10) * 2) - 1
+    return direction * (values % 1024) * ratio
+
+def _speed_ratios(modelclass, where):
+    """Speed ratio of each motor (1.0 where it is not needed)"""
+    if not np.any(where):
+        return 1.0
+    return np.where(where, limits.per_motor(conv.SPEED_RATIOS, modelclass), 1.0)
+
+def bytes2_present_speed(values, modelclass=None, mode=None):
+    """
+    present speed conversion, in degree per second and percent.
+    For model other than MX, in wheel mode, present speed return
+    the amount of torque exerced on the motor.
+    """
+    values = limits.VCHECK_BYTES[pt.PRESENT_SPEED](values, modelclass=modelclass, mode=mode)
+    load = ~_is(modelclass, 'MX') & _is(mode, 'wheel')
+    return _signed_bytes2(values, np.where(load, 0.1, _speed_ratios(modelclass, ~load)))
+
+def present_speed_2bytes(values, modelclass=None, mode=None):
+    """
+    present speed conversion, in degree per second and percent.
+    For model other than MX, in wheel mode, present speed return
+    the amount of torque exerced on the motor.
+    """
+    values = limits.VCHECK[pt.PRESENT_SPEED](values, modelclass=modelclass, mode=mode)
+    load = ~_is(modelclass, 'MX') & _is(mode, 'wheel')
+    b = _round(np.abs(values)/_speed_ratios(modelclass, ~load))
+    return np.where(load, present_load_2bytes(np.where(load, values, 0.0)),
+                          np.where(values >= 0, b + 1024, b))
+
+VCONV[pt.PRESENT_SPEED] = (present_speed_2bytes, bytes2_present_speed)
+
+
+def bytes2_moving_speed(values, modelclass=None, mode=None):
+    """
+    moving speed conversion, in degree per second and percent.
+    In wheel mode, the conversion is the one of the present speed.
+    """
+    values = limits.VCHECK_BYTES[pt.MOVING_SPEED](values, modelclass=modelclass, mode=mode)
+    joint = _is(mode, 'joint')
+    wheel = np.where(joint, 0, values) # joint values may be out of the wheel range
+    return np.where(joint, values*_speed_ratios(modelclass, joint),
+                           bytes2_present_speed(wheel, modelclass=modelclass, mode=mode))
+
+def moving_speed_2bytes(values, modelclass=None, mode=None):
+    """
+    moving speed conversion, in degree per second and percent.
+    In wheel mode, the conversion is the one of the present speed.
+    """
+    values = limits.VCHECK[pt.MOVING_SPEED](values, modelclass=modelclass, mode=mode)
+    joint = _is(mode, 'joint')
+    wheel = np.where(joint, 0.0, values)
+    return np.where(joint, _round(values/_speed_ratios(modelclass, joint)),
+                           present_speed_2bytes(wheel, modelclass=modelclass, mode=mode))
+
+VCONV[pt.MOVING_SPEED] = (moving_speed_2bytes, bytes2_moving_speed)
+
+
+# MARK Load
+
+def bytes2_present_load(values, modelclass=None, mode=None):
+    """return the load into signed torque percent"""
+    values = limits.VCHECK_BYTES[pt.PRESENT_LOAD](values)
+    return _signed_bytes2(values, 0.1)
+
+def present_load_2bytes(values, modelclass=None, mode=None):
+    values = limits.VCHECK[pt.PRESENT_LOAD](values)
+    b = _round(np.abs(values)*1023/100.0)
+    return np.where(values > 0, b + 1024, b)
+
+VCONV[pt.PRESENT_LOAD] = (present_load_2bytes, bytes2_present_load)
+
+
+# MARK: - Gain conversions
+
+def _def_bytes2_gain(control, factor):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK_BYTES[control](values)
+        return factor * values
+    return _b2b
+
+def _def_gain_2bytes(control, factor):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values)
+        return _int(factor * values)
+    return _b2b
+
+bytes2_d_gain = _def_bytes2_gain(pt.D_GAIN, 0.004)
+bytes2_i_gain = _def_bytes2_gain(pt.I_GAIN, 1/2.048)
+bytes2_p_gain = _def_bytes2_gain(pt.P_GAIN, 0.125)
+
+d_gain_2bytes = _def_gain_2bytes(pt.D_GAIN, 250.0)
+i_gain_2bytes = _def_gain_2bytes(pt.I_GAIN, 2.048)
+p_gain_2bytes = _def_gain_2bytes(pt.P_GAIN, 8.0)
+
+VCONV[pt.D_GAIN] = (d_gain_2bytes, bytes2_d_gain)
+VCONV[pt.I_GAIN] = (i_gain_2bytes, bytes2_i_gain)
+VCONV[pt.P_GAIN] = (p_gain_2bytes, bytes2_p_gain)
+
+def _def_chain(functions):
+    def _b2b(values, modelclass=None, mode=None):
+        """values is a (motors, 3) array; the result too."""
+        values = np.asarray(values)
+        if values.ndim == 0 or values.shape[-1] != len(functions):
+            raise ValueError('Gains should have 3 values')
+        return np.stack([f(values[..., j]) for j, f in enumerate(functions)], axis=-1)
+    return _b2b
+
+bytes2_gains = _def_chain((bytes2_d_gain, bytes2_i_gain, bytes2_p_gain))
+gains_2bytes = _def_chain((d_gain_2bytes, i_gain_2bytes, p_gain_2bytes))
+VCONV[pt.GAINS] = (gains_2bytes, bytes2_gains)
+
+
+# MARK Compliance Margins
+
+def _def_bytes2_compliance_margin(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK_BYTES[control](values, modelclass=modelclass, mode=mode)
+        ranges = limits.per_motor(limits.POSITION_RANGES, modelclass)
+        return (values / ranges[..., 0]) * ranges[..., 1]
+    return _b2b
+
+def _def_compliance_margin_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values, modelclass=modelclass, mode=mode)
+        ranges = limits.per_motor(limits.POSITION_RANGES, modelclass)
+        return _round((values / ranges[..., 1]) * ranges[..., 0])
+    return _b2b
+
+cw_compliance_margin_2bytes = _def_compliance_margin_2bytes(pt.CW_COMPLIANCE_MARGIN)
+bytes2_cw_compliance_margin = _def_bytes2_compliance_margin(pt.CW_COMPLIANCE_MARGIN)
+VCONV[pt.CW_COMPLIANCE_MARGIN] = (cw_compliance_margin_2bytes, bytes2_cw_compliance_margin)
+
+ccw_compliance_margin_2bytes = _def_compliance_margin_2bytes(pt.CCW_COMPLIANCE_MARGIN)
+bytes2_ccw_compliance_margin = _def_bytes2_compliance_margin(pt.CCW_COMPLIANCE_MARGIN)
+VCONV[pt.CCW_COMPLIANCE_MARGIN] = (ccw_compliance_margin_2bytes, bytes2_ccw_compliance_margin)
+
+
+# MARK Compliance Slopes
+
+def _def_bytes2_compliance_slope(control):
+    def _b2b(values, modelclass=None, mode=None):
+        """index of the highest bit set (0 for 0)"""
+        values = limits.VCHECK_BYTES[control](values)
+        slopes = np.zeros(values.shape, dtype=int)
+        for i in range(1, 8):
+            slopes[(values >> i) > 0] = i
+        return slopes
+    return _b2b
+
+def _def_compliance_slope_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values)
+        return 2**values.astype(int)
+    return _b2b
+
+cw_compliance_scope_2bytes  = _def_compliance_slope_2bytes(pt.CW_COMPLIANCE_SLOPE)
+bytes2_cw_compliance_scope  = _def_bytes2_compliance_slope(pt.CW_COMPLIANCE_SLOPE)
+
+ccw_compliance_scope_2bytes = _def_compliance_slope_2bytes(pt.CCW_COMPLIANCE_SLOPE)
+bytes2_ccw_compliance_scope = _def_bytes2_compliance_slope(pt.CCW_COMPLIANCE_SLOPE)
+
+VCONV[pt.CW_COMPLIANCE_SLOPE]  = ( cw_compliance_scope_2bytes, bytes2_cw_compliance_scope)
+VCONV[pt.CCW_COMPLIANCE_SLOPE] = (ccw_compliance_scope_2bytes, bytes2_ccw_compliance_scope)
+
+
+# MARK Alarm conversions
+
+bytes2_alarm_led = _def_scalar(conv.bytes2_alarm_led, modelclasses=False)
+alarm_led_2bytes = _def_scalar(conv.alarm_led_2bytes, modelclasses=False)
+VCONV[pt.ALARM_LED] = (alarm_led_2bytes, bytes2_alarm_led)
+
+bytes2_alarm_shutdown = _def_scalar(conv.bytes2_alarm_shutdown, modelclasses=False)
+alarm_shutdown_2bytes = _def_scalar(conv.alarm_shutdown_2bytes, modelclasses=False)
+VCONV[pt.ALARM_SHUTDOWN] = (alarm_shutdown_2bytes, bytes2_alarm_shutdown)
+
+
+# MARK Goal Acceleration
+
+def goal_acceleration_2bytes(values, modelclass=None, mode=None):
+    """in degree/s**2"""
+    values = np.asarray(values)
+    limits.vcheckbounds('goal acceleration', 0, 2180.082, values)
+    return _int(values/8.583)
+
+def bytes2_goal_acceleration(values, modelclass=None, mode=None):
+    """in degree/s**2"""
+    values = limits.VCHECK[pt.GOAL_ACCELERATION](values)
+    return values*8.583
+
+VCONV[pt.GOAL_ACCELERATION] = (goal_acceleration_2bytes, bytes2_goal_acceleration)
+
+
+# MARK Goal Torque, Current
+
+def _def_current_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        """in A"""
+        values = limits.VCHECK[control](values)
+        return _int(values/0.0045 + 2048)
+    return _b2b
+
+def _def_bytes2_current(control):
+    def _b2b(values, modelclass=None, mode=None):
+        """in A"""
+        values = limits.VCHECK_BYTES[control](values)
+        return 0.0045 * (values - 2048)
+    return _b2b
+
+goal_torque_2bytes = _def_current_2bytes(pt.GOAL_TORQUE)
+bytes2_goal_torque = _def_bytes2_current(pt.GOAL_TORQUE)
+VCONV[pt.GOAL_TORQUE] = (goal_torque_2bytes, bytes2_goal_torque)
+
+current_2bytes = _def_current_2bytes(pt.CURRENT)
+bytes2_current = _def_bytes2_current(pt.CURRENT)
+VCONV[pt.CURRENT] = (current_2bytes, bytes2_current)
+
+
+# Mark Boolean
+
+def _def_bool_2bytes(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK_BYTES[control](values)
+        return values.astype(int)
+    return _b2b
+
+def _def_bytes2_bool(control):
+    def _b2b(values, modelclass=None, mode=None):
+        values = limits.VCHECK[control](values)
+        return values.astype(bool)
+    return _b2b
+
+bytes2_registered = _def_bytes2_bool(pt.REGISTERED)
+registered_2bytes = _def_bool_2bytes(pt.REGISTERED)
+VCONV[pt.REGISTERED] = (registered_2bytes, bytes2_registered)
+
+bytes2_lock = _def_bytes2_bool(pt.LOCK)
+lock_2bytes = _def_bool_2bytes(pt.LOCK)
+VCONV[pt.LOCK] = (lock_2bytes, bytes2_lock)
+
+bytes2_led = _def_bytes2_bool(pt.LED)
+led_2bytes = _def_bool_2bytes(pt.LED)
+VCONV[pt.LED] = (led_2bytes, bytes2_led)
+
+bytes2_moving = _def_bytes2_bool(pt.MOVING)
+moving_2bytes = _def_bool_2bytes(pt.MOVING)
+VCONV[pt.MOVING] = (moving_2bytes, bytes2_moving)
+
+bytes2_torque_control_mode_enable = _def_bytes2_bool(pt.TORQUE_CONTROL_MODE_ENABLE)
+torque_control_mode_enable_2bytes = _def_bool_2bytes(pt.TORQUE_CONTROL_MODE_ENABLE)
+VCONV[pt.TORQUE_CONTROL_MODE_ENABLE] = (torque_control_mode_enable_2bytes, bytes2_torque_control_mode_enable)
+
+bytes2_torque_enable = _def_bytes2_bool(pt.TORQUE_ENABLE)
+torque_enable_2bytes = _def_bool_2bytes(pt.TORQUE_ENABLE)
+VCONV[pt.TORQUE_ENABLE] = (torque_enable_2bytes, bytes2_torque_enable)
+
+
+assert set(VCONV.keys()) == set(conv.CONV.keys())
@@ -2,6 +2,7 @@ import unittest
 
 import env
 from pydyn.refs.alarms import (bytes2_alarm_names, alarm_names_2bytes)
+from pydyn.refs.alarms import bytes2_alarm_codes
 
 
 ALARMS = [
@@ -29,6 +30,14 @@ class TestAlarmCodes(unittest.TestCase):
         for r in range(127):
             self.assertEqual(alarm_names_2bytes(bytes2_alarm_names(r)), r)
 
+    def test_codes(self):
+        for r in range(128):
+            codes = bytes2_alarm_codes(r)
+            self.assertEqual(len(codes), 7)
+            self.assertEqual(sum(c*2**i for i, c in enumerate(codes)), r)
+        with self.assertRaises(ValueError):
+            bytes2_alarm_codes(128)
+
     def test_on_examples(self):
         for code, name_list in EXAMPLES:
             self.assertEqual(set(name_list), set(bytes2_alarm_names(code)))
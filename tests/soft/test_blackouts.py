@@ -0,0 +1,74 @@
+"""Test the EEPROM blackout durations"""
+from __future__ import print_function, division
+import unittest
+
+import env
+from pydyn import clock
+from pydyn.refs import protocol as pt
+from pydyn.refs import blackouts
+from pydyn.ios.fakeio import fakecom
+from pydyn.dynamixel import controller
+
+
+class TestBlackouts(unittest.TestCase):
+
+    def tearDown(self):
+        blackouts.BLACKOUTS.clear()
+
+    def test_defaults(self):
+        self.assertEqual(blackouts.duration('AX-12', pt.TORQUE_LIMIT), 0.0)
+        self.assertEqual(blackouts.duration('AX-12', pt.MAX_TORQUE), blackouts.DEFAULT_CELL_BLACKOUT)
+        self.assertEqual(blackouts.duration('AX-12', pt.ANGLE_LIMITS), 2*blackouts.DEFAULT_CELL_BLACKOUT)
+
+    def test_table(self):
+        blackouts.update({'AX':    {'CW_ANGLE_LIMIT': 0.005, 'CCW_ANGLE_LIMIT': 0.006},
+                          'AX-12': {'CW_ANGLE_LIMIT': 0.004}})
+        self.assertEqual(blackouts.duration('AX-12', pt.CW_ANGLE_LIMIT), 0.004)
+        self.assertEqual(blackouts.duration('AX-18', pt.CW_ANGLE_LIMIT), 0.005)
+        self.assertAlmostEqual(blackouts.duration('AX-12', pt.ANGLE_LIMITS), 0.010)
+        self.assertEqual(blackouts.duration('MX-28', pt.CW_ANGLE_LIMIT), blackouts.DEFAULT_CELL_BLACKOUT)
+
+
+class TestProbe(unittest.TestCase):
+
+    def setUp(self):
+        self.mcom = fakecom.FakeCom()
+        self.mcom._add_motor(3,  'AX-12')
+
+    def tearDown(self):
+        self.mcom.close()
+
+    def test_probe(self):
+        blackouts.update({'AX-12': {'MAX_TORQUE': 10.0}})
+        ctrl = controller.DynamixelController(self.mcom, probe_blackouts=True)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        ctrl.start()
+        ctrl.motors[0].max_torque = 50
+        ctrl.wait(3)
+        self.assertEqual(ctrl._mtimeouts, {})
+        ctrl.close()
+        blackouts.BLACKOUTS.clear()
+
+    def test_blackout(self):
+        """Reads are suppressed during a blackout, and resume once it expires"""
+        blackouts.update({'AX-12': {'MAX_TORQUE': 0.5}})
+        ctrl = controller.DynamixelController(self.mcom, clock=clock.VirtualClock())
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        m = ctrl.motors[0]
+        m.max_torque = 50
+        ctrl.step()
+        self.assertEqual(list(ctrl._mtimeouts.keys()), [3])
+
+        self.mcom._fakemems[3][pt.PRESENT_POSITION.addr] = 700
+        ctrl.step()
+        self.assertNotEqual(m.present_position_bytes, 700)
+
+        ctrl.clock.advance(0.5)
+        ctrl.step()
+        self.assertEqual(m.present_position_bytes, 700)
+        self.assertEqual(ctrl._mtimeouts, {})
+        ctrl.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Test stepping controllers with a virtual clock"""
+from __future__ import print_function, division
+import unittest
+import tempfile
+import shutil
+import os
+
+import env
+from pydyn import clock
+from pydyn.ios.kinio import kinio
+from pydyn.ios.kinio import kinmotor
+from pydyn.ios.fakeio import fakecom
+from pydyn.ios.serialio import serialcom
+from pydyn.dynamixel import controller, memfile
+
+
+def kin_run(frames):
+    clk = clock.VirtualClock()
+    kio = kinio.KinSerial()
+    m13 = kinmotor.KinMotor('AX-12', 13, clock=clk)
+    m17 = kinmotor.KinMotor('AX-12', 17, clock=clk)
+    kinio.KinCable(m13.ports[1], m17.ports[0])
+    kio.connect(m13.ports[0])
+
+    ctrl = controller.DynamixelController(serialcom.SerialCom(kio), freq=50, clock=clk)
+    ctrl.load_motors(ctrl.discover_motors(motor_ids=[13, 17], verbose=False))
+    for m in ctrl.motors:
+        m.moving_speed = 100
+        m.position = 30
+    positions = []
+    for _ in range(frames):
+        ctrl.step()
+        positions.append(tuple(m.position for m in ctrl.motors))
+    ctrl.close()
+    return clk, positions
+
+
+class TestClock(unittest.TestCase):
+
+    def test_virtual_clock(self):
+        clk = clock.VirtualClock(start=10.0)
+        self.assertEqual(clk.time(), 10.0)
+        clk.sleep(0.5)
+        self.assertEqual(clk.time(), 10.5)
+        with self.assertRaises(ValueError):
+            clk.advance(-1.0)
+
+    def test_kin_step(self):
+        clk, positions = kin_run(50)
+        self.assertAlmostEqual(clk.time(), 1.0)
+        # at 100 deg/s, the target is reached in 0.3s of simulated time.
+        self.assertTrue(all(abs(p - 30) < 0.5 for p in positions[-1]))
+        self.assertTrue(all(abs(p - 30) > 1.0 for p in positions[5]))
+
+        _, positions2 = kin_run(50)
+        self.assertEqual(positions, positions2)
+
+    def test_fake_step_setpoints(self):
+        mcom = fakecom.FakeCom()
+        mcom._add_motor(3, 'AX-12')
+        clk = clock.VirtualClock()
+        ctrl = controller.DynamixelController(mcom, freq=10, clock=clk)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        m = ctrl.motors[0]
+
+        m.push_setpoint(0.15, 20)
+        m.push_setpoint(0.45, 40)
+        self.assertEqual(ctrl.step(3), 3)
+        self.assertAlmostEqual(m.goal_position, 20, places=0)
+        ctrl.step(3)
+        self.assertAlmostEqual(m.goal_position, 40, places=0)
+        self.assertEqual(len(m.setpoints), 0)
+
+    def test_setpoint_and_request(self):
+        """An explicit write wins over a setpoint due in the same frame"""
+        mcom = fakecom.FakeCom()
+        mcom._add_motor(3, 'AX-12')
+        clk = clock.VirtualClock()
+        ctrl = controller.DynamixelController(mcom, freq=10, clock=clk)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        m = ctrl.motors[0]
+
+        m.push_setpoint(0.0, 20, speed=50)
+        f = m.request_write('goal_position', 60, future=True)
+        ctrl.step()
+        self.assertIsNone(f.result(timeout=0))
+        self.assertAlmostEqual(m.goal_position, 60, places=0)
+        self.assertAlmostEqual(m.moving_speed, 50, places=0)
+        self.assertEqual(len(m.setpoints), 0)
+
+    def test_history_timestamps(self):
+        """Recorded memories are timestamped with the controller clock"""
+        tmpdir = tempfile.mkdtemp()
+        try:
+            mcom = fakecom.FakeCom()
+            mcom._add_motor(3, 'AX-12')
+            ctrl = controller.DynamixelController(mcom, freq=10, clock=clock.VirtualClock(start=5.0))
+            ctrl.load_motors(ctrl.discover_motors(verbose=False))
+            mcom.save_history(memfile.HistoryFile(os.path.join(tmpdir, 'h.hist'), capacity=10))
+            ctrl.step(3)
+            records = mcom.history.records()
+            self.assertTrue(all(abs(records['timestamp'] - [5.0, 5.1, 5.2]) < 1e-9))
+            mcom.history.close()
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_sim_trigger(self):
+        """The simulation is triggered at each step only in synchronous mode"""
+        class Sim(object):
+            triggers = 0
+            def simSynchronousTrigger(self):
+                self.triggers += 1
+        mcom = fakecom.FakeCom()
+        mcom.sim = Sim()
+        ctrl = controller.DynamixelController(mcom, clock=clock.VirtualClock())
+        ctrl.step(2)
+        self.assertEqual(mcom.sim.triggers, 0)
+        mcom.synchronous = True
+        ctrl.step(3)
+        self.assertEqual(mcom.sim.triggers, 3)
+
+    def test_step_running(self):
+        mcom = fakecom.FakeCom()
+        ctrl = controller.DynamixelController(mcom)
+        ctrl.start()
+        with self.assertRaises(RuntimeError):
+            ctrl.step()
+        ctrl.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,6 +5,7 @@ import time
 import copy
 
 import env
+from pydyn.refs import protocol as pt
 from pydyn.ios.fakeio import fakecom
 from pydyn.dynamixel import controller
 
@@ -60,6 +61,11 @@ class TestFake(unittest.TestCase):
         m.cw_angle_limit = 40
         m.compliant = False
 
+        # slotted motors: no instance dictionary
+        self.assertFalse(hasattr(m, '__dict__'))
+        with self.assertRaises(AttributeError):
+            object.__setattr__(m, 'does_not_exists', 312)
+
     def test_sync_motor(self):
         ctrl = controller.DynamixelController(self.mcom)
         mids = ctrl.discover_motors(verbose=False)
@@ -74,6 +80,83 @@ class TestFake(unittest.TestCase):
 
         ctrl.stop()
 
+    def test_wait_frame(self):
+        ctrl = controller.DynamixelController(self.mcom)
+        mids = ctrl.discover_motors(verbose=False)
+        ctrl.load_motors(mids)
+
+        frames = []
+        ctrl.register_frame_callback(lambda c: frames.append(c.frameseq))
+        ctrl.start()
+
+        seq = ctrl.wait_frame(timeout=1.0)
+        self.assertTrue(seq is not None and seq >= 1)
+        seq2 = ctrl.wait_frame(timeout=1.0)
+        self.assertTrue(seq2 > seq)
+        self.assertTrue(seq2 in frames)
+
+        ctrl.stop()
+        ctrl.join(1.0)
+        self.assertEqual(ctrl.wait_frame(timeout=0.05), None)
+
+    def test_failing_callback(self):
+        """A callback raising does not stop the loop, nor keep the controller lock"""
+        ctrl = controller.DynamixelController(self.mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+
+        frames = []
+        def failing(c):
+            raise RuntimeError('failing callback')
+        ctrl.register_frame_callback(failing)
+        ctrl.register_frame_callback(lambda c: frames.append(c.frameseq))
+        self.assertEqual(ctrl.step(2), 2)
+        self.assertEqual(frames, [1, 2])
+
+        ctrl.start()
+        seq = ctrl.wait_frame(timeout=1.0)
+        self.assertTrue(ctrl.wait_frame(timeout=1.0) > seq)
+        self.assertTrue(ctrl.is_alive())
+        ctrl.stop()
+        ctrl.join(1.0)
+        self.assertTrue(ctrl._ctrllock.acquire(False))
+        ctrl._ctrllock.release()
+
+    def test_snapshot(self):
+        ctrl = controller.DynamixelController(self.mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        self.assertEqual(ctrl.snapshot().mids, (3, 17))
+
+        ctrl.step()
+        snap = ctrl.snapshot()
+        self.assertEqual(snap.frameseq, 1)
+        self.assertTrue(snap is ctrl.snapshot())
+        self.assertEqual(list(snap.column(pt.PRESENT_POSITION)),
+                         [m.present_position_bytes for m in ctrl.motors])
+        with self.assertRaises(ValueError):
+            snap.data[0, pt.PRESENT_POSITION.addr] = 0
+
+        self.mcom._fakemems[17][pt.PRESENT_POSITION.addr] = 100
+        ctrl.step()
+        self.assertEqual(ctrl.snapshot().row(17)[pt.PRESENT_POSITION.addr], 100)
+        self.assertNotEqual(snap.row(17)[pt.PRESENT_POSITION.addr], 100)
+
+    def test_conversion_cache(self):
+        ctrl = controller.DynamixelController(self.mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        m = ctrl.motors[1]
+        ctrl.step()
+
+        position = m.position
+        version, value = m._conv_cache[pt.PRESENT_POSITION]
+        self.assertEqual(version, m.mmem.version)
+        self.assertEqual(m.position, position)
+        self.assertEqual(m._conv_cache[pt.PRESENT_POSITION][0], version)
+
+        self.mcom._fakemems[17][pt.PRESENT_POSITION.addr] = 0
+        ctrl.step()
+        self.assertTrue(m.mmem.version > version)
+        self.assertAlmostEqual(m.position, -150.0)
+
     def test_copy_motor(self):
         ctrl = controller.DynamixelController(self.mcom)
         mids = ctrl.discover_motors(verbose=False)
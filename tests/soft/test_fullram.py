@@ -0,0 +1,102 @@
+"""Test the full RAM controller"""
+from __future__ import print_function, division
+import unittest
+
+import env
+from pydyn.refs import protocol as pt
+from pydyn.ios.fakeio import fakecom
+from pydyn.ios.kinio import kinio
+from pydyn.ios.kinio import kinmotor
+from pydyn.ios.serialio import serialcom
+from pydyn.dynamixel import controller
+
+
+class TestChunks(unittest.TestCase):
+
+    def test_populated_chunks(self):
+        ax_chunks = pt.populated_chunks(12)
+        self.assertEqual([(c.addr, sum(c.sizes)) for c in ax_chunks], [(24, 26)])
+        mx_chunks = pt.populated_chunks(29)
+        self.assertEqual([(c.addr, sum(c.sizes)) for c in mx_chunks], [(24, 26), (68, 6)])
+        self.assertEqual(mx_chunks[0].sizes[9:12], pt.PRESENT_POS_SPEED_LOAD.sizes)
+
+
+class TestFullRam(unittest.TestCase):
+
+    def setUp(self):
+        self.mcom = fakecom.FakeCom()
+        self.mcom._add_motor(3,  'AX-12')
+        self.mcom._add_motor(17, 'AX-12')
+
+    def tearDown(self):
+        self.mcom.close()
+
+    def _ctrl(self, **kwargs):
+        ctrl = controller.DynamixelControllerFullRam(self.mcom, **kwargs)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        ctrl.start()
+        return ctrl
+
+    def test_read_all(self):
+        ctrl = self._ctrl()
+        self.mcom._fakemems[3][pt.PRESENT_TEMPERATURE.addr]  = 50
+        self.mcom._fakemems[17][pt.PRESENT_TEMPERATURE.addr] = 51
+        ctrl.wait(2)
+        self.assertFalse(ctrl.ram_rotating)
+        self.assertEqual([m.present_temperature for m in ctrl.motors], [50, 51])
+        ctrl.close()
+
+    def test_rotation(self):
+        ctrl = self._ctrl(budget=1)
+        self.mcom._fakemems[3][pt.PRESENT_VOLTAGE.addr]  = 100
+        self.mcom._fakemems[17][pt.PRESENT_VOLTAGE.addr] = 101
+        ctrl.wait(3)
+        self.assertTrue(ctrl.ram_rotating)
+        self.assertEqual([m.present_voltage_bytes for m in ctrl.motors], [100, 101])
+        ctrl.close()
+
+    def test_sync_read(self):
+        self.mcom = fakecom.FakeCom(support_sync_read=True)
+        self.mcom._add_motor(3,  'AX-12')
+        self.mcom._add_motor(17, 'AX-12')
+        ctrl = self._ctrl()
+        self.assertEqual(len(ctrl._ram_jobs), 1)
+        ctrl.close()
+
+    def test_read_future(self):
+        """A ram read future is resolved with a value read after the request"""
+        ctrl = controller.DynamixelControllerFullRam(self.mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        ctrl.step()
+        m = ctrl.motors[0]
+        self.mcom._fakemems[3][pt.PRESENT_TEMPERATURE.addr] = 60
+
+        f = m.request_read('temperature', future=True)
+        ctrl.step() # the request is handled after the read phase
+        self.assertFalse(ctrl.ram_rotating)
+        self.assertFalse(f.done())
+        self.mcom._fakemems[3][pt.PRESENT_TEMPERATURE.addr] = 61
+        ctrl.step()
+        self.assertEqual(f.result(timeout=0), 61)
+
+        g = m.request_read('temperature', future=True)
+        ctrl.step()
+        ctrl._record_error(self.mcom.MotorError(3, ['FakeError']))
+        self.assertIsInstance(g.exception(timeout=0), self.mcom.MotorError)
+        ctrl.close()
+
+    def test_kinio(self):
+        kio = kinio.KinSerial()
+        mcom = serialcom.SerialCom(kio)
+        m13 = kinmotor.KinMotor('AX-12', 13)
+        kio.connect(m13.ports[0])
+        ctrl = controller.DynamixelControllerFullRam(mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        ctrl.start()
+        ctrl.wait(2)
+        self.assertTrue(ctrl.is_alive())
+        ctrl.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Test the futures of motor requests"""
+from __future__ import print_function, division
+import unittest
+import sys
+
+import env
+from pydyn.refs import protocol as pt
+from pydyn.refs import exc
+from pydyn.ios.fakeio import fakecom
+from pydyn.dynamixel import controller, futures
+
+
+class TestFutures(unittest.TestCase):
+
+    def setUp(self):
+        self.mcom = fakecom.FakeCom()
+        self.mcom._add_motor(3,  'AX-12')
+        self.mcom._add_motor(17, 'AX-12')
+        self.ctrl = controller.DynamixelController(self.mcom)
+        self.ctrl.load_motors(self.ctrl.discover_motors(verbose=False))
+        self.m = self.ctrl.motors[0]
+
+    def tearDown(self):
+        self.ctrl.close()
+
+    def test_read(self):
+        self.assertIsNone(self.m.request_read('temperature'))
+        f = self.m.request_read('temperature', future=True)
+        self.assertFalse(f.done())
+        with self.assertRaises(futures.TimeoutError):
+            f.result(timeout=0.01)
+
+        called = []
+        f.add_done_callback(called.append)
+        self.ctrl.step()
+        self.assertTrue(f.done())
+        self.assertEqual(f.result(), self.m.present_temperature)
+        self.assertEqual(called, [f])
+        self.assertFalse(self.m.requested_read('temperature'))
+
+    def test_write(self):
+        f = self.m.request_write('torque_limit', 100.0, future=True)
+        g = self.m.request_write(pt.RETURN_DELAY_TIME, self.m.return_delay_time, future=True)
+        self.assertEqual(self.m.requested_write(pt.TORQUE_LIMIT), 1023)
+        with self.assertRaises(ValueError):
+            self.m.request_write('torque_limit', 120.0, future=True)
+
+        self.ctrl.step() # the EEPROM write is done alone
+        self.assertTrue(g.done() and not f.done())
+        self.ctrl.clock.sleep(0.05)
+        self.ctrl.step()
+        self.assertIsNone(f.result(timeout=0))
+        self.assertEqual(round(self.m.torque_limit), 100)
+
+    def test_property_control(self):
+        """Controls handled by a motor property have no future"""
+        with self.assertRaises(ValueError):
+            self.m.request_write('cw_angle_limit', 0.0, future=True)
+        self.assertEqual(self.m.write_requests, {})
+        self.assertIsNone(self.m.request_write('cw_angle_limit', self.m.cw_angle_limit))
+
+    def test_error(self):
+        def failing_set(control, mids, valuess):
+            raise self.mcom.MotorError(mids[0], ['FakeError'])
+        self.mcom.set = failing_set
+
+        f = self.m.request_write('torque_limit', 50.0, future=True)
+        g = self.ctrl.motors[1].request_read('temperature', future=True)
+        self.ctrl.step()
+        self.assertIsInstance(f.exception(timeout=0), exc.MotorError)
+        with self.assertRaises(exc.MotorError):
+            g.result(timeout=0)
+
+    @unittest.skipIf(sys.version_info < (3, 5), 'requires asyncio')
+    def test_await(self):
+        import asyncio
+        self.ctrl.start()
+        loop = asyncio.new_event_loop()
+        try:
+            value = loop.run_until_complete(self.m.request_read('voltage', future=True))
+        finally:
+            loop.close()
+        self.assertEqual(value, self.m.present_voltage)
+
+
+if __name__ == '__main__':
+    unittest.main()
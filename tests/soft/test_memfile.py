@@ -0,0 +1,112 @@
+"""Test the on-disk memory history"""
+from __future__ import print_function, division
+import unittest
+import tempfile
+import shutil
+import os
+
+import numpy as np
+
+import env
+from pydyn import clock
+from pydyn.refs import protocol as pt
+from pydyn.ios.fakeio import fakecom
+from pydyn.dynamixel import controller, memfile, memory
+
+
+class TestHistoryFile(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filepath = os.path.join(self.tmpdir, 'test.hist')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_ring(self):
+        h = memfile.HistoryFile(self.filepath, capacity=10)
+        reader = memfile.HistoryFile(self.filepath, mode='r')
+        cells, valid = np.zeros(memory.MEMORY_SIZE), np.ones(memory.MEMORY_SIZE, dtype=bool)
+
+        for i in range(7):
+            cells[pt.PRESENT_POSITION.addr] = i
+            h.append(1, cells, valid, timestamp=float(i))
+        self.assertEqual(len(reader), 7)
+        self.assertEqual(list(reader.records()['timestamp']), list(range(7)))
+
+        for i in range(7, 25):
+            cells[pt.PRESENT_POSITION.addr] = i
+            h.append(1, cells, valid, timestamp=float(i))
+        records = reader.records()
+        self.assertEqual(reader.count, 25)
+        self.assertEqual(len(records), 10)
+        self.assertEqual(list(records['cells'][:, pt.PRESENT_POSITION.addr]), list(range(15, 25)))
+        self.assertEqual(list(reader.records(last=3)['timestamp']), [22.0, 23.0, 24.0])
+
+        with self.assertRaises(IOError):
+            reader.append(1, cells, valid)
+        h.close()
+
+        h = memfile.HistoryFile(self.filepath, mode='a')
+        self.assertEqual(h.capacity, 10)
+        self.assertEqual(h.count, 25)
+        h.close()
+
+    def test_pending_writes(self):
+        """Records being overwritten while a reader copies them are discarded"""
+        h = memfile.HistoryFile(self.filepath, capacity=10)
+        cells, valid = np.zeros(memory.MEMORY_SIZE), np.ones(memory.MEMORY_SIZE, dtype=bool)
+        for i in range(12):
+            h.append(1, cells, valid, timestamp=float(i))
+
+        h._header['pending'] = 15 # a writer is writing the records 12 to 14
+        records = memfile.HistoryFile(self.filepath, mode='r').records()
+        self.assertEqual(list(records['timestamp']), list(range(5, 12)))
+        h.close()
+
+    def test_clock(self):
+        clk = clock.VirtualClock(start=3.0)
+        h = memfile.HistoryFile(self.filepath, capacity=10, clock=clk)
+        cells, valid = np.zeros(memory.MEMORY_SIZE), np.ones(memory.MEMORY_SIZE, dtype=bool)
+        h.append(1, cells, valid)
+        clk.advance(2.0)
+        h.append(1, cells, valid)
+        timestamps = h.records()['timestamp']
+        self.assertEqual(list(timestamps), [3.0, 5.0])
+        wall = h.wall_time(timestamps)
+        self.assertAlmostEqual(wall[1] - wall[0], 2.0)
+        h.close()
+
+    def test_monotonic(self):
+        """Records keep a monotonic time, whatever the clock timestamps"""
+        h = memfile.HistoryFile(self.filepath, capacity=10)
+        cells, valid = np.zeros(memory.MEMORY_SIZE), np.ones(memory.MEMORY_SIZE, dtype=bool)
+        for timestamp in (10.0, 5.0, 7.0): # eg. the wall clock set backwards
+            h.append(1, cells, valid, timestamp=timestamp)
+        records = h.records()
+        self.assertEqual(list(records['timestamp']), [10.0, 5.0, 7.0])
+        self.assertTrue(np.all(np.diff(records['monotonic']) >= 0))
+        self.assertTrue(np.all(records['monotonic'] >= h._header['mono_origin'][0]))
+        h.close()
+
+    def test_controller(self):
+        mcom = fakecom.FakeCom()
+        mcom._add_motor(3,  'AX-12')
+        mcom._add_motor(17, 'AX-12')
+        ctrl = controller.DynamixelController(mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        mcom.save_history(memfile.HistoryFile(self.filepath, capacity=100), mids=[17])
+
+        ctrl.step(5)
+        mcom.history.close()
+
+        records = memfile.HistoryFile(self.filepath, mode='r').records()
+        self.assertEqual(len(records), 5)
+        self.assertTrue(all(records['timestamp'] <= ctrl.clock.time()))
+        self.assertTrue(all(records['mid'] == 17))
+        self.assertTrue(np.all(np.diff(records['timestamp']) >= 0))
+        self.assertTrue(records['valid'][:, pt.PRESENT_POSITION.addr].all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+"""Test the motor memories and the memory table"""
+from __future__ import print_function, division
+import unittest
+
+import env
+from pydyn.refs import protocol as pt
+from pydyn.refs import exc
+from pydyn.ios.fakeio import fakecom, fakememory
+from pydyn.dynamixel import controller, memory
+
+
+class TestMemory(unittest.TestCase):
+
+    def test_standalone(self):
+        mmem = memory.DynamixelMemory(3, memory=fakememory.MODELS['AX-12'])
+        self.assertEqual(mmem.model, 'AX-12')
+        self.assertEqual(mmem[pt.ID], mmem[pt.ID.addr])
+        self.assertTrue(isinstance(mmem[pt.PRESENT_POSITION], int))
+        self.assertIsNone(mmem[pt.MODEL_NUMBER.addr + 1])
+
+        mmem[pt.GOAL_POSITION.addr] = 123
+        self.assertEqual(mmem[pt.GOAL_POSITION], 123)
+        with self.assertRaises(ValueError):
+            mmem[pt.GOAL_POSITION.addr] = 1.5
+
+    def test_derived_state(self):
+        mmem = memory.DynamixelMemory(3, memory=fakememory.MODELS['AX-12'])
+        self.assertEqual(mmem.mode, 'joint')
+        mmem[pt.PRESENT_POSITION.addr] = 12
+        self.assertFalse(mmem._stale)
+        mmem[pt.CW_ANGLE_LIMIT.addr] = mmem[pt.CW_ANGLE_LIMIT]
+        self.assertFalse(mmem._stale)
+
+        mmem[pt.CW_ANGLE_LIMIT.addr] = 0
+        mmem[pt.CCW_ANGLE_LIMIT.addr] = 0
+        self.assertTrue(mmem._stale)
+        mmem.update()
+        self.assertEqual(mmem.mode, 'wheel')
+
+        mmem[pt.MODEL_NUMBER.addr] = 4242
+        with self.assertRaises(ValueError):
+            mmem.update()
+
+    def test_unsupported_model(self):
+        """An unsupported model read in the loop is a motor error"""
+        mcom = fakecom.FakeCom()
+        mcom._add_motor(3, 'AX-12')
+        ctrl = controller.DynamixelController(mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        m = ctrl.motors[0]
+
+        m.mmem[pt.MODEL_NUMBER.addr] = 4242
+        ctrl.step()
+        self.assertTrue(ctrl.stopped())
+        self.assertIsInstance(m._error[0], exc.UnsupportedModelError)
+        self.assertIn('4242', str(m._error[0]))
+        self.assertTrue(ctrl._ctrllock.acquire(False))
+        ctrl._ctrllock.release()
+        ctrl.close()
+
+    def test_table(self):
+        table = memory.MemoryTable(capacity=5)
+        mmems = [memory.DynamixelMemory(mid, table=table) for mid in range(5)]
+        self.assertEqual(len(table), 5)
+        self.assertEqual(table.capacity, 5)
+        self.assertIsNone(mmems[0][pt.PRESENT_POSITION])
+
+        for i, mmem in enumerate(mmems):
+            mmem[pt.PRESENT_POSITION.addr] = 100 + i
+        self.assertEqual(list(table.column(pt.PRESENT_POSITION)), [100, 101, 102, 103, 104])
+        self.assertTrue(table.valid[:5, pt.PRESENT_POSITION.addr].all())
+
+        # column are views
+        col = table.column(pt.PRESENT_POSITION)
+        mmems[2][pt.PRESENT_POSITION.addr] = 512
+        self.assertEqual(col[2], 512)
+
+        # the table does not grow
+        with self.assertRaises(ValueError):
+            memory.DynamixelMemory(10, table=table)
+        self.assertEqual(len(table), 5)
+
+    def test_add_after_rows(self):
+        """Memories added later do not detach the existing rows"""
+        table = memory.MemoryTable()
+        mmems = [memory.DynamixelMemory(mid, table=table) for mid in range(3)]
+        data, valid = table.data, table.valid
+
+        mmems += [memory.DynamixelMemory(mid, table=table) for mid in range(3, 200)]
+        self.assertIs(table.data, data)
+        self.assertIs(table.valid, valid)
+        mmems[0][pt.PRESENT_POSITION.addr] = 7
+        mmems[199][pt.PRESENT_POSITION.addr] = 9
+        self.assertEqual(data[0, pt.PRESENT_POSITION.addr], 7)
+        self.assertEqual(data[table.row(199), pt.PRESENT_POSITION.addr], 9)
+        self.assertTrue(valid[0, pt.PRESENT_POSITION.addr])
+
+    def test_com_add_after_rows(self):
+        """A motor added to a running com keeps the previous rows live"""
+        mcom = fakecom.FakeCom()
+        mcom._add_motor(3,  'AX-12')
+        mcom._add_motor(17, 'AX-12')
+        mcom.create([3])
+        data = mcom.memtable.data
+        snapshot = mcom.memtable.snapshot([0])
+
+        mcom.create([17])
+        mcom.mmems[3][pt.GOAL_POSITION.addr] = 300
+        self.assertIs(mcom.memtable.data, data)
+        self.assertEqual(data[mcom.memtable.row(3), pt.GOAL_POSITION.addr], 300)
+        self.assertEqual(list(mcom.memtable.column(pt.ID)), [3, 17])
+        self.assertEqual(snapshot.mids, (3,))
+
+    def test_com_table(self):
+        mcom = fakecom.FakeCom()
+        mcom._add_motor(3,  'AX-12')
+        mcom._add_motor(17, 'AX-12')
+        mcom.create([3, 17])
+        self.assertEqual(len(mcom.memtable), 2)
+        self.assertEqual(list(mcom.memtable.column(pt.ID)), [3, 17])
+
+        # recreating a memory reuses its row
+        mcom.create([17])
+        self.assertEqual(len(mcom.memtable), 2)
+        self.assertEqual(mcom.mmems[17].model, 'AX-12')
+
+
+if __name__ == '__main__':
+    unittest.main()
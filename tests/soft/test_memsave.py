@@ -0,0 +1,106 @@
+"""Test the in-process memory history"""
+from __future__ import print_function, division
+import unittest
+
+import numpy as np
+
+import env
+from pydyn.refs import protocol as pt
+from pydyn.ios.fakeio import fakememory
+from pydyn.dynamixel import memsave, memory
+
+
+class TestMemSave(unittest.TestCase):
+
+    def setUp(self):
+        self.row = memsave.TimeStampedMemRow()
+        for i in range(1000):
+            self.row.append(i % 100, timestamp=0.01*i)
+
+    def test_index_at(self):
+        self.assertEqual(self.row.index_at(-1.0), 0)
+        self.assertEqual(self.row.index_at(2.565), 257)
+        self.assertEqual(self.row.index_at(2.56), 256)
+        self.assertEqual(self.row.index_at(2.56, right=True), 257)
+        self.assertEqual(self.row.index_at(100.0), 1000)
+
+    def test_between(self):
+        values, timestamps = self.row.between(2.5, 5.2)
+        self.assertEqual(len(values), 271)
+        self.assertEqual(values[0], 50)
+        self.assertAlmostEqual(timestamps[-1], 5.2)
+        self.assertTrue(np.all(np.diff(timestamps) > 0))
+
+        values, timestamps = self.row.to_numpy()
+        self.assertEqual(len(values), 1000)
+        self.assertEqual(list(values), [v for v, t in self.row])
+        self.assertEqual(len(self.row.between(20.0, 30.0)[0]), 0)
+
+    def test_downsample(self):
+        times, mins, maxs, means = self.row.downsample(1.0, t0=0.0)
+        self.assertEqual(len(times), 10)
+        self.assertEqual(list(mins), [0]*10)
+        self.assertEqual(list(maxs), [99]*10)
+        self.assertTrue(np.allclose(means, 49.5))
+        self.assertTrue(np.allclose(times, np.arange(10)))
+
+    def test_times(self):
+        """Vectorized timestamps match the scalar lookups, in any order"""
+        log = self.row._log
+        txs = [999, 0, 256, 255, 512, 3, 999]
+        self.assertEqual(list(log.times(txs)), [log.time(tx) for tx in txs])
+        self.assertEqual(len(log.times([])), 0)
+        with self.assertRaises(KeyError):
+            log.times([0, 10*memsave.CHUNK_SIZE])
+
+    def test_memsave(self):
+        history = memsave.MemSave(74)
+        history[36] = 512
+        self.assertEqual(len(history[36]), 1)
+        self.assertEqual(history[36][0][0], 512)
+
+    def test_transactions(self):
+        history = memsave.MemSave(74)
+        mmem = memory.DynamixelMemory(3, save=True, memory=fakememory.MODELS['AX-12'],
+                                      history=history)
+        mmem.begin_transaction(timestamp=1.5)
+        for addr in (36, 38, 40):
+            mmem[addr] = 100
+        mmem.end_transaction()
+        mmem[30] = 512
+
+        self.assertEqual(len(history.log), 2)
+        self.assertEqual(history[36][0], (100, 1.5))
+        self.assertEqual(history[40][0], (100, 1.5))
+        self.assertEqual(history[36]._txs[0][0], history[40]._txs[0][0])
+        self.assertNotEqual(history[30]._txs[0][0], history[36]._txs[0][0])
+
+    def test_eviction_size(self):
+        history = memsave.MemSave(74, max_entries=300)
+        for i in range(2000):
+            history.begin(timestamp=float(i))
+            history[36] = i % 1000
+            history[38] = i % 1000
+            history.end()
+        history[0] = 12 # an old, rarely updated cell
+        row = history[36]
+        self.assertTrue(300 <= len(row) < 300 + 2*memsave.CHUNK_SIZE)
+        self.assertEqual(row.evicted + len(row), 2000)
+        values, timestamps = row.to_numpy()
+        self.assertEqual(timestamps[-1], 1999.0)
+        self.assertEqual(timestamps[0], float(row.evicted))
+        # the transaction log is evicted as well
+        self.assertTrue(history.log.chunk_count <= 4)
+
+    def test_eviction_age(self):
+        row = memsave.TimeStampedMemRow(max_age=5.0)
+        for i in range(2000):
+            row.append(i, timestamp=0.01*i)
+        values, timestamps = row.to_numpy()
+        self.assertTrue(timestamps[0] < 19.99 - 5.0)
+        self.assertTrue(timestamps[0] > 19.99 - 5.0 - 2*memsave.CHUNK_SIZE*0.01)
+        self.assertEqual(row.index_at(19.0), len(row) - 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
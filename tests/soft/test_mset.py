@@ -56,6 +56,101 @@ class TestFake(unittest.TestCase):
         with self.assertRaises(AttributeError):
             ms.does_not_exist
 
+    def test_fast_get(self):
+        """Vectorized reads give the same values as the motors"""
+        ms = MotorSet(motors=self.ctrl.motors)
+        for name in ['position', 'speed_bytes', 'load', 'goal_position', 'moving_speed',
+                     'torque_limit', 'temperature', 'voltage_bytes']:
+            self.assertIsNotNone(ms._fast_read(name))
+            self.assertEqual(list(getattr(ms, name)), [getattr(m, name) for m in ms.motors])
+
+        # motors of different buses
+        mcom2 = fakecom.FakeCom()
+        mcom2._add_motor(5, 'AX-12')
+        ctrl2 = controller.DynamixelController(mcom2)
+        ctrl2.load_motors(ctrl2.discover_motors(verbose=False))
+        ms = MotorSet(motors=self.ctrl.motors + ctrl2.motors)
+        self.assertEqual(len(ms._tables), 2)
+        self.assertEqual(list(ms.position_bytes), [m.position_bytes for m in ms.motors])
+        ctrl2.close()
+
+    def test_access_plans(self):
+        ms = MotorSet(motors=self.ctrl.motors)
+        self.assertEqual(list(ms.compliant), [m.compliant for m in ms.motors])
+        self.assertEqual(list(ms.cw_compliance_margin), [m.cw_compliance_margin for m in ms.motors])
+        plan = ms._plan('cw_compliance_margin')
+        ms.cw_compliance_margin
+        self.assertIs(ms._plan('cw_compliance_margin'), plan)
+
+        ms.motors = ms.motors[:1]
+        self.assertIsNot(ms._plan('cw_compliance_margin'), plan)
+        self.assertEqual(len(ms.cw_compliance_margin), 1)
+        self.assertEqual(len(ms.zero_pose), 1)
+
+    def test_views(self):
+        mcom2 = fakecom.FakeCom()
+        mcom2._add_motor(5, 'AX-12')
+        ctrl2 = controller.DynamixelController(mcom2)
+        ctrl2.load_motors(ctrl2.discover_motors(verbose=False))
+        ms = MotorSet(motors=self.ctrl.motors + ctrl2.motors, groups={'arm': [17, 5]})
+        m3, m17, m5 = ms.motors
+
+        self.assertIs(ms[17], m17)
+        arm = ms['arm']
+        self.assertEqual(arm.motors, (m17, m5))
+        self.assertIs(ms[[17, 5]], arm) # cached
+        self.assertEqual(ms[[True, False, True]].motors, (m3, m5))
+        self.assertEqual(ms[1:].motors, (m17, m5))
+        self.assertEqual(arm[[5]].motors, (m5,))
+        self.assertEqual(len(arm), 2)
+        with self.assertRaises(KeyError):
+            ms[[3, 4]]
+        with self.assertRaises(KeyError):
+            ms.add_group('legs', [4])
+
+        self.assertEqual(len(arm._tables), 2)
+        self.assertEqual(list(arm.position_bytes), [m17.position_bytes, m5.position_bytes])
+        self.assertEqual(list(arm.compliant), [m17.compliant, m5.compliant])
+        self.assertIs(arm._plan('compliant').setters[0], ms._plan('compliant').setters[1])
+
+        arm.zero_pose = [10.0, 20.0]
+        self.assertEqual(tuple(ms.zero_pose), (0.0, 10.0, 20.0))
+        ms.zero_pose = [1.0, 2.0, 3.0]
+        self.assertEqual(arm.zero_pose, (2.0, 3.0))
+
+        arm.goal_position_bytes = [100, 200]
+        time.sleep(0.05)
+        self.assertEqual(m17.goal_position_bytes, 100)
+        self.assertEqual(m5.write_requests[pt.GOAL_POSITION], 200) # ctrl2 is not started
+        self.assertEqual(m3.write_requests, {})
+        ctrl2.close()
+
+    def test_detached_view(self):
+        """A view whose motors are changed leaves the views of its root"""
+        ms = MotorSet(motors=self.ctrl.motors)
+        m3, m17 = ms.motors
+        ms.zero_pose = [1.0, 2.0]
+        view = ms[[17]]
+        view.motors = [m3]
+        self.assertEqual(view.motors, (m3,))
+        self.assertIsNone(view._root)
+        self.assertEqual(ms[[17]].motors, (m17,))
+        self.assertIsNot(ms[[17]], view)
+
+    def test_root_motors_change(self):
+        """Changing the motors of a set detaches the views handed out"""
+        ms = MotorSet(motors=self.ctrl.motors)
+        m3, m17 = ms.motors
+        ms.zero_pose = [1.0, 2.0]
+        view = ms[[3, 17]]
+        ms.motors = [m3]
+        self.assertEqual(view.zero_pose, (1.0, 2.0))
+        self.assertEqual(view.motors, (m3, m17))
+        self.assertEqual(list(view.position_bytes), [m3.position_bytes, m17.position_bytes])
+        view.zero_pose = [5.0, 6.0]
+        self.assertEqual(tuple(ms.zero_pose), (0.0,))
+        self.assertEqual(ms[[3]].motors, (m3,))
+
     def test_set(self):
         ms = MotorSet(motors=self.ctrl.motors)
         ms.goal_position_bytes = 150
@@ -71,6 +166,66 @@ class TestFake(unittest.TestCase):
         with self.assertRaises(AttributeError):
             ms.does_not_exist = 100
 
+    def test_batched_set(self):
+        """Batched writes are sent in the same frame"""
+        self.ctrl.close()
+        ctrl = controller.DynamixelController(self.mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        ms = MotorSet(motors=ctrl.motors)
+        self.assertTrue(all(m.request_lock is ctrl.request_lock for m in ms.motors))
+
+        sets = []
+        com_set = self.mcom.set
+        def recording_set(control, mids, valuess):
+            sets.append((control, tuple(mids)))
+            return com_set(control, mids, valuess)
+        self.mcom.set = recording_set
+
+        ms.goal_position = [10.0, -10.0]
+        ms.torque_limit_bytes = [None, 512]
+        ctrl.step()
+        self.assertEqual(sets, [(pt.GOAL_POS_SPEED_TORQUE, (3, 17))])
+        self.assertEqual([round(p) for p in ms.goal_position], [10, -10])
+        self.assertEqual(list(ms.torque_limit_bytes)[1], 512)
+
+        with self.assertRaises(ValueError):
+            ms.position = [0.0, 200.0]
+        self.assertEqual(ms.motors[0].write_requests, {}) # nothing registered
+        ctrl.close()
+
+    def test_prepared_pose(self):
+        self.ctrl.close()
+        ctrl = controller.DynamixelController(self.mcom)
+        ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        ms = MotorSet(motors=ctrl.motors)
+        ms.zero_pose = [0.0, 10.0]
+
+        sets = []
+        com_set = self.mcom.set
+        def recording_set(control, mids, valuess):
+            sets.append((control, tuple(mids), tuple(valuess)))
+            return com_set(control, mids, valuess)
+        self.mcom.set = recording_set
+
+        cmd = ms.prepare([20.0, None], speed=100.0)
+        self.assertEqual(cmd.motors, ms.motors)
+        self.assertEqual(len(cmd.requests[1]), 1) # speed only
+        with self.assertRaises(ValueError):
+            ms.prepare([0.0, 145.0])
+
+        ms.apply(cmd)
+        ctrl.step()
+        ms.pose = [20.0, 0.0]
+        ctrl.step()
+        self.assertEqual(len(sets), 2)
+        self.assertEqual(sets[0][:2], (pt.GOAL_POS_SPEED_TORQUE, (3, 17)))
+        self.assertEqual(sets[0][2][0][0], sets[1][2][0][0])
+        self.assertEqual([round(p) for p in ms.goal_position], [20, 10])
+
+        ms.apply(ms.prepare(0.0))
+        self.assertEqual(ms.motors[1].write_requests[pt.GOAL_POSITION], sets[1][2][1][0])
+        ctrl.close()
+
     def test_properties(self):
         ms = MotorSet(motors=self.ctrl.motors)
         ms.zero_pose = -150
@@ -83,6 +238,22 @@ class TestFake(unittest.TestCase):
         ms.moving_speed = 0
         ms.moving_speed
 
+    def test_setpoints(self):
+        ms = MotorSet(motors=self.ctrl.motors)
+        now = time.time()
+        ms.push_setpoints(now + 0.05, 10.0, speeds=100)
+        ms.push_setpoints(now + 0.10, [20.0, None])
+        self.assertEqual(len(ms.motors[0].setpoints), 2)
+        self.assertEqual(len(ms.motors[1].setpoints), 1)
+        with self.assertRaises(ValueError):
+            ms.motors[0].push_setpoint(now, 0.0)
+
+        time.sleep(0.2)
+        self.assertEqual(len(ms.motors[0].setpoints), 0)
+        self.assertAlmostEqual(ms.motors[0].goal_position, 20.0, delta=0.5)
+        self.assertAlmostEqual(ms.motors[1].goal_position, 10.0, delta=0.5)
+        self.assertAlmostEqual(ms.motors[1].moving_speed, 100.0, delta=1.0)
+
     def test_expand_values(self):
         ms = MotorSet(motors=self.ctrl.motors)
         ms.moving_speed = 0
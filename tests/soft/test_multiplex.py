@@ -0,0 +1,206 @@
+"""Test the multiplexing controller"""
+from __future__ import print_function, division
+import unittest
+import socket
+import select
+import threading
+import time
+
+import env
+from pydyn import clock
+from pydyn.ios.kinio import kinio
+from pydyn.ios.kinio import kinmotor
+from pydyn.ios.fakeio import fakecom
+from pydyn.ios.serialio import serialcom
+from pydyn.dynamixel import controller
+from pydyn.dynamixel import multiplex
+
+
+class SocketKinSerial(kinio.KinSerial):
+    """Simulated port answering through a socket, so that it can be selected"""
+
+    def __init__(self):
+        kinio.KinSerial.__init__(self)
+        self._sock_in, self._sock_out = socket.socketpair()
+        self._sock_in.settimeout(0.05)
+
+    @property
+    def timeout(self):
+        return 50
+
+    @timeout.setter
+    def timeout(self, val):
+        pass
+
+    def receive(self, port, msg):
+        self._sock_out.sendall(bytes(bytearray(msg)))
+
+    def fileno(self):
+        return self._sock_in.fileno()
+
+    def read(self, size):
+        data = bytearray()
+        try:
+            while len(data) < size:
+                chunk = self._sock_in.recv(size - len(data))
+                if not chunk:
+                    break
+                data += bytearray(chunk)
+        except socket.timeout:
+            pass
+        return data
+
+    def read_available(self):
+        self._sock_in.setblocking(False)
+        try:
+            return bytearray(self._sock_in.recv(4096))
+        except socket.error:
+            return bytearray()
+        finally:
+            self._sock_in.settimeout(0.05)
+
+    def purge(self):
+        while len(self.read_available()) > 0:
+            pass
+
+    def close(self):
+        kinio.KinSerial.close(self)
+        self._sock_in.close()
+        self._sock_out.close()
+
+
+def kin_controller(mids):
+    sio = SocketKinSerial()
+    kms = [kinmotor.KinMotor('AX-12', mid) for mid in mids]
+    for km0, km1 in zip(kms[:-1], kms[1:]):
+        kinio.KinCable(km0.ports[1], km1.ports[0])
+    sio.connect(kms[0].ports[0])
+    ctrl = controller.DynamixelController(serialcom.SerialCom(sio))
+    ctrl.load_motors(ctrl.discover_motors(motor_ids=mids, verbose=False))
+    return ctrl
+
+
+def com_lock_free(com):
+    """Return True if another thread can take the com lock"""
+    taken = []
+    def take():
+        taken.append(com._lock.acquire(False))
+        if taken[0]:
+            com._lock.release()
+    t = threading.Thread(target=take)
+    t.start()
+    t.join()
+    return taken[0]
+
+
+class TestMultiplex(unittest.TestCase):
+
+    def test_select_buses(self):
+        ctrls = [kin_controller([1, 2]), kin_controller([11, 12, 13])]
+        mux = multiplex.DynamixelMultiplexer(ctrls)
+        self.assertTrue(all(r is not None for r in mux._readers))
+        self.assertEqual(len(mux.motors), 5)
+        mux.start()
+
+        for m in mux.motors:
+            m.position = 10
+        time.sleep(0.3)
+        for m in mux.motors:
+            self.assertTrue(9.8 <= m.position <= 10.2)
+        self.assertTrue(all(not ctrl.stopped() for ctrl in ctrls))
+        mux.close()
+        mux.join(0.5)
+
+    def test_sequential_buses(self):
+        mcoms = []
+        for mids in ((3, 4), (17,)):
+            mcom = fakecom.FakeCom()
+            for mid in mids:
+                mcom._add_motor(mid, 'AX-12')
+            mcoms.append(mcom)
+        ctrls = [controller.DynamixelController(mcom) for mcom in mcoms]
+        for ctrl in ctrls:
+            ctrl.load_motors(ctrl.discover_motors(verbose=False))
+        ctrls.append(kin_controller([21]))
+
+        mux = multiplex.DynamixelMultiplexer(ctrls)
+        self.assertEqual([r is None for r in mux._readers], [True, True, False])
+        mux.start()
+        seq = mux.wait_frame(timeout=1.0)
+        self.assertIsNotNone(seq)
+        mux.wait(2)
+        self.assertTrue(all(ctrl.frameseq >= 2 for ctrl in ctrls))
+        mux.close()
+        mux.join(0.5)
+        self.assertFalse(mux.is_alive())
+
+    def test_failing_callback(self):
+        ctrls = [kin_controller([1]), kin_controller([11])]
+        def failing(c):
+            raise RuntimeError('failing callback')
+        ctrls[0].register_frame_callback(failing)
+        mux = multiplex.DynamixelMultiplexer(ctrls)
+        mux.start()
+        mux.wait(3)
+        self.assertTrue(mux.is_alive())
+        self.assertTrue(all(ctrl.frameseq >= 3 for ctrl in ctrls))
+        mux.close()
+        mux.join(0.5)
+
+    def test_virtual_clock(self):
+        clk = clock.VirtualClock()
+        mcoms = [fakecom.FakeCom(), fakecom.FakeCom()]
+        ctrls = [controller.DynamixelController(mcom, clock=clk) for mcom in mcoms]
+        with self.assertRaises(ValueError):
+            multiplex.DynamixelMultiplexer([ctrls[0], controller.DynamixelController(fakecom.FakeCom())])
+
+        mux = multiplex.DynamixelMultiplexer(ctrls, freq=50)
+        mux.start()
+        mux.wait(5)
+        mux.close()
+        mux.join(0.5)
+        self.assertTrue(clk.time() >= 5*mux.period)
+
+    def test_bus_lock(self):
+        """The com lock is held while a read of the multiplexer is on the bus"""
+        ctrl = kin_controller([1, 2])
+        reader = multiplex.DynamixelMultiplexer([ctrl])._readers[0]
+        lock_free = lambda: com_lock_free(ctrl.com)
+
+        reader.start()
+        self.assertTrue(reader.busy)
+        self.assertFalse(lock_free())
+        while reader.busy:
+            select.select([reader.fd], [], [], 0.05)
+            reader.on_readable()
+            reader.check_timeout(ctrl.clock.time())
+        self.assertTrue(lock_free())
+
+        reader.start()
+        reader.abort()
+        self.assertTrue(lock_free())
+        ctrl.close()
+
+    def test_bus_lock_write_error(self):
+        """The com lock is released when the port fails to write"""
+        ctrls = [kin_controller([1])]
+        mux = multiplex.DynamixelMultiplexer(ctrls)
+        def failing_write(data):
+            raise OSError('port unplugged')
+        ctrls[0].com.sio.write = failing_write
+        with self.assertRaises(OSError):
+            mux._reading_buses([(ctrls[0], mux._readers[0])])
+        self.assertFalse(mux._readers[0].busy)
+        self.assertTrue(com_lock_free(ctrls[0].com))
+        ctrls[0].close()
+
+    def test_started_ctrl(self):
+        ctrl = kin_controller([5])
+        ctrl.start()
+        with self.assertRaises(ValueError):
+            multiplex.DynamixelMultiplexer([ctrl])
+        ctrl.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+"""Test the telemetry recorder"""
+from __future__ import print_function, division
+import unittest
+import tempfile
+import shutil
+
+import numpy as np
+
+import env
+from pydyn.refs import protocol as pt
+from pydyn.ios.fakeio import fakecom
+from pydyn.dynamixel import controller, recorder
+from pydyn import clock
+
+
+class TestRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        mcom = fakecom.FakeCom()
+        mcom._add_motor(3,  'AX-12')
+        mcom._add_motor(17, 'AX-12')
+        self.ctrl = controller.DynamixelController(mcom, freq=100, clock=clock.VirtualClock())
+        self.ctrl.load_motors(self.ctrl.discover_motors(verbose=False))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _record(self, fmt):
+        mcom = self.ctrl.com
+        rec = recorder.Recorder(self.ctrl, self.tmpdir, chunk_size=10, fmt=fmt)
+        rec.start()
+        for i in range(25):
+            mcom._fakemems[17][pt.PRESENT_POSITION.addr] = 100 + i
+            self.ctrl.step()
+        rec.stop()
+        self.assertEqual(rec.frames, 25)
+        self.assertEqual(len(rec.files), 3)
+        return recorder.load(self.tmpdir)
+
+    def test_npz(self):
+        data = self._record('npz')
+        self.assertEqual(list(data['mids']), [3, 17])
+        self.assertEqual(data['position'].shape, (25, 2))
+        self.assertEqual(list(data['position'][:, 1]), list(range(100, 125)))
+        self.assertTrue(np.allclose(np.diff(data['timestamp']), 0.01))
+        self.assertEqual(list(data['frameseq']), list(range(1, 26)))
+
+    def test_npy(self):
+        data = self._record('npy')
+        self.assertEqual(len(data), 25)
+        self.assertEqual(list(data['position'][:, 1]), list(range(100, 125)))
+
+    def test_frame_after_stop(self):
+        """A frame callback running late, after stop(), records nothing"""
+        rec = recorder.Recorder(self.ctrl, self.tmpdir, chunk_size=2)
+        rec.start()
+        self.ctrl.step(3)
+        rec.stop()
+        rec._frame(self.ctrl) # eg. from the copy of the callbacks of the controller
+        rec._frame(self.ctrl)
+        self.assertEqual(rec.frames, 3)
+        self.assertTrue(rec._queue.empty())
+        self.assertEqual(len(recorder.load(self.tmpdir)['frameseq']), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
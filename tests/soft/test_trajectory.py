@@ -0,0 +1,94 @@
+"""Test the trajectory interpolation and player"""
+from __future__ import print_function, division
+import unittest
+
+import numpy as np
+
+import env
+from pydyn.refs import limits
+from pydyn.ios.fakeio import fakecom
+from pydyn.dynamixel import controller
+from pydyn.msets.msets import MotorSet
+from pydyn.msets.trajectory import Trajectory, TrajectoryPlayer
+
+TIMES     = [0.0, 1.0, 3.0]
+KEYFRAMES = [[0.0, 10.0], [30.0, -10.0], [0.0, 0.0]]
+
+class TestTrajectory(unittest.TestCase):
+
+    def test_keyframes(self):
+        for kind in ('linear', 'cubic', 'minjerk'):
+            traj = Trajectory(TIMES, KEYFRAMES, kind=kind)
+            for t, keyframe in zip(TIMES, KEYFRAMES):
+                self.assertTrue(np.allclose(traj(t), keyframe))
+            self.assertTrue(np.allclose(traj(-1.0), KEYFRAMES[0]))
+            self.assertTrue(np.allclose(traj(10.0), KEYFRAMES[-1]))
+
+    def test_linear(self):
+        traj = Trajectory(TIMES, KEYFRAMES, kind='linear')
+        self.assertTrue(np.allclose(traj(0.5), [15.0, 0.0]))
+        self.assertTrue(np.allclose(traj(2.0), [15.0, -5.0]))
+
+    def test_minjerk(self):
+        traj = Trajectory([0.0, 1.0], [[0.0], [10.0]], kind='minjerk')
+        self.assertTrue(np.allclose(traj(0.5), [5.0]))
+        self.assertTrue(traj(0.01)[0] < 0.01*10.0)
+
+    def test_cubic(self):
+        traj = Trajectory([0.0, 1.0, 2.0], [[0.0], [1.0], [0.0]], kind='cubic')
+        # natural spline of a symmetric bump
+        self.assertTrue(np.allclose(traj(0.5), [0.6875]))
+
+    def test_errors(self):
+        with self.assertRaises(ValueError):
+            Trajectory([0.0, 1.0], [[0.0]])
+        with self.assertRaises(ValueError):
+            Trajectory([1.0, 0.0], [[0.0], [1.0]])
+        with self.assertRaises(ValueError):
+            Trajectory([0.0, 1.0], [[0.0], [1.0]], kind='quintic')
+
+
+class TestPlayer(unittest.TestCase):
+
+    def setUp(self):
+        self.mcom = fakecom.FakeCom()
+        self.mcom._add_motor(3,  'AX-12')
+        self.mcom._add_motor(17, 'AX-12')
+        self.ctrl = controller.DynamixelController(self.mcom)
+        mids = self.ctrl.discover_motors(verbose=False)
+        self.ctrl.load_motors(mids)
+        self.ctrl.start()
+
+    def tearDown(self):
+        self.ctrl.close()
+
+    def test_play(self):
+        ms = MotorSet(motors=self.ctrl.motors)
+        traj = Trajectory([0.0, 0.1], [[0.0, 0.0], [20.0, -20.0]], kind='minjerk')
+        player = TrajectoryPlayer(self.ctrl, ms, traj)
+        player.start()
+        self.assertTrue(player.wait(1.0))
+        self.ctrl.wait(2)
+        self.assertAlmostEqual(ms.motors[0].goal_position,  20.0, delta=0.5)
+        self.assertAlmostEqual(ms.motors[1].goal_position, -20.0, delta=0.5)
+
+    def test_out_of_range(self):
+        ms = MotorSet(motors=self.ctrl.motors)
+        traj = Trajectory([0.0, 1.0], [[0.0, 0.0], [200.0, 0.0]])
+        with self.assertRaises(ValueError):
+            TrajectoryPlayer(self.ctrl, ms, traj)
+
+        # cubic overshoot between valid keyframes, beyond 150 degrees
+        traj = Trajectory([0.0, 0.05, 0.1, 0.15], [[0.0, 0.0], [149.0, 0.0], [149.0, 0.0], [0.0, 0.0]],
+                          kind='cubic')
+        player = TrajectoryPlayer(self.ctrl, ms, traj)
+        with self.assertRaises(limits.BoundsError):
+            player.positions_bytes(0.075)
+        player.start()
+        self.assertTrue(player.wait(1.0))
+        self.assertIsInstance(player.error, limits.BoundsError)
+        self.assertTrue(ms.motors[0].goal_position <= 150.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Test the vectorized conversions against the scalar ones"""
+from __future__ import print_function, division
+import unittest
+import random
+
+import numpy as np
+
+import env
+from pydyn.refs import protocol as pt
+from pydyn.refs import conversions as conv
+from pydyn.refs import vconversions as vconv
+from pydyn.refs import limits
+from pydyn.refs import luts
+
+
+MODELCLASSES = ['AX', 'MX', 'RX', 'MX', 'EX', 'AX']
+MODES        = ['joint', 'joint', 'wheel', 'wheel', 'joint', 'wheel']
+
+
+def valid_bytes(control, modelclass, mode):
+    """Random bytes values accepted by the scalar bytes2 conversion"""
+    values = []
+    while len(values) < 20:
+        v = random.randint(0, 4095)
+        try:
+            conv.CONV[control][1](v, modelclass=modelclass, mode=mode)
+            values.append(v)
+        except (ValueError, KeyError):
+            pass
+    return values
+
+
+class TestVConversions(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(0)
+
+    def test_roundtrips(self):
+        """Vectorized results are the ones of the scalar conversions"""
+        numeric = [c for c in vconv.VCONV if c not in (pt.MODEL_NUMBER, pt.ALARM_LED, pt.ALARM_SHUTDOWN,
+                                                       pt.GAINS, pt.CW_COMPLIANCE_SLOPE, pt.CCW_COMPLIANCE_SLOPE)]
+        for control in numeric:
+            to_bytes, to_unit = conv.CONV[control]
+            vto_bytes, vto_unit = vconv.VCONV[control]
+            for mc, md in zip(MODELCLASSES, MODES):
+                values = valid_bytes(control, mc, md)
+                units  = [to_unit(v, modelclass=mc, mode=md) for v in values]
+                self.assertTrue(np.allclose(vto_unit(values, modelclass=mc, mode=md), units), control.name)
+
+                try:
+                    expected = [to_bytes(u, modelclass=mc, mode=md) for u in units]
+                except ValueError:
+                    continue # some scalar roundtrips are not possible (eg. baudrates)
+                self.assertEqual(list(vto_bytes(units, modelclass=mc, mode=md)), expected, control.name)
+
+    def test_per_motor(self):
+        values = [512, 2048, 1000, 3000, 100, 0]
+        expected = [conv.bytes2_present_position(v, modelclass=mc) for v, mc in zip(values, MODELCLASSES)]
+        self.assertTrue(np.allclose(vconv.bytes2_present_position(values, modelclass=MODELCLASSES), expected))
+
+        speeds = [100, -50.0, 20.0, -300.0, 0.0, -100.0]
+        expected = [conv.moving_speed_2bytes(s, modelclass=mc, mode=md)
+                    for s, mc, md in zip([100, 50.0, 20.0, -300.0, 0.0, -100.0], MODELCLASSES, MODES)]
+        speeds[1] = 50.0
+        self.assertEqual(list(vconv.moving_speed_2bytes(speeds, modelclass=MODELCLASSES, mode=MODES)), expected)
+
+        speed_bytes = [conv.present_speed_2bytes(s, modelclass=mc, mode=md) for s, mc, md in zip(speeds, MODELCLASSES, MODES)]
+        expected = [conv.bytes2_present_speed(b, modelclass=mc, mode=md) for b, mc, md in zip(speed_bytes, MODELCLASSES, MODES)]
+        self.assertTrue(np.allclose(vconv.bytes2_present_speed(speed_bytes, modelclass=MODELCLASSES, mode=MODES), expected))
+
+    def test_non_numeric(self):
+        self.assertEqual(vconv.bytes2_model_number([12, 29]), ['AX-12', 'MX-28'])
+        self.assertEqual(vconv.bytes2_alarm_led([0, 33]), [conv.bytes2_alarm_led(0), conv.bytes2_alarm_led(33)])
+        gains = vconv.bytes2_gains([[0, 0, 32], [10, 20, 30]])
+        self.assertTrue(np.allclose(gains[1], conv.bytes2_gains([10, 20, 30])))
+        self.assertEqual(list(vconv.bytes2_cw_compliance_scope([0, 1, 32, 255])), [0, 0, 5, 7])
+        self.assertEqual(list(vconv.cw_compliance_scope_2bytes([0, 5, 7])), [1, 32, 128])
+
+    def test_errors(self):
+        """All offending values are reported, with the scalar message for the first one"""
+        with self.assertRaises(limits.BoundsError) as vcm:
+            vconv.goal_position_2bytes([0.0, 151.0, 200.0], modelclass='AX')
+        with self.assertRaises(ValueError) as cm:
+            conv.goal_position_2bytes(151.0, modelclass='AX')
+        self.assertEqual(vcm.exception.message, str(cm.exception))
+        self.assertEqual(vcm.exception.indexes, [1, 2])
+
+        with self.assertRaises(ValueError):
+            vconv.bytes2_present_position([512.0], modelclass='AX')
+        with self.assertRaises(ValueError):
+            vconv.bytes2_present_position([512, 2000], modelclass=['MX', 'AX'])
+        with self.assertRaises(ValueError):
+            limits.VCHECK[pt.MOVING_SPEED]([10.0, -10.0], modelclass='AX', mode='joint')
+
+
+class TestVectorizedChecks(unittest.TestCase):
+
+    def test_clip(self):
+        positions = [-200.0, 0.0, 200.0]
+        clipped = limits.VCHECK[pt.GOAL_POSITION](positions, modelclass=['AX', 'AX', 'MX'], clip=True)
+        self.assertEqual(list(clipped), [-150.0, 0.0, 180.0])
+
+        speeds = [-10.0, 500.0, -500.0]
+        clipped = limits.VCHECK[pt.MOVING_SPEED](speeds, modelclass=['AX', 'MX', 'AX'],
+                                                 mode=['joint', 'wheel', 'wheel'], clip=True)
+        self.assertEqual(list(clipped), [0.0, 500.0, -100.0])
+
+        slopes = limits.VCHECK[pt.CW_COMPLIANCE_SLOPE]([0, 12], clip=True)
+        self.assertEqual(list(slopes), [0, 7])
+
+        with self.assertRaises(limits.BoundsError):
+            limits.VCHECK[pt.GOAL_POSITION]([0.0, float('nan')], modelclass='AX', clip=True)
+        with self.assertRaises(limits.BoundsError):
+            limits.VCHECK_BYTES[pt.GOAL_POSITION]([0.0, 2.0], modelclass='AX', clip=True)
+
+    def test_per_motor_ranges(self):
+        """(frames, motors) arrays are checked with one modelclass per motor"""
+        frames = np.array([[0.0, 0.0], [160.0, 160.0], [-170.0, 190.0]])
+        with self.assertRaises(limits.BoundsError) as cm:
+            limits.VCHECK[pt.GOAL_POSITION](frames, modelclass=['AX', 'MX'])
+        self.assertEqual(cm.exception.indexes, [(1, 0), (2, 0), (2, 1)])
+        self.assertIn('150', cm.exception.message)
+
+
+class TestLookupTables(unittest.TestCase):
+
+    def test_tables(self):
+        """Table lookups give the results of the scalar conversions"""
+        for control in luts.TABULATED:
+            for mc, md in zip(MODELCLASSES, MODES):
+                table = luts.lut(control, mc, md)
+                self.assertIs(luts.lut(control, mc, md), table) # cached
+                for value in range(0, len(table), 7):
+                    try:
+                        expected = conv.CONV[control][1](value, modelclass=mc, mode=md)
+                    except ValueError:
+                        self.assertTrue(np.isnan(table[value]))
+                        with self.assertRaises(ValueError):
+                            luts.bytes2(control, value, modelclass=mc, mode=md)
+                        continue
+                    self.assertEqual(luts.bytes2(control, value, modelclass=mc, mode=md), expected)
+        self.assertIsNone(luts.lut(pt.MODEL_NUMBER))
+        self.assertEqual(luts.bytes2(pt.MODEL_NUMBER, 12), 'AX-12')
+
+    def test_decode(self):
+        values = [512, 2048, 1000, 3000, 100, 0]
+        expected = vconv.bytes2_present_position(values, modelclass=MODELCLASSES, mode=MODES)
+        self.assertTrue(np.allclose(luts.decode(pt.PRESENT_POSITION, values, MODELCLASSES, MODES), expected))
+        with self.assertRaises(ValueError):
+            luts.decode(pt.PRESENT_POSITION, [512, 2000], ['MX', 'AX'])
+        with self.assertRaises(ValueError):
+            luts.decode(pt.PRESENT_LOAD, [512, 5000])
+
+
+if __name__ == '__main__':
+    unittest.main()
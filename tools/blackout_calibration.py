@@ -0,0 +1,94 @@
+"""\
+Measure the EEPROM blackout durations of the connected motors.
+
+For each motor model found, every EEPROM control is written (and then restored)
+several times, and the time until the motor answers reliably again is
+measured. The worst measure, increased by a safety margin, is saved in a json
+file that can be loaded with:
+
+    from pydyn.refs import blackouts
+    blackouts.load('blackouts.json')
+
+Usage: python blackout_calibration.py [output.json]
+
+.. warning:: this script writes the EEPROM of the motors many times. The
+             original values are restored, but do not interrupt it.
+"""
+from __future__ import print_function, division
+import sys
+import time
+
+import env
+from pydyn.refs import protocol as pt
+from pydyn.refs import blackouts
+from pydyn.ios.serialio import serialio, serialcom
+from pydyn import color
+
+REPEATS   = 5    # measures for each control
+MARGIN    = 1.25 # safety factor applied to the worst measure
+STABILITY = 50   # successful consecutive reads to consider a motor responsive
+
+
+def blackout_duration(mcom, mid, control, values):
+    """Write values on control, and return the time until the motor answers reliably"""
+    mcom.set(control, [mid], (values,))
+    start, end = time.time(), None
+    no_error = 0
+    while no_error < STABILITY:
+        try:
+            mcom.get(pt.PRESENT_POS_SPEED_LOAD, [mid])
+            if no_error == 0:
+                end = time.time()
+            no_error += 1
+        except (mcom.TimeoutError, mcom.CommunicationError):
+            mcom.purge()
+            no_error = 0
+    return end - start
+
+def test_values(mcom, mid, control):
+    """Return a modified and the original values for a control"""
+    original = [mcom.mmems[mid][control.addr + sum(control.sizes[:i])]
+                for i in range(len(control.sizes))]
+    modified = [v - 1 if v > 0 else v + 1 for v in original]
+    return modified, original
+
+def calibrate(mcom, mid):
+    """Measure the blackout duration of all writable EEPROM controls"""
+    model = mcom.mmems[mid].model
+    durations = {}
+    for control in pt.CTRL_LIST:
+        if (control.ram or control.addr in (pt.MODEL_NUMBER.addr, pt.FIRMWARE.addr, pt.ID.addr, pt.BAUDRATE.addr)
+            or control in (pt.EEPROM, pt.STATUS_RETURN_LEVEL)
+            or mcom.mmems[mid][pt.MODEL_NUMBER] not in control.models):
+            continue
+        modified, original = test_values(mcom, mid, control)
+        measures = []
+        for _ in range(REPEATS):
+            measures.append(blackout_duration(mcom, mid, control, modified))
+            measures.append(blackout_duration(mcom, mid, control, original))
+        durations[control.name] = round(MARGIN*max(measures), 4)
+        print('{} {:<26} {}{:5.1f}ms{}'.format(model, control.name, color.red,
+                                              1000*durations[control.name], color.end))
+    return model, durations
+
+
+if __name__ == '__main__':
+    filepath = sys.argv[1] if len(sys.argv) > 1 else 'blackouts.json'
+
+    sio = serialio.Serial(device_type='USB2Serial', latency=1, timeout=2)
+    print('I/O open on {}{}{}'.format(color.cyan, sio, color.end))
+    mcom = serialcom.SerialCom(sio)
+    mids = [mid for mid in range(0, 253) if mcom.ping(mid)]
+    mcom.create(mids)
+
+    table, done = {}, set()
+    for mid in mids:
+        if mcom.mmems[mid].model not in done:
+            model, durations = calibrate(mcom, mid)
+            table[model] = durations
+            done.add(model)
+
+    blackouts.save(filepath, table)
+    print('blackout durations saved in {}{}{}'.format(color.cyan, filepath, color.end))
+
+    mcom.close()